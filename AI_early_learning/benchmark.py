@@ -0,0 +1,198 @@
+# Version: 1.0
+# Description: A reproducible benchmark of the three chatbots. Each one is trained on its bundled
+# training set, optionally scaled up with perturbed copies, and measured for training time, peak
+# memory, single-query and batched latency, and accuracy on perturbed variations of phrases held out
+# from its training set. Results are
+# written as JSON and can be compared against a saved baseline to catch regressions.
+#
+#   python benchmark.py --encoder stub --scales 1 10 100 --output results.json
+#   python benchmark.py --encoder stub --baseline results.json
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from chatbot_common.bots import BOT_MODULES, load_bot
+from chatbot_common.corpus import held_out_queries, scale_corpus, split_held_out
+
+# Metrics where a higher number is worse, with the smallest increase that counts as a regression.
+# The floors keep timer and allocator noise on tiny corpora from being reported.
+LOWER_IS_BETTER = {
+    "train_s": 0.05,
+    "peak_train_mb": 1.0,
+    "single_p50_ms": 0.05,
+    "single_p95_ms": 0.05,
+    "single_p99_ms": 0.05,
+    "batch_p50_ms": 0.5,
+    "batch_p95_ms": 0.5,
+    "batch_p99_ms": 0.5,
+}
+
+
+def percentiles(samples, prefix):
+    """
+    Summarizes latency samples in milliseconds as p50/p95/p99 entries named with a prefix.
+
+    Args:
+        samples (list): Latencies in seconds.
+        prefix (str): The metric name prefix, e.g. "single".
+    """
+    samples_ms = np.asarray(samples) * 1000
+    return {f"{prefix}_p{p}_ms": float(np.percentile(samples_ms, p)) for p in (50, 95, 99)}
+
+
+def benchmark_bot(bot, training_data, scale, queries, single_queries, batch_size, seed):
+    """
+    Trains a chatbot on a scaled training set and measures it.
+
+    Args:
+        bot (object): An adapter from `chatbot_common.bots.load_bot`.
+        training_data (list): The (phrase, intent) pairs to scale and train on.
+        scale (int): The training set size multiplier.
+        queries (list): Held-out (text, intent) pairs, not derived from `training_data`.
+        single_queries (int): How many of the queries are also timed one at a time.
+        batch_size (int): The batch size for batched inference.
+        seed (int): The random seed for scaling the corpus.
+    """
+    corpus = scale_corpus(training_data, scale, seed)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    bot.train(corpus)
+    train_s = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    texts = [text for text, _ in queries]
+    labels = np.array([intent for _, intent in queries], dtype=object)
+    bot.predict(texts[:1])  # Warm up lazy initialization outside of the timings.
+
+    single = []
+    for text in texts[:single_queries]:
+        start = time.perf_counter()
+        bot.predict([text])
+        single.append(time.perf_counter() - start)
+
+    batches, predicted = [], []
+    for i in range(0, len(texts), batch_size):
+        start = time.perf_counter()
+        intents, _ = bot.predict(texts[i:i + batch_size])
+        batches.append(time.perf_counter() - start)
+        predicted.extend(intents)
+
+    result = {
+        "bot": bot.name,
+        "scale": scale,
+        "corpus_size": len(corpus),
+        "train_s": train_s,
+        "peak_train_mb": peak / 2 ** 20,
+        "batch_size": batch_size,
+        "batch_qps": len(texts) / sum(batches),
+        "accuracy": float((np.array(predicted, dtype=object) == labels).mean()),
+    }
+    result.update(percentiles(single, "single"))
+    result.update(percentiles(batches, "batch"))
+    return result
+
+
+def compare_to_baseline(results, baseline, latency_tolerance=0.25, accuracy_tolerance=0.02):
+    """
+    Finds metrics that got worse than in a baseline run of the same bot and scale.
+
+    Args:
+        results (list): Result dicts from this run.
+        baseline (list): Result dicts from the baseline run.
+        latency_tolerance (float): The allowed relative increase of time and memory metrics, on top
+            of the absolute floors in `LOWER_IS_BETTER`.
+        accuracy_tolerance (float): The allowed absolute drop in accuracy.
+
+    Returns:
+        list: One dict per regression.
+    """
+    previous = {(row["bot"], row["scale"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        base = previous.get((row["bot"], row["scale"]))
+        if base is None:
+            continue
+        for metric, floor in LOWER_IS_BETTER.items():
+            if metric not in base:
+                continue
+            if row[metric] > base[metric] * (1 + latency_tolerance) and row[metric] - base[metric] > floor:
+                regressions.append({"bot": row["bot"], "scale": row["scale"], "metric": metric,
+                                    "baseline": base[metric], "current": row[metric]})
+        if row["accuracy"] < base["accuracy"] - accuracy_tolerance:
+            regressions.append({"bot": row["bot"], "scale": row["scale"], "metric": "accuracy",
+                                "baseline": base["accuracy"], "current": row["accuracy"]})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the three chatbots.")
+    parser.add_argument("--bots", nargs="+", default=sorted(BOT_MODULES), choices=sorted(BOT_MODULES))
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"],
+                        help="chatbot_3's encoder; 'hashed' and 'stub' run offline without downloading a model")
+    parser.add_argument("--compiled", action="store_true",
+                        help="serve chatbot_1/chatbot_2 through the compiled token-weight scorer")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--held-out", type=float, default=0.2,
+                        help="share of each intent's phrases kept out of training and used to build the queries")
+    parser.add_argument("--single-queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25)
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.bots:
+        # chatbot_3's query cache would turn repeated held-out queries into cache hits.
+        bot = load_bot(name, encoder=args.encoder, compiled=args.compiled, query_cache_size=0)
+        train, held_out = split_held_out(bot.training_data, args.held_out, seed=args.seed)
+        queries = held_out_queries(held_out, args.queries, seed=args.seed + 1)
+        for scale in args.scales:
+            result = benchmark_bot(bot, train, scale, queries, args.single_queries, args.batch_size, args.seed)
+            results.append(result)
+            print(f"{name:<10} x{scale:<5} n={result['corpus_size']:<7} train={result['train_s']:.3f}s "
+                  f"single p50/p99={result['single_p50_ms']:.3f}/{result['single_p99_ms']:.3f}ms "
+                  f"batch={result['batch_qps']:.0f}/s acc={result['accuracy']:.3f}", flush=True)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "encoder": args.encoder,
+            "compiled": args.compiled,
+            "seed": args.seed,
+            "queries": args.queries,
+            "held_out": args.held_out,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.latency_tolerance, args.accuracy_tolerance)
+        for regression in regressions:
+            print("REGRESSION", json.dumps(regression))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
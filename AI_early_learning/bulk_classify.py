@@ -0,0 +1,146 @@
+# Version: 1.0
+# Description: Classifies utterances in bulk without the interactive chat loop. Lines are streamed from
+# files or stdin in fixed-size batches through the chosen chatbot's batched prediction path, and one
+# {"text", "intent", "score", "response"} JSON line is written per utterance as soon as its batch is
+# done, so memory use stays flat however long the input is. Progress goes to stderr.
+#
+#   python bulk_classify.py logs.txt --bot chatbot_2 --output scored.jsonl
+#   cat logs.jsonl | python bulk_classify.py - --bot chatbot_3 --encoder stub --format jsonl
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+
+from chatbot_common.bots import BOT_MODULES, load_bot
+
+
+def _open_input(path):
+    if path == "-":
+        return sys.stdin
+    return open(path, encoding="utf-8")
+
+
+def read_utterances(paths, fmt="auto", text_field="text"):
+    """
+    Yields utterances from text or JSONL files, one line at a time. Blank lines are skipped.
+
+    Args:
+        paths (list): The files to read; "-" reads stdin.
+        fmt (str): "text" for one utterance per line, "jsonl" for JSON objects with a `text_field` key,
+            or "auto" to pick jsonl for files ending in .jsonl and text otherwise.
+        text_field (str): The key holding the utterance in JSONL input.
+    """
+    for path in paths:
+        jsonl = fmt == "jsonl" or (fmt == "auto" and path.endswith(".jsonl"))
+        f = _open_input(path)
+        try:
+            for line_number, line in enumerate(f, 1):
+                line = line.rstrip("\r\n")
+                if not line.strip():
+                    continue
+                if not jsonl:
+                    yield line
+                    continue
+                try:
+                    yield json.loads(line)[text_field]
+                except (ValueError, KeyError, TypeError) as error:
+                    raise ValueError(f"{path}:{line_number}: expected a JSON object with a {text_field!r} key: {error}")
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def classify_stream(bot, utterances, batch_size=256, respond=True):
+    """
+    Classifies utterances in batches and yields one result dict per utterance, in input order.
+
+    Args:
+        bot (object): A trained adapter from `chatbot_common.bots.load_bot`.
+        utterances (iterable): The texts to classify.
+        batch_size (int): The number of texts per prediction call.
+        respond (bool): Whether to pick a response for each intent.
+    """
+    utterances = iter(utterances)
+    while True:
+        batch = list(itertools.islice(utterances, batch_size))
+        if not batch:
+            return
+        intents, scores = bot.predict(batch)
+        for text, intent, score in zip(batch, intents, scores):
+            result = {"text": text, "intent": str(intent), "score": float(score)}
+            if respond:
+                result["response"] = bot.respond(intent)
+            yield result
+
+
+class Progress:
+    """
+    Prints the number of lines processed and the throughput to stderr at most every `interval` seconds.
+    """
+
+    def __init__(self, interval=5.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.count = 0
+        self.started = time.perf_counter()
+        self.last_report = self.started
+
+    def update(self, count=1):
+        self.count += count
+        now = time.perf_counter()
+        if self.interval and now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now=None):
+        seconds = (now or time.perf_counter()) - self.started
+        rate = self.count / seconds if seconds > 0 else 0.0
+        print(f"{self.count} lines in {seconds:.1f}s ({rate:.0f} lines/s)", file=self.stream, flush=True)
+        return {"lines": self.count, "seconds": seconds, "lines_per_s": rate}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify utterances from files or stdin into JSONL.")
+    parser.add_argument("paths", nargs="*", default=["-"], help="input files; '-' or nothing reads stdin")
+    parser.add_argument("--bot", default="chatbot_2", choices=sorted(BOT_MODULES))
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"],
+                        help="chatbot_3's encoder; 'hashed' and 'stub' run offline without downloading a model")
+    parser.add_argument("--compiled", action="store_true",
+                        help="serve chatbot_1/chatbot_2 through the compiled token-weight scorer")
+    parser.add_argument("--format", default="auto", choices=["auto", "text", "jsonl"])
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--output", help="write JSONL here instead of stdout")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--no-response", action="store_true", help="leave out the response field")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="seconds between progress lines; 0 disables")
+    parser.add_argument("--seed", type=int, help="seed the response choice for reproducible output")
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    bot = load_bot(args.bot, encoder=args.encoder, compiled=args.compiled)
+    bot.train()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    progress = Progress(args.progress_interval)
+    try:
+        utterances = read_utterances(args.paths, args.format, args.text_field)
+        for result in classify_stream(bot, utterances, args.batch_size, not args.no_response):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            progress.update()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        else:
+            out.flush()
+    summary = progress.report()
+    summary["bot"] = args.bot
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
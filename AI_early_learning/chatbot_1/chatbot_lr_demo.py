@@ -2,7 +2,11 @@
 # Version: 8/1/2025 / 1.0
 # Description: A simple chatbot that uses logistic regression for intent classification.
 
+import argparse
+import os
 import random
+import sys
+import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.linear_model import LogisticRegression
 
@@ -15,39 +19,71 @@ def train_chatbot(training_data):
     model.fit(X, labels)
     return model, v
 
-def chat(model, vectorizer, responses):
+def predict_intents(model, vectorizer, texts):
+    """Classifies a batch of texts with one transform and one predict_proba call.
+    Returns an array of intents and an array of their probabilities."""
+    probabilities = model.predict_proba(vectorizer.transform(list(texts)))
+    best = probabilities.argmax(axis=1)
+    return model.classes_[best], probabilities[np.arange(len(best)), best]
+
+def chat(model, vectorizer, responses, metrics=None):
+    # metrics is optional, e.g. chatbot_common.metrics.Metrics; timer() is None when not sampled
     print("Chatbot: Type 'quit' to exit this program")
     while True:
         user_input = input("You: ")
         if user_input.lower() == "quit":
             print("ChatBot: Goodbye!")
             break
+        timer = metrics.timer() if metrics is not None else None
         X_test = vectorizer.transform([user_input])
+        if timer:
+            timer.lap("vectorize")
         intent = model.predict(X_test)[0]
+        if timer:
+            timer.lap("predict")
         reply = random.choice(responses.get(intent, ["I'm not sure how to respond to that."]))
+        if timer:
+            timer.lap("respond")
+        if metrics is not None:
+            metrics.count_intent(intent)
         print("ChatBot:", reply)
 
+training_data = [
+    ("hi", "greeting"),
+    ("hello", "greeting"),
+    ("how are you", "ask_status"),
+    ("bye", "farewell"),
+    ("thank you", "gratitude"),
+    ("good", "feeling_ok"),
+    ("i'm good", "feeling_ok"),
+    ("i'm fine", "feeling_ok"),
+    ("doing well", "feeling_ok")
+]
+
+responses = {
+    "greeting": ["Hello!", "Hi there!"],
+    "ask_status": ["I'm doing great, how about you?"],
+    "farewell": ["Goodbye!", "See you later!"],
+    "gratitude": ["You're welcome!", "Anytime!"],
+    "feeling_ok": ["Glad to hear that!", "That's great!", "Awesome!"]
+
+}
+
 if __name__ == "__main__":
-    training_data = [
-        ("hi", "greeting"),
-        ("hello", "greeting"),
-        ("how are you", "ask_status"),
-        ("bye", "farewell"),
-        ("thank you", "gratitude"),
-        ("good", "feeling_ok"),
-        ("i'm good", "feeling_ok"),
-        ("i'm fine", "feeling_ok"),
-        ("doing well", "feeling_ok")
-    ]
-
-    responses = {
-        "greeting": ["Hello!", "Hi there!"],
-        "ask_status": ["I'm doing great, how about you?"],
-        "farewell": ["Goodbye!", "See you later!"],
-        "gratitude": ["You're welcome!", "Anytime!"],
-        "feeling_ok": ["Glad to hear that!", "That's great!", "Awesome!"]
-
-    }
-
-    model, vectorizer = train_chatbot(training_data)
-    chat(model, vectorizer, responses)
+    # Reuse the model fitted by an earlier run unless the training data has changed since
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(here))
+    from chatbot_common.artifacts import load_or_train
+    from chatbot_common.metrics import add_metrics_arguments, metrics_from_args
+
+    parser = argparse.ArgumentParser(description="Chat with the logistic regression chatbot.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics, dumper = metrics_from_args(args, "chatbot_1")
+
+    model, vectorizer, _ = load_or_train(os.path.join(here, ".model_cache"), training_data, train_chatbot)
+    try:
+        chat(model, vectorizer, responses, metrics)
+    finally:
+        if dumper is not None:
+            dumper.stop()
@@ -2,10 +2,12 @@
 # Version: 8/4/25 / 1.1
 # Description: A simple chatbot that uses machine learning to classify user input into predefined intents and respond accordingly.
 
+import argparse
+import os
 import random
 import string
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+import sys
+import numpy as np
 
 import string
 
@@ -13,6 +15,10 @@ def preprocess(text):
     return text.lower().translate(str.maketrans('', '', string.punctuation))
 
 def train_chatbot(data):
+    # Imported here so that serving a saved compiled scorer does not need scikit-learn
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
     x = [preprocess(item[0]) for item in data] # Phrases
     y = [item[1] for item in data] # Intents
 
@@ -24,79 +30,124 @@ def train_chatbot(data):
 
     return model, v
 
-def chat(model, vectorizer):
+def predict_intents(model, vectorizer, texts):
+    x = [preprocess(text) for text in texts]
+    probabilities = model.predict_proba(vectorizer.transform(x)) # One transform for the whole batch
+    best = probabilities.argmax(axis=1)
+
+    return model.classes_[best], probabilities[np.arange(len(best)), best]
+
+responses = {
+    "greeting": ["Hello!", "Hi there!", "Hey!", "Greetings!", "How can I help you!", "Howdy there!"],
+    "ask_status": ["I'm doing great, how about you?", "All good here, thanks for asking!", "Just fine, what about you?", "Still swinging, how about yourself?"],
+    "farewell": ["Goodbye!", "See you later!", "Take care!", "Catch you later!", "Peace out!", "See yah!", "Have a good day!"],
+    "gratitude": ["You're welcome!", "Anytime!", "No problem!", "Glad to help!", "My pleasure!", "Glad to be of service!", "Always glad to help!"],
+    "response_status": ["Glad to hear that!", "That's great!", "Awesome!", "Good to know!", "Happy to hear that!", "Nice to hear!"],
+    "unknown": ["I'm not sure how to respond to that.", "Could you please rephrase?", "I didn't quite get that.", "Can you clarify?", "I'm not sure what you mean."]
+}
+
+def chat(model, vectorizer=None, metrics=None):
+    # model is a fitted classifier with its vectorizer, or a compiled scorer
+    # (chatbot_common.compiled.CompiledScorer) that takes the preprocessed text directly
     print("Chatbot: Type 'quit' to exit this program")
 
-    responses = {
-        "greeting": ["Hello!", "Hi there!", "Hey!", "Greetings!", "How can I help you!", "Howdy there!"],
-        "ask_status": ["I'm doing great, how about you?", "All good here, thanks for asking!", "Just fine, what about you?", "Still swinging, how about yourself?"],
-        "farewell": ["Goodbye!", "See you later!", "Take care!", "Catch you later!", "Peace out!", "See yah!", "Have a good day!"],
-        "gratitude": ["You're welcome!", "Anytime!", "No problem!", "Glad to help!", "My pleasure!", "Glad to be of service!", "Always glad to help!"],
-        "response_status": ["Glad to hear that!", "That's great!", "Awesome!", "Good to know!", "Happy to hear that!", "Nice to hear!"],
-        "unknown": ["I'm not sure how to respond to that.", "Could you please rephrase?", "I didn't quite get that.", "Can you clarify?", "I'm not sure what you mean."]
-    }
-
     while True:
-        user_input = preprocess(input("You: "))
+        raw_input = input("You: ")
+        timer = metrics.timer() if metrics is not None else None # None unless this message is sampled
+        user_input = preprocess(raw_input)
+        if timer:
+            timer.lap("preprocess")
 
         if user_input == "quit":
             print("ChatBot: Goodbye!")
             break
 
-        input_vector = vectorizer.transform([user_input])
-
-        input_vector = vectorizer.transform([user_input])
-        intent = model.predict(input_vector)[0]
+        if vectorizer is None:
+            intent = model.predict([user_input])[0]
+        else:
+            input_vector = vectorizer.transform([user_input])
+            if timer:
+                timer.lap("vectorize")
+            intent = model.predict(input_vector)[0]
+        if timer:
+            timer.lap("predict")
 
         if intent in responses:
-            print("ChatBot:", random.choice(responses[intent]))
+            reply = random.choice(responses[intent])
         else:
-            print("ChatBot:", random.choice(responses["unknown"]))
+            reply = random.choice(responses["unknown"])
+        if timer:
+            timer.lap("respond")
+        if metrics is not None:
+            metrics.count_intent(intent)
+        print("ChatBot:", reply)
 
         
 
+training_data = [
+    ("hello", "greeting"),
+    ("hi", "greeting"),
+    ("hey there", "greeting"),
+    ("howdy", "greeting"),
+    ("greetings", "greeting"),
+    ("what's up", "greeting"),
+
+    ("how are you", "ask_status"),
+    ("how's it going", "ask_status"),
+    ("what's cooking", "ask_status"),
+    ("you good?", "ask_status"),
+    ("how is everything", "ask_status"),
+
+    ("bye", "farewell"),
+    ("see you later", "farewell"),
+    ("farewell", "farewell"),
+    ("take care", "farewell"),
+    ("peace out", "farewell"),
+    ("see yah", "farewell"),
+
+    ("thank you", "gratitude"),
+    ("thanks", "gratitude"), 
+    ("much appreciated", "gratitude"),
+    ("much obliged", "gratitude"),
+    ("i appreciate it", "gratitude"),
+    ("i'm grateful", "gratitude"),
+
+    ("i'm doing fine", "response_status"),
+    ("i'm okay", "response_status"),
+    ("feeling great", "response_status"),
+    ("i feel sad", "response_status"),
+    ("i'm really mad", "response_status"),
+    ("i'm happy", "response_status"),
+    ("i'm excited", "response_status"),
+    ("i'm bored", "response_status"),
+    ("i'm tired", "response_status"),
+    ("i'm confused", "response_status"),
+    ("i'm chilling", "response_status"),
+    ("i'm stressed", "response_status")
+]
+
 if __name__ == "__main__":
-    training_data = [
-        ("hello", "greeting"),
-        ("hi", "greeting"),
-        ("hey there", "greeting"),
-        ("howdy", "greeting"),
-        ("greetings", "greeting"),
-        ("what's up", "greeting"),
-
-        ("how are you", "ask_status"),
-        ("how's it going", "ask_status"),
-        ("what's cooking", "ask_status"),
-        ("you good?", "ask_status"),
-        ("how is everything", "ask_status"),
-
-        ("bye", "farewell"),
-        ("see you later", "farewell"),
-        ("farewell", "farewell"),
-        ("take care", "farewell"),
-        ("peace out", "farewell"),
-        ("see yah", "farewell"),
-
-        ("thank you", "gratitude"),
-        ("thanks", "gratitude"), 
-        ("much appreciated", "gratitude"),
-        ("much obliged", "gratitude"),
-        ("i appreciate it", "gratitude"),
-        ("i'm grateful", "gratitude"),
-
-        ("i'm doing fine", "response_status"),
-        ("i'm okay", "response_status"),
-        ("feeling great", "response_status"),
-        ("i feel sad", "response_status"),
-        ("i'm really mad", "response_status"),
-        ("i'm happy", "response_status"),
-        ("i'm excited", "response_status"),
-        ("i'm bored", "response_status"),
-        ("i'm tired", "response_status"),
-        ("i'm confused", "response_status"),
-        ("i'm chilling", "response_status"),
-        ("i'm stressed", "response_status")
-    ]
-
-    model, vectorizer = train_chatbot(training_data)
-    chat(model, vectorizer)
+    # Reuse the model fitted by an earlier run unless the training data has changed since
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(here))
+    from chatbot_common.artifacts import load_or_compile, load_or_train
+    from chatbot_common.metrics import add_metrics_arguments, metrics_from_args
+
+    parser = argparse.ArgumentParser(description="Chat with the TF-IDF chatbot.")
+    parser.add_argument("--sklearn", action="store_true",
+                        help="serve through the fitted sklearn pipeline instead of the compiled token-weight scorer")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics, dumper = metrics_from_args(args, "chatbot_2")
+
+    cache = os.path.join(here, ".model_cache")
+    if args.sklearn:
+        model, vectorizer, _ = load_or_train(cache, training_data, train_chatbot)
+    else:
+        # The compiled scorer loads without scikit-learn once a previous run has saved it
+        (model, _), vectorizer = load_or_compile(cache, training_data, train_chatbot), None
+    try:
+        chat(model, vectorizer, metrics)
+    finally:
+        if dumper is not None:
+            dumper.stop()
@@ -0,0 +1,164 @@
+# Version: 1.0
+# Description: A cheap lexical first stage for IntelligentChatBot's cascade mode. Messages the lexical
+# model is confident about are answered without an encoder call; only the rest are escalated to SBERT.
+# Run this file to see the lexical confidences on held-out phrases and the escalation rate and accuracy
+# of cascade thresholds taken from their distribution, against SBERT-only scoring.
+
+import argparse
+import json
+
+import numpy as np
+
+from phrase_index import PhraseIndex
+
+
+class LexicalStage:
+    """
+    An exact-match table in front of a TF-IDF + logistic regression model (the same pipeline as
+    chatbot_2's `train_chatbot`), both fitted on the chatbot's preprocessed training phrases.
+
+    An exact match scores 1.0; otherwise the confidence is the model's top class probability.
+    """
+
+    def __init__(self, C=1.0):
+        """
+        Args:
+            C (float): The inverse regularization strength of the logistic regression.
+        """
+        self.C = C
+        self.exact = PhraseIndex()
+        self.vectorizer = None
+        self.model = None
+
+    def fit(self, phrases, intents):
+        """
+        Fits the stage on preprocessed phrases and their intents.
+
+        Args:
+            phrases (list): The preprocessed training phrases.
+            intents (list): The intent of every phrase.
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        self.exact = PhraseIndex().build(phrases, intents)
+
+        self.vectorizer, self.model = None, None
+        if len(set(intents)) > 1:
+            vectorizer = TfidfVectorizer()
+            model = LogisticRegression(C=self.C)
+            model.fit(vectorizer.fit_transform(phrases), intents)
+            self.vectorizer, self.model = vectorizer, model
+        return self
+
+    def predict(self, phrases):
+        """
+        Classifies preprocessed phrases.
+
+        Args:
+            phrases (list): The preprocessed texts.
+
+        Returns:
+            tuple: An object array of intents and a float32 array of confidences between 0 and 1.
+                Phrases the stage cannot score get "unknown" and 0.
+        """
+        found = [self.exact.lookup(p) for p in phrases]
+        intents = np.array([intent or "unknown" for intent in found], dtype=object)
+        confidences = np.array([0.0 if intent is None else 1.0 for intent in found], dtype=np.float32)
+
+        rest = np.flatnonzero(confidences < 1.0)
+        if len(rest) and self.model is not None:
+            probabilities = self.model.predict_proba(self.vectorizer.transform([phrases[i] for i in rest]))
+            best = probabilities.argmax(axis=1)
+            intents[rest] = self.model.classes_[best]
+            confidences[rest] = probabilities[np.arange(len(best)), best]
+        return intents, confidences
+
+
+DEFAULT_QUANTILES = (0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+def evaluate_cascade(bot, texts, labels, cascade_thresholds=None, threshold=0.5, quantiles=DEFAULT_QUANTILES,
+                     stage=None):
+    """
+    Compares cascades at several thresholds with SBERT-only scoring, encoding each text only once.
+
+    The lexical model's confidence on phrases it was not trained on is usually far below 1, so fixed
+    thresholds such as 0.5 can escalate every message. By default the thresholds are instead quantiles of
+    the confidences measured on `texts`: the threshold at quantile q escalates about a share q of them.
+
+    Args:
+        bot (IntelligentChatBot): A ready chatbot.
+        texts (list): The input texts, ideally phrases held out of the chatbot's training data.
+        labels (list): The expected intent of every text.
+        cascade_thresholds (list): The lexical confidences below which a text is escalated. None takes
+            them from `quantiles`.
+        threshold (float): The minimum similarity for an SBERT match.
+        quantiles (tuple): The quantiles of the measured confidences used as thresholds when
+            `cascade_thresholds` is None.
+        stage (LexicalStage): The lexical stage to evaluate. None uses the chatbot's cascade, or fits one
+            on its training phrases.
+
+    Returns:
+        list: One dict per cascade threshold with the quantile it came from (None for given thresholds),
+            its escalation rate, its accuracy, SBERT-only accuracy, and how often the cascade agrees with SBERT.
+    """
+    bot.wait_until_ready()
+    labels = np.asarray(labels, dtype=object)
+    phrases = [bot.preprocess(t) for t in texts]
+    stage = stage or bot.cascade or LexicalStage().fit(bot.phrases, bot.intents)
+    lexical, confidences = stage.predict(phrases)
+    sbert, _ = bot.classify_embeddings(bot.model.encode(phrases), threshold)
+    sbert_accuracy = float((sbert == labels).mean()) if len(labels) else 0.0
+
+    if cascade_thresholds is None:
+        cascade_thresholds = np.quantile(confidences, quantiles) if len(labels) else []
+    else:
+        quantiles = [None] * len(cascade_thresholds)
+
+    report = []
+    for quantile, cascade_threshold in zip(quantiles, cascade_thresholds):
+        escalated = confidences < cascade_threshold
+        predicted = np.where(escalated, sbert, lexical)
+        report.append({
+            "quantile": quantile,
+            "cascade_threshold": float(cascade_threshold),
+            "escalation_rate": float(escalated.mean()) if len(labels) else 0.0,
+            "accuracy": float((predicted == labels).mean()) if len(labels) else 0.0,
+            "sbert_accuracy": sbert_accuracy,
+            "agreement_with_sbert": float((predicted == sbert).mean()) if len(labels) else 0.0,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from chatbot_learning_demo import IntelligentChatBot, responses, training_data
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from chatbot_common.corpus import held_out_queries, split_held_out
+
+    parser = argparse.ArgumentParser(description="Compare cascade thresholds with SBERT-only scoring on held-out phrases.")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=None,
+                        help="fixed thresholds to compare instead of quantiles of the measured confidences")
+    parser.add_argument("--quantiles", type=float, nargs="+", default=list(DEFAULT_QUANTILES))
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--held-out", type=float, default=0.2,
+                        help="share of each intent's phrases kept out of the training data and used to build the queries")
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    args = parser.parse_args()
+
+    # The lexical model scores its own training phrases near 1, so measure it on phrases it has not seen.
+    train, held_out = split_held_out(training_data, args.held_out)
+    bot = IntelligentChatBot(train, responses, encoder=args.encoder, fast_path=False)
+    queries = held_out_queries(held_out, args.queries)
+    texts, labels = [q for q, _ in queries], [i for _, i in queries]
+
+    stage = LexicalStage().fit(bot.phrases, bot.intents)
+    _, confidences = stage.predict([bot.preprocess(t) for t in texts])
+    print(json.dumps({"lexical_confidence": {f"p{round(q * 100)}": float(np.quantile(confidences, q))
+                                             for q in (0.5, 0.9, 0.99)}}))
+    for row in evaluate_cascade(bot, texts, labels, args.thresholds, quantiles=args.quantiles, stage=stage):
+        print(json.dumps(row))
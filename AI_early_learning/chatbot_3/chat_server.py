@@ -0,0 +1,365 @@
+# Version: 1.0
+# Description: A small asyncio HTTP/JSON server for IntelligentChatBot. Concurrent requests are
+# collected into micro-batches so each batch costs one encoder call, which runs off the event loop.
+#
+#   python chat_server.py --port 8080
+#   curl -s localhost:8080/chat -d '{"text": "hi there"}'
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BadRequest(Exception):
+    """
+    A request that cannot be parsed. The server answers it with `status` and closes the connection.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """
+    Groups concurrently submitted items into batches and processes each batch with one call.
+
+    A batch is closed when it reaches `max_batch_size` items or when `max_wait` seconds have passed
+    since its first item arrived, whichever comes first, which bounds the latency added by batching.
+    """
+
+    def __init__(self, process_batch, max_batch_size=32, max_wait=0.005, executor=None):
+        """
+        Args:
+            process_batch (callable): Takes a list of items and returns a list of results in the same order.
+                It runs in `executor`, so it may block.
+            max_batch_size (int): The largest number of items processed together.
+            max_wait (float): The longest time in seconds the first item of a batch waits for company.
+            executor (Executor): Where batches run. Defaults to a single worker thread so that
+                encoder calls never overlap.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+
+        self.queue = None
+        self.worker = None
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = {}
+
+    def start(self):
+        """
+        Starts the batching task on the running event loop.
+        """
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Cancels the batching task and shuts down the executor.
+        """
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, item):
+        """
+        Queues an item and waits for its result.
+
+        Args:
+            item (object): The input passed to `process_batch` as part of a batch.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Pick up anything that is already waiting without extending the deadline.
+            while len(batch) < self.max_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        """
+        Returns the number of batches and items processed and the batch size distribution.
+        """
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
+
+
+class ChatServer:
+    """
+    Serves `predict_intent`/`get_response` over HTTP/1.1 with keep-alive.
+
+    Endpoints:
+        POST /chat   {"text": "..."} -> {"intent": ..., "score": ..., "response": ...}
+        GET  /health -> {"status": "ok"}
+        GET  /stats  -> request and micro-batch counters
+        GET  /metrics -> the bot's stage timings and intent counts in Prometheus text format,
+                         when the bot was built with `metrics`
+    """
+
+    MAX_BODY = 64 * 1024
+    # The longest request or header line, in bytes, and the most header lines in one request.
+    MAX_LINE = 8 * 1024
+    MAX_HEADERS = 100
+
+    def __init__(self, bot, threshold=0.5, max_batch_size=32, max_wait=0.005):
+        """
+        Args:
+            bot (IntelligentChatBot): The chatbot used to answer requests.
+            threshold (float): The minimum similarity for an intent match.
+            max_batch_size (int): The largest number of messages encoded together.
+            max_wait (float): The longest time in seconds a message waits for a batch to fill.
+        """
+        self.bot = bot
+        self.threshold = threshold
+        self.batcher = MicroBatcher(self._answer_batch, max_batch_size, max_wait)
+        self.server = None
+        self.requests = 0
+        self.errors = 0
+        self.started_at = None
+
+    def _answer_batch(self, texts):
+        intents, scores = self.bot.predict_intents(texts, self.threshold)
+        return [
+            {"intent": str(intent), "score": float(score), "response": self.bot.get_response(intent)}
+            for intent, score in zip(intents, scores)
+        ]
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """
+        Starts listening. The returned server is also kept on `self.server`.
+
+        Args:
+            host (str): The interface to bind.
+            port (int): The port to bind, or 0 for any free port.
+        """
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle_connection, host, port, limit=self.MAX_LINE)
+        self.started_at = time.monotonic()
+        return self.server
+
+    async def stop(self):
+        """
+        Stops accepting connections and shuts down the batcher.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except BadRequest as error:
+            # The rest of the stream cannot be trusted, so answer and close.
+            self.errors += 1
+            self._write_response(writer, error.status, {"error": str(error)}, keep_alive=False)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_line(reader, what, status):
+        # readline raises ValueError when a line is longer than the stream's limit (MAX_LINE).
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise BadRequest(f"{what} is longer than the server's limit", status=status) from None
+
+    async def _read_request(self, reader):
+        line = await self._read_line(reader, "request line", 400)
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise BadRequest("malformed request line")
+        method, path, _ = parts
+
+        headers = {}
+        for count in itertools.count():
+            line = await self._read_line(reader, "a header line", 431)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if count >= self.MAX_HEADERS:
+                raise BadRequest(f"more than {self.MAX_HEADERS} headers", status=431)
+            name, colon, value = line.decode("latin-1").partition(":")
+            if not colon or not name.strip():
+                raise BadRequest("malformed header line")
+            headers[name.strip().lower()] = value.strip()
+
+        length = headers.get("content-length", "0")
+        if not (length.isascii() and length.isdigit()):
+            raise BadRequest(f"invalid Content-Length {length!r}")
+        length = int(length)
+        if length > self.MAX_BODY:
+            raise BadRequest(f"request body is larger than {self.MAX_BODY} bytes", status=413)
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _route(self, method, path, body):
+        self.requests += 1
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok"}
+        if path == "/metrics" and method == "GET":
+            metrics = getattr(self.bot, "metrics", None)
+            if metrics is None:
+                return 404, {"error": "metrics are not enabled"}
+            return 200, metrics.to_prometheus()
+        if path == "/stats" and method == "GET":
+            uptime = time.monotonic() - self.started_at
+            return 200, {"requests": self.requests, "errors": self.errors, "uptime_s": uptime,
+                         "batching": self.batcher.stats()}
+        if path != "/chat":
+            return 404, {"error": "not found"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        try:
+            text = json.loads(body or b"{}")["text"]
+            if not isinstance(text, str):
+                raise TypeError("text must be a string")
+        except (ValueError, KeyError, TypeError) as error:
+            self.errors += 1
+            return 400, {"error": f"expected a JSON object with a 'text' string: {error}"}
+
+        try:
+            return 200, await self.batcher.submit(text)
+        except Exception as error:
+            self.errors += 1
+            return 500, {"error": str(error)}
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+
+async def serve(bot, host, port, **kwargs):
+    """
+    Runs a ChatServer until the task is cancelled.
+
+    Args:
+        bot (IntelligentChatBot): The chatbot used to answer requests.
+        host (str): The interface to bind.
+        port (int): The port to bind.
+        **kwargs: Passed on to ChatServer.
+    """
+    server = ChatServer(bot, **kwargs)
+    listener = await server.start(host, port)
+    print(f"Sora: Listening on http://{host}:{listener.sockets[0].getsockname()[1]}")
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    from chatbot_learning_demo import IntelligentChatBot, responses, training_data
+    from data_files import DataFileWatcher, load_responses, load_training_data
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from chatbot_common.metrics import add_metrics_arguments, metrics_from_args
+
+    parser = argparse.ArgumentParser(description="Serve IntelligentChatBot over HTTP/JSON with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--training-data", help="load the training data from this file (see data_files.py) and hot-reload it on change")
+    parser.add_argument("--responses", help="load the responses from this JSON file and hot-reload it on change")
+    parser.add_argument("--reload-interval", type=float, default=2.0, help="seconds between checks of the data files")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    # Without --metrics-sample-rate, /metrics answers 404.
+    metrics, dumper = metrics_from_args(args, "chatbot_3")
+
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache")
+    watcher = None
+    if args.training_data:
+        training_data = load_training_data(args.training_data)
+    if args.responses:
+        responses = load_responses(args.responses)
+    bot = IntelligentChatBot(training_data, responses, cache_dir=cache_dir, metrics=metrics)
+    if args.training_data or args.responses:
+        # Each file is watched on its own; the other data stays as built in.
+        watcher = DataFileWatcher(bot, args.training_data, args.responses, args.reload_interval).start()
+    try:
+        asyncio.run(serve(bot, args.host, args.port, threshold=args.threshold,
+                          max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if dumper is not None:
+            dumper.stop()
+        if watcher is not None:
+            watcher.stop()
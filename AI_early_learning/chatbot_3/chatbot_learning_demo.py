@@ -4,10 +4,51 @@
 # sentence embeddings from the SentenceTransformers library (SBERT) to understand 
 # user input and predict intents based on similarity to predefined training phrases. 
 
+import argparse
+import copy
+import json
+import os
 import string
 import random
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import sys
+import threading
+import time
+from collections import Counter
+import numpy as np
+
+from cascade import LexicalStage
+from compaction import describe_conflicts, find_near_duplicates
+from embedding_store import EmbeddingStore
+from encoders import SentenceTransformerEncoder, encoder_spec, make_encoder
+from intent_index import RowBuffer, load_index, make_index, normalize_rows
+from phrase_index import STOPWORDS, PhraseIndex
+from projection import load_projection, make_projection
+from prototypes import build_prototypes
+from query_cache import QueryEmbeddingCache
+
+# The scripts in this folder run with only the folder itself on sys.path; chatbot_common sits next to it.
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+from chatbot_common.artifacts import training_data_hash
+
+# Version of the directory layout written by IntelligentChatBot.save.
+ARTIFACT_VERSION = 1
+
+
+def load_sentence_transformer(model_name):
+    """
+    Imports sentence_transformers (and with it torch) on first use and loads a model.
+
+    Args:
+        model_name (str): The name of the sentence transformer model to load.
+
+    Returns:
+        tuple: The loaded model (an `encoders.SentenceTransformerEncoder`), the seconds spent importing,
+            and the seconds spent loading.
+    """
+    encoder = SentenceTransformerEncoder(model_name)
+    return encoder, encoder.import_s, encoder.load_s
 
 class IntelligentChatBot:
     """
@@ -18,24 +59,765 @@ class IntelligentChatBot:
     It then compares similarity scores to predict the closest matching intent and respond accordingly.
     """
 
-    def __init__(self, training_data, responses):
+    def __init__(self, training_data, responses, model_name="all-MiniLM-L6-v2", cache_dir=None, index="exact",
+                 scoring="phrase", prototypes_per_intent=1,
+                 query_cache_size=1024, query_cache_ttl=None, query_cache_policy="lru",
+                 model=None, background=False, storage_dtype="float32", metrics=None, embeddings=None,
+                 cascade_threshold=None, fast_path=True, fast_path_stopwords=False, encoder="sbert",
+                 projection=None, projection_dim=128):
         """
         Initializes the chatbot with training data and predefined responses.
 
         Args:
             training_data (list): A list of tuples containing phrases and their corresponding intents.
             responses (dict): A dictionary mapping intents to lists of possible responses.
+            model_name (str): The name of the sentence transformer model to load.
+            cache_dir (str): Optional directory for the on-disk embedding cache. When set, only
+                phrases that have not been encoded by this model before are run through it.
+            index (str or object): The nearest-neighbour backend used for lookups, either a name from
+                `intent_index.INDEX_TYPES` ("exact" or "ivf") or an index instance. An instance that is
+                already built over the normalized training phrases (see `load`) is used without rebuilding.
+            scoring (str): "phrase" to match queries against every training phrase, or "prototype"
+                to match them against a few prototype vectors per intent.
+            prototypes_per_intent (int): The number of prototypes per intent in "prototype" scoring.
+            query_cache_size (int): The number of query embeddings to cache, or 0 to disable the cache.
+            query_cache_ttl (float): Seconds a cached query embedding stays valid, or None for no expiry.
+            query_cache_policy (str): The cache's eviction policy, "lru" or "fifo".
+            model (object): An already loaded encoder with an `encode` method. Overrides `encoder`.
+            background (bool): Load the model and encode the corpus on a background thread. Until that
+                finishes, predictions fall back to lexical matching against the training phrases.
+            storage_dtype (str): How the index stores normalized embeddings: "float32", or "float16"
+                or per-vector-scaled "int8" to cut memory 2x or 4x. Only applies when `index` is a name.
+                In "phrase" scoring a compact index is the only copy of the corpus vectors that is kept:
+                the float32 embeddings are dropped once it is built (see `memory_report`).
+            metrics (object): Optional per-stage timing and intent counters, such as
+                `chatbot_common.metrics.Metrics`. Stages are "preprocess", "embed", "score" and "respond".
+                A sampled batch records each stage's time per message it handled.
+            embeddings (array): Precomputed encoder embeddings of the training phrases, one row per phrase,
+                e.g. from a saved artifact. They replace the corpus encode at startup.
+            cascade_threshold (float): Enables cascade mode: messages are first scored by a TF-IDF +
+                logistic regression stage (see `cascade.LexicalStage`), and only those whose confidence is
+                below this threshold are embedded. None scores every message with the encoder. The stage is
+                fitted during warm-up (on the background thread when `background` is set). Its confidences
+                on unseen phrases are often far below 1, so pick the threshold from their distribution;
+                `cascade.py` prints it.
+            fast_path (bool): Answer messages that are a training phrase (after preprocessing and
+                whitespace collapsing) straight from a hash index, with score 1.0 and no encoder call.
+                Phrases labelled with several intents resolve to the most frequent, then the earliest.
+            fast_path_stopwords (bool): Also match training phrases when they differ from the message only
+                in stopwords such as "please" or "just" (see `phrase_index.STOPWORDS`).
+            encoder (str or dict): The encoder backend when no `model` is given: "sbert" (loads `model_name`),
+                "hashed" (NumPy character/word n-gram hashing) or "stub", or a config dict such as
+                {"backend": "hashed", "dim": 1024}. See `encoders.ENCODER_BACKENDS`.
+            projection (str or object): Shrinks embeddings before they are indexed and searched: "pca"
+                (fitted on the training embeddings at warm-up) or "random", or a projection instance from
+                `projection.py`, used as-is if already fitted. None searches at the encoder's full width.
+                Later edits and reloads keep the fitted projection.
+            projection_dim (int): The width a named projection reduces to.
         """
-        self.training_data = training_data
+        if scoring not in ("phrase", "prototype"):
+            raise ValueError(f"Unknown scoring mode {scoring!r}; expected 'phrase' or 'prototype'")
+
+        started = time.perf_counter()
+        self.training_data = list(training_data)
         self.responses = responses
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        if model is None:
+            spec = encoder_spec(encoder, model_name)
+            if spec["backend"] == "sbert":
+                model_name = spec["model_name"]
+            else:
+                # Only the SBERT model is slow to load; the other backends are built right away.
+                model = make_encoder(spec)
+        self.model_name = model_name
+        self.model = model
+        # The backend and its settings, recorded with cached and saved embeddings. An encoder without
+        # a `config()` cannot be rebuilt from it, so its config is None.
+        if model is None:
+            self.encoder_config = spec
+        else:
+            self.encoder_config = model.config() if callable(getattr(model, "config", None)) else None
+        self.encoder_name = getattr(model, "name", None) or model_name
+        self.metrics = metrics
+        self.scoring = scoring
+        self.prototypes_per_intent = prototypes_per_intent
+        self.store = EmbeddingStore(cache_dir, self.encoder_name) if cache_dir else None
+        self.projection = make_projection(projection, projection_dim) if projection is not None else None
 
         self.phrases = [self.preprocess(item[0]) for item in training_data]
         self.intents = [item[1] for item in training_data]
 
-        self.embedding = self.model.encode(self.phrases)
+        # The lexical tables are cheap to build and answer requests while the model warms up.
+        self.fast_path = fast_path
+        self.fast_path_hits = 0
+        self._phrase_stopwords = STOPWORDS if fast_path_stopwords else None
+        self._build_lexical_tables()
+
+        self.cascade_threshold = cascade_threshold
+        # Fitted by _warm_up; predictions only use it once the chatbot is ready.
+        self.cascade = None
+        self.cascade_stale = False
+        self.cascade_answered = 0
+        self.escalations = 0
+
+        # Rows live in growable buffers so that add_examples/remove_examples can edit them in place.
+        self._intent_rows = RowBuffer(np.array(self.intents, dtype=object))
+        self._embedding_rows = None
+        self._edit_lock = threading.Lock()
+        # The index and the intent of each of its rows, in one tuple so a reload can swap both at once.
+        self._search = (None, None)
+
+        self.query_cache = None
+        if query_cache_size:
+            self.query_cache = QueryEmbeddingCache(query_cache_size, query_cache_ttl, query_cache_policy)
+
+        self.ready = threading.Event()
+        self.warm_up_done = threading.Event()
+        self.warm_up_error = None
+        self.fallback_predictions = 0
+        self.startup_timings = {"setup_s": time.perf_counter() - started}
+        if background:
+            self.warm_up_thread = threading.Thread(
+                target=self._warm_up, args=(index, prototypes_per_intent, storage_dtype, embeddings),
+                name="chatbot-warm-up", daemon=True)
+            self.warm_up_thread.start()
+        else:
+            self.warm_up_thread = None
+            self._warm_up(index, prototypes_per_intent, storage_dtype, embeddings)
+
+    @property
+    def embedding(self):
+        """
+        The encoder's embeddings of the training phrases, one row per phrase. None when a compact
+        phrase index holds the only copy of them (see `storage_dtype`); use `normalized` instead.
+        """
+        return None if self._embedding_rows is None else self._embedding_rows.view
+
+    @property
+    def normalized(self):
+        """
+        The training embeddings in the search space (see `project`), as a new float32 array on every
+        access, read back from the index when the raw embeddings were dropped.
+        """
+        if self._embedding_rows is not None:
+            return self.project(self.embedding)
+        if self.scoring == "phrase" and self.index is not None:
+            return self.index.vectors()
+        return None
+
+    @property
+    def intent_labels(self):
+        """
+        An object array of the intent of every training phrase.
+        """
+        return self._intent_rows.view
+
+    @property
+    def index(self):
+        """
+        The nearest-neighbour index over the normalized training phrases or intent prototypes.
+        """
+        return self._search[0]
+
+    @property
+    def index_labels(self):
+        """
+        An object array of the intent of every row in the index.
+        """
+        label_rows = self._search[1]
+        return None if label_rows is None else label_rows.view
+
+    def _build_lexical_tables(self):
+        self.phrase_index = PhraseIndex(self._phrase_stopwords).build(self.phrases, self.intents)
+        self.phrase_tokens = [frozenset(phrase.split()) for phrase in self.phrases]
+        self._row_ids, self._phrase_rows, self._next_row_id = self._row_lookup(self.phrases)
+
+    @staticmethod
+    def _row_lookup(phrases):
+        """
+        Returns stable ids for the rows of `phrases`: the id at every row position (ascending, so a
+        binary search maps an id back to its position), the ids of each phrase's rows, and the next id.
+        """
+        phrase_rows = {}
+        for row, phrase in enumerate(phrases):
+            phrase_rows.setdefault(phrase, []).append(row)
+        return RowBuffer(np.arange(len(phrases), dtype=np.int64)), phrase_rows, len(phrases)
+
+    def _warm_up(self, index, prototypes_per_intent, storage_dtype, embeddings=None):
+        """
+        Loads the model, encodes the training phrases and builds the index, recording how long each step took.
+        """
+        timings = self.startup_timings
+        try:
+            if self.model is None:
+                self.model, timings["import_s"], timings["model_load_s"] = load_sentence_transformer(self.model_name)
+            else:
+                timings["import_s"] = timings["model_load_s"] = 0.0
+
+            dtype = storage_dtype if isinstance(index, str) else index.dtype
+            keep_embeddings = self.scoring == "prototype" or dtype == "float32"
+            prebuilt = not isinstance(index, str) and len(index) > 0
+
+            start = time.perf_counter()
+            if embeddings is not None:
+                if len(embeddings) != len(self.phrases):
+                    raise ValueError(f"Got {len(embeddings)} embeddings for {len(self.phrases)} training phrases")
+                embedding = embeddings
+            elif prebuilt and not keep_embeddings and (self.projection is None or self.projection.fitted):
+                # The saved compact index is all that would be kept, so there is nothing to encode.
+                embedding = None
+            elif self.store is not None:
+                embedding = self.store.encode(self.phrases, self.model.encode)
+            else:
+                embedding = self.model.encode(self.phrases)
+            if embedding is not None:
+                self._embedding_rows = RowBuffer(np.asarray(embedding, dtype=np.float32))
+            timings["encode_s"] = time.perf_counter() - start
+
+            if self.projection is not None and not self.projection.fitted:
+                start = time.perf_counter()
+                self.projection.fit(self.embedding)
+                timings["projection_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if self.scoring == "prototype":
+                search_vectors, index_labels = build_prototypes(self.normalized, self.intent_labels, prototypes_per_intent)
+                label_rows = RowBuffer(index_labels)
+            else:
+                search_vectors, label_rows = None, self._intent_rows
+            if prebuilt:
+                if len(index) != len(label_rows):
+                    raise ValueError(f"The index holds {len(index)} vectors but there are {len(label_rows)} to search")
+            else:
+                if search_vectors is None:
+                    search_vectors = self.normalized
+                index = make_index(index, dtype=storage_dtype).build(search_vectors)
+            self._search = (index, label_rows)
+            if not keep_embeddings:
+                # A compact index is the point of the storage dtype, so it stays the only copy.
+                self._embedding_rows = None
+            timings["index_s"] = time.perf_counter() - start
+
+            if self.cascade_threshold is not None:
+                start = time.perf_counter()
+                self.cascade = LexicalStage().fit(self.phrases, self.intents)
+                timings["cascade_s"] = time.perf_counter() - start
+        except Exception as error:
+            self.warm_up_error = error
+            if self.warm_up_thread is None:
+                raise
+            return
+        finally:
+            self.warm_up_done.set()
+        timings["total_s"] = sum(v for k, v in timings.items() if k != "total_s")
+        self.ready.set()
+
+    def save(self, path):
+        """
+        Saves the training data, the raw training embeddings (when the chatbot keeps them) and the built
+        index to a directory, so `load` can skip the corpus encode and index build.
+
+        Args:
+            path (str): The directory to write to.
+        """
+        self.wait_until_ready()
+        with self._edit_lock:
+            os.makedirs(path, exist_ok=True)
+            if self.embedding is not None:
+                tmp = os.path.join(path, "embeddings.tmp.npy")
+                np.save(tmp, np.ascontiguousarray(self.embedding, dtype=np.float32))
+                os.replace(tmp, os.path.join(path, "embeddings.npy"))
+            self.index.save(os.path.join(path, "index"))
+            if self.projection is not None:
+                self.projection.save(os.path.join(path, "projection"))
+
+            meta = {
+                "version": ARTIFACT_VERSION,
+                "created": time.time(),
+                "model_name": self.model_name,
+                "encoder": self.encoder_config,
+                "encoder_name": self.encoder_name,
+                "scoring": self.scoring,
+                "prototypes_per_intent": self.prototypes_per_intent,
+                "index": {"kind": self.index.kind, "dtype": self.index.dtype},
+                "projection": None if self.projection is None else self.projection.kind,
+                "embeddings": self.embedding is not None,
+                "training_hash": training_data_hash(self.training_data),
+                "training_data": [list(item) for item in self.training_data],
+            }
+            tmp = os.path.join(path, "chatbot.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(path, "chatbot.json"))
+
+    @classmethod
+    def load(cls, path, responses, training_data=None, model=None, mmap=True, **options):
+        """
+        Restores a chatbot written by `save`. The embeddings and index are memory-mapped by default,
+        so startup costs only the encoder load.
+
+        Args:
+            path (str): The directory the chatbot was saved to.
+            responses (dict): A dictionary mapping intents to lists of possible responses.
+            training_data (list): When given, the artifact must have been saved with exactly these
+                (phrase, intent) pairs, otherwise a ValueError is raised. Defaults to the saved pairs.
+            model (object): An already loaded encoder. It must be the encoder the embeddings were saved
+                with; defaults to rebuilding it from the saved encoder config.
+            mmap (bool): Whether to memory-map the saved arrays instead of reading them into memory.
+            **options: Other constructor arguments, e.g. `background` or `query_cache_size`.
+        """
+        with open(os.path.join(path, "chatbot.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"{path}: unsupported artifact version {meta.get('version')!r}; expected {ARTIFACT_VERSION}")
+        if training_data is None:
+            training_data = [tuple(item) for item in meta["training_data"]]
+        elif training_data_hash(training_data) != meta["training_hash"]:
+            raise ValueError(f"{path} was saved with different training data")
+        if model is None and meta["encoder"] is None:
+            raise ValueError(f"{path} was saved with a custom encoder; pass it as `model`")
+        if model is not None and getattr(model, "name", meta["encoder_name"]) != meta["encoder_name"]:
+            raise ValueError(f"{path} was saved with encoder {meta['encoder_name']!r}, not {model.name!r}")
+
+        embeddings = None
+        if meta.get("embeddings", True):
+            embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r" if mmap else None)
+        if meta["scoring"] == "phrase":
+            index = load_index(os.path.join(path, "index"), mmap)
+        else:
+            # Prototypes are cheap to recompute from the embeddings, which also keeps their labels in step.
+            index = meta["index"]["kind"]
+        if meta.get("projection"):
+            options.setdefault("projection", load_projection(os.path.join(path, "projection")))
+        return cls(training_data, responses, model_name=meta["model_name"], index=index, scoring=meta["scoring"],
+                   prototypes_per_intent=meta["prototypes_per_intent"], model=model, encoder=meta["encoder"] or "sbert",
+                   storage_dtype=meta["index"]["dtype"], embeddings=embeddings, **options)
+
+    @classmethod
+    def from_parts(cls, model, index, labels, responses=None, phrase_index=None, cascade=None, cascade_threshold=None,
+                   projection=None, metrics=None, model_name=None):
+        """
+        Builds a ready chatbot around an already built index, with no training phrases of its own, e.g. in
+        an `inference_pool` worker. It predicts as the chatbot the parts came from does: the phrase fast
+        path, the cascade's lexical stage, then the encoder, projection and index. Nothing is encoded or
+        fitted, and since there is no training data, the chatbot cannot be edited, reloaded, compacted or saved.
+
+        Args:
+            model (object): The encoder the index was built with.
+            index (object): A built phrase index (see `intent_index.make_index`).
+            labels (array): The intent of every index row.
+            responses (dict): A dictionary mapping intents to lists of possible responses. Defaults to none.
+            phrase_index (PhraseIndex): The fast path's table, or None to disable the fast path.
+            cascade (LexicalStage): A fitted lexical stage, or None to disable cascade mode.
+            cascade_threshold (float): The confidence below which the cascade escalates to the encoder.
+            projection (object): The fitted projection the index was built with, or None.
+            metrics (Metrics): Optional latency metrics, as in `__init__`.
+            model_name (str): The model name reported with the encoder. Defaults to the encoder's name.
+        """
+        if len(index) != len(labels):
+            raise ValueError(f"The index holds {len(index)} vectors but there are {len(labels)} labels")
+        bot = cls.__new__(cls)
+        bot.training_data, bot.phrases, bot.intents = [], [], []
+        bot.responses = responses or {}
+        bot.model = model
+        bot.encoder_config = model.config() if callable(getattr(model, "config", None)) else None
+        bot.encoder_name = getattr(model, "name", None) or model_name
+        bot.model_name = model_name or bot.encoder_name
+        bot.metrics = metrics
+        bot.scoring = "phrase"
+        bot.prototypes_per_intent = 1
+        bot.store = None
+        bot.projection = projection
+
+        bot.fast_path = phrase_index is not None
+        bot.fast_path_hits = 0
+        bot._phrase_stopwords = None
+        bot.phrase_index = phrase_index if phrase_index is not None else PhraseIndex()
+        bot.phrase_tokens = []
+
+        bot.cascade_threshold = cascade_threshold if cascade is not None else None
+        bot.cascade = cascade
+        bot.cascade_stale = False
+        bot.cascade_answered = 0
+        bot.escalations = 0
+
+        bot._intent_rows = RowBuffer(np.asarray(labels, dtype=object))
+        bot._embedding_rows = None
+        bot._edit_lock = threading.Lock()
+        bot._search = (index, bot._intent_rows)
+        bot.query_cache = None
+
+        bot.ready = threading.Event()
+        bot.warm_up_done = threading.Event()
+        bot.warm_up_error = None
+        bot.warm_up_thread = None
+        bot.fallback_predictions = 0
+        bot.startup_timings = {}
+        bot.warm_up_done.set()
+        bot.ready.set()
+        return bot
+
+    def wait_until_ready(self, timeout=None):
+        """
+        Blocks until the model is loaded and the corpus is encoded. Raises a RuntimeError if
+        the background warm-up failed.
+
+        Args:
+            timeout (float): The longest time to wait in seconds, or None to wait indefinitely.
+        """
+        self.warm_up_done.wait(timeout)
+        if self.warm_up_error is not None:
+            raise RuntimeError("the chatbot failed to warm up") from self.warm_up_error
+        return self.ready.is_set()
+
+    def startup_report(self):
+        """
+        Returns how long startup took, broken down into setup, import, model load, corpus encode, index
+        build and cascade fit, along with how many requests were answered by the lexical fallback meanwhile.
+        """
+        report = dict(self.startup_timings)
+        report["ready"] = self.ready.is_set()
+        report["fallback_predictions"] = self.fallback_predictions
+        if self.store is not None:
+            report["cache_hits"] = self.store.hits
+            report["cache_misses"] = self.store.misses
+        if self.warm_up_error is not None:
+            report["error"] = repr(self.warm_up_error)
+        return report
+
+    def lexical_predict(self, text, threshold=0.5):
+        """
+        Predicts an intent without the model: an exact match against a training phrase wins outright,
+        otherwise the phrase with the highest word overlap (Jaccard similarity) is used.
+
+        Args:
+            text (str): The input text to classify.
+            threshold (float): The minimum overlap for a match; weaker matches are "unknown".
+
+        Returns:
+            tuple: The intent and its score.
+        """
+        phrase = self.preprocess(text)
+        intent = self.phrase_index.lookup(phrase)
+        if intent is not None:
+            return intent, 1.0
+
+        tokens = frozenset(phrase.split())
+        best_score, best_intent = 0.0, "unknown"
+        if tokens:
+            for candidate, intent in zip(self.phrase_tokens, self.intents):
+                score = len(tokens & candidate) / len(tokens | candidate)
+                if score > best_score:
+                    best_score, best_intent = score, intent
+        if best_score < threshold:
+            return "unknown", best_score
+        return best_intent, best_score
+
+    def add_examples(self, examples):
+        """
+        Teaches the chatbot new phrases. Only the new phrases are encoded; they are appended to the
+        embedding buffer, the index and the lexical tables in place, so the cost grows with the number
+        of examples, not with the corpus. The cascade's lexical stage is not refitted; see `refit_cascade`.
+
+        Edits are serialized with each other but not with predictions, so avoid editing while other
+        threads are classifying.
+
+        Args:
+            examples (list): (phrase, intent) tuples to add.
+
+        Returns:
+            int: The number of phrases added.
+        """
+        examples = list(examples)
+        if not examples:
+            return 0
+        self.wait_until_ready()
+
+        phrases = [self.preprocess(phrase) for phrase, _ in examples]
+        intents = [intent for _, intent in examples]
+        vectors = np.asarray(self.model.encode(phrases), dtype=np.float32)
+
+        with self._edit_lock:
+            self.training_data.extend(examples)
+            self.phrases.extend(phrases)
+            self.intents.extend(intents)
+            self.phrase_index.add(phrases, intents)
+            self.phrase_tokens.extend(frozenset(phrase.split()) for phrase in phrases)
+            ids = np.arange(self._next_row_id, self._next_row_id + len(phrases), dtype=np.int64)
+            self._row_ids.append(ids)
+            self._next_row_id += len(phrases)
+            for row_id, phrase in zip(ids.tolist(), phrases):
+                self._phrase_rows.setdefault(phrase, []).append(row_id)
+
+            if self._embedding_rows is not None:
+                self._embedding_rows.append(vectors)
+            self._intent_rows.append(np.array(intents, dtype=object))
+            self._mark_cascade_stale()
+            if self.scoring == "phrase":
+                self.index.add(self.project(vectors))
+            else:
+                self._refresh_prototypes(set(intents))
+        return len(examples)
+
+    def remove_examples(self, examples):
+        """
+        Forgets training phrases. Nothing is re-encoded: the rows are found through a phrase-to-rows
+        table and removed from the lexical tables and the index by delta. The dense row buffers (and the
+        exact index) are compacted in place, which moves the rows after the first removed one in a single
+        memory copy. In "prototype" scoring, the affected intents' prototypes are rebuilt from their rows.
+        The cascade's lexical stage is not refitted; see `refit_cascade`.
+
+        Args:
+            examples (list): Phrases to remove under any intent, or (phrase, intent) tuples to remove
+                only under that intent. Phrases are matched after preprocessing.
+
+        Returns:
+            int: The number of phrases removed.
+        """
+        self.wait_until_ready()
+        anywhere, pairs = set(), set()
+        for example in examples:
+            if isinstance(example, str):
+                anywhere.add(self.preprocess(example))
+            else:
+                pairs.add((self.preprocess(example[0]), example[1]))
+
+        with self._edit_lock:
+            row_ids = self._row_ids.view
+            found = {}
+            for phrase in anywhere | {phrase for phrase, _ in pairs}:
+                for row_id in self._phrase_rows.get(phrase, ()):
+                    position = int(np.searchsorted(row_ids, row_id))
+                    if phrase in anywhere or (phrase, self.intents[position]) in pairs:
+                        found[position] = row_id
+            if not found:
+                return 0
+            positions = sorted(found)
+            removed = [(self.phrases[i], self.intents[i]) for i in positions]
+            affected = {intent for _, intent in removed}
+
+            for position in positions:
+                rows = self._phrase_rows[self.phrases[position]]
+                rows.remove(found[position])
+                if not rows:
+                    del self._phrase_rows[self.phrases[position]]
+            self.phrase_index.remove(*zip(*removed))
+            for position in reversed(positions):
+                del self.training_data[position], self.phrases[position], self.intents[position]
+                del self.phrase_tokens[position]
+            self._row_ids.delete(positions)
+
+            if self._embedding_rows is not None:
+                self._embedding_rows.delete(positions)
+            self._intent_rows.delete(positions)
+            self._mark_cascade_stale()
+            if self.scoring == "phrase":
+                self.index.remove(positions)
+            else:
+                self._refresh_prototypes(affected)
+        return len(positions)
+
+    def _mark_cascade_stale(self):
+        # A stale stage could answer from phrases that were removed, or miss new ones, so it is
+        # bypassed (every message goes to the encoder) until `refit_cascade`.
+        if self.cascade is not None:
+            self.cascade_stale = True
+
+    def refit_cascade(self):
+        """
+        Refits the cascade's lexical stage on the current training data and puts it back in front of the
+        encoder. `add_examples` and `remove_examples` do not refit it, since a fit costs time in proportion
+        to the whole corpus; call this once after a batch of edits. `reload` refits it by itself.
+        """
+        with self._edit_lock:
+            if self.cascade is not None:
+                # Fit a new stage and swap it in, so predictions in flight keep using a complete one.
+                self.cascade = LexicalStage(self.cascade.C).fit(self.phrases, self.intents)
+                self.cascade_stale = False
+
+    def memory_report(self):
+        """
+        Returns the bytes held by the chatbot's arrays: the raw training embeddings (0 once a compact index
+        is the only copy), the index, the intent label arrays (object pointers, not the strings) and the
+        cached query embeddings, plus their total.
+        """
+        self.wait_until_ready()
+        index, label_rows = self._search
+        labels = self.intent_labels.nbytes
+        if label_rows is not self._intent_rows:
+            labels += label_rows.view.nbytes
+        report = {
+            "embedding_bytes": 0 if self.embedding is None else int(self.embedding.nbytes),
+            "index_bytes": int(index.nbytes()),
+            "label_bytes": int(labels),
+            "query_cache_bytes": self.query_cache.nbytes() if self.query_cache is not None else 0,
+        }
+        report["total_bytes"] = sum(report.values())
+        return report
+
+    def cascade_report(self):
+        """
+        Returns how many messages the phrase fast path and the cascade's lexical stage answered, and how
+        many the cascade escalated to the encoder.
+        """
+        total = self.cascade_answered + self.escalations
+        return {
+            "cascade_threshold": self.cascade_threshold,
+            "cascade_stale": self.cascade_stale,
+            "fast_path": self.fast_path_hits,
+            "lexical": self.cascade_answered,
+            "escalated": self.escalations,
+            "escalation_rate": self.escalations / total if total else 0.0,
+        }
+
+    def _refresh_prototypes(self, intents):
+        """
+        Rebuilds the prototypes of the given intents and swaps them into the index. Finding their rows
+        is one vectorized pass over the intent labels.
+        """
+        intents = list(intents)
+        index, label_rows = self._search
+        stale = np.flatnonzero(np.isin(label_rows.view, intents))
+        index.remove(stale)
+        label_rows.delete(stale)
+
+        members = np.isin(self.intent_labels, intents)
+        if members.any():
+            vectors, labels = build_prototypes(
+                self.project(self.embedding[members]), self.intent_labels[members], self.prototypes_per_intent)
+            index.add(vectors)
+            label_rows.append(labels)
+
+    def update_responses(self, responses):
+        """
+        Adds, replaces or removes the responses of intents. The new table is swapped in as a whole,
+        so concurrent `get_response` calls see either the old or the new responses.
+
+        Args:
+            responses (dict): Maps intents to their new list of responses. An empty list or None
+                removes the intent's responses, so it falls back to the "unknown" ones.
+        """
+        updated = dict(self.responses)
+        for intent, options in responses.items():
+            if options:
+                updated[intent] = list(options)
+            elif intent == "unknown":
+                raise ValueError("the 'unknown' responses are required and cannot be removed")
+            else:
+                updated.pop(intent, None)
+        self.responses = updated
+
+    def reload(self, training_data, responses=None):
+        """
+        Replaces the training data (and optionally the responses) while the chatbot keeps serving.
+
+        The new phrases are diffed against the current ones: only phrases the chatbot has not seen
+        before are encoded, embeddings of kept phrases are reused, and removed rows are dropped. The
+        new matrix, index and lexical tables are built off to the side and then swapped in, so
+        predictions in flight finish against the old data and later ones see the new data.
+
+        Args:
+            training_data (list): The complete new list of (phrase, intent) tuples.
+            responses (dict): The complete new responses table, or None to keep the current one.
+
+        Returns:
+            dict: The numbers of rows kept, added and removed, the phrases encoded, and the seconds
+                spent encoding and building.
+        """
+        training_data = list(training_data)
+        if responses is not None and not responses.get("unknown"):
+            raise ValueError("the 'unknown' responses are required and cannot be removed")
+        self.wait_until_ready()
+
+        phrases = [self.preprocess(phrase) for phrase, _ in training_data]
+        intents = [intent for _, intent in training_data]
+
+        with self._edit_lock:
+            started = time.perf_counter()
+            # The encoder only sees the preprocessed phrase, so its vector can be reused under any intent.
+            old_rows = {}
+            for row, phrase in enumerate(self.phrases):
+                old_rows.setdefault(phrase, row)
+            new_phrases = list(dict.fromkeys(p for p in phrases if p not in old_rows))
+            # Without the raw embeddings, the kept rows come back from the compact index, already in the
+            # search space; re-quantizing them reproduces the same codes.
+            raw = self._embedding_rows is not None
+            old_embedding = self.embedding if raw else self.index.vectors()
+            if new_phrases:
+                encoded = np.asarray(self.model.encode(new_phrases), dtype=np.float32)
+                if not raw:
+                    encoded = self.project(encoded)
+            else:
+                encoded = np.zeros((0, old_embedding.shape[1]), dtype=np.float32)
+            encode_s = time.perf_counter() - started
 
-    def preprocess(self, text):
+            started = time.perf_counter()
+            new_rows = {phrase: row for row, phrase in enumerate(new_phrases)}
+            kept = np.array([p in old_rows for p in phrases], dtype=bool)
+            embedding = np.empty((len(phrases), encoded.shape[1]), dtype=np.float32)
+            embedding[kept] = old_embedding[[old_rows[p] for p, k in zip(phrases, kept) if k]]
+            embedding[~kept] = encoded[[new_rows[p] for p, k in zip(phrases, kept) if not k]]
+
+            embedding_rows = RowBuffer(embedding) if raw else None
+            intent_rows = RowBuffer(np.array(intents, dtype=object))
+            normalized = self.project(embedding) if raw else embedding
+            if self.scoring == "prototype":
+                search_vectors, index_labels = build_prototypes(normalized, intent_rows.view, self.prototypes_per_intent)
+                label_rows = RowBuffer(index_labels)
+            else:
+                search_vectors, label_rows = normalized, intent_rows
+            # A copy keeps the current index's settings (storage dtype, IVF parameters); `build`
+            # gives it new storage, so the live index is left untouched until the swap.
+            index = copy.copy(self.index).build(search_vectors)
+            phrase_index = PhraseIndex(self._phrase_stopwords).build(phrases, intents)
+            phrase_tokens = [frozenset(phrase.split()) for phrase in phrases]
+            row_lookup = self._row_lookup(phrases)
+            cascade = LexicalStage(self.cascade.C).fit(phrases, intents) if self.cascade is not None else None
+            build_s = time.perf_counter() - started
+
+            # Rows in = rows out: the old rows are the kept plus the removed ones.
+            report = {"rows": len(phrases), "kept": int(kept.sum()), "added": int((~kept).sum()),
+                      "removed": len(self.phrases) - int(kept.sum()), "encoded": len(new_phrases), "encode_s": encode_s, "build_s": build_s}
+
+            # The swap: every assignment below is a single reference store.
+            self.training_data, self.phrases, self.intents = training_data, phrases, intents
+            self.phrase_index, self.phrase_tokens = phrase_index, phrase_tokens
+            self._row_ids, self._phrase_rows, self._next_row_id = row_lookup
+            self.cascade, self.cascade_stale = cascade, False
+            self._embedding_rows, self._intent_rows = embedding_rows, intent_rows
+            self._search = (index, label_rows)
+            if responses is not None:
+                self.responses = {intent: list(options) for intent, options in responses.items() if options}
+        return report
+
+    def compact(self, cutoff=0.95, conflict_cutoff=None, block_size=1024):
+        """
+        Drops training phrases that are near-duplicates of an earlier phrase with the same intent, keeping
+        one representative row per cluster, and flags near-identical phrases labelled with different
+        intents. Nothing is re-encoded; the kept rows are swapped in with `reload`.
+
+        Args:
+            cutoff (float): The cosine similarity at or above which same-intent phrases are duplicates.
+            conflict_cutoff (float): The similarity at or above which phrases of different intents are
+                flagged. Defaults to `cutoff`. Conflicting phrases are reported, not removed.
+            block_size (int): The number of rows compared at a time; memory grows with its square.
+
+        Returns:
+            dict: The `reload` report plus the rows and the bytes of the chatbot's arrays (see `memory_report`)
+                before and after, and the conflicts.
+        """
+        self.wait_until_ready()
+        training_data, normalized, intent_labels = self.training_data, self.normalized, self.intent_labels
+        keep, _, conflicts = find_near_duplicates(normalized, intent_labels, cutoff, conflict_cutoff, block_size)
+        rows_before, bytes_before = len(training_data), self.memory_report()["total_bytes"]
+
+        report = self.reload([training_data[i] for i in keep])
+        report.update({"rows_before": rows_before, "bytes_before": bytes_before,
+                       "bytes_after": self.memory_report()["total_bytes"],
+                       "conflicts": describe_conflicts(training_data, conflicts)})
+        return report
+
+    @staticmethod
+    def preprocess(text):
         """
         Preprocesses the input text by converting it to lowercase and removing punctuation.
         
@@ -52,7 +834,26 @@ class IntelligentChatBot:
         Args:
             text (str): The input text to embed.
         """
-        return self.model.encode([self.preprocess(text)])[0]
+        return self.encode_queries([self.preprocess(text)])[0]
+
+    def encode_queries(self, phrases):
+        """
+        Embeds preprocessed phrases, serving repeats from the query cache and encoding the rest in one batch.
+
+        Args:
+            phrases (list): The preprocessed texts to embed.
+        """
+        if self.query_cache is None:
+            return self.model.encode(phrases)
+
+        vectors = [self.query_cache.get(p) for p in phrases]
+        missing = list(dict.fromkeys(p for p, v in zip(phrases, vectors) if v is None))
+        if missing:
+            encoded = dict(zip(missing, self.model.encode(missing)))
+            for phrase, vector in encoded.items():
+                self.query_cache.put(phrase, vector)
+            vectors = [encoded[p] if v is None else v for p, v in zip(phrases, vectors)]
+        return np.vstack(vectors)
 
     def predict_intent(self, text, threshold=0.5):
         """
@@ -61,24 +862,131 @@ class IntelligentChatBot:
         Args:
             text (str): The input text to classify.
         """
-        input_vec = self.embed_input(text)
-        similarities = cosine_similarity([input_vec], self.embedding)[0]
-        best_index = similarities.argmax()
-        if similarities[best_index] < threshold:
-            return "unknown"
-        return self.intents[best_index]
+        intents, _ = self.predict_intents([text], threshold)
+        return intents[0]
 
-    def get_response(self, intent):
+    def predict_intents(self, texts, threshold=0.5):
+        """
+        Predicts the intents of a batch of texts with one encoder call and one matrix multiply.
+
+        Args:
+            texts (list): The input texts to classify.
+            threshold (float): The minimum similarity for a match; weaker matches are "unknown".
+
+        Returns:
+            tuple: An object array of intents and a float32 array of their similarity scores. In cascade
+                mode, messages answered by the lexical stage carry its confidence instead.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.array([], dtype=object), np.array([], dtype=np.float32)
+
+        metrics = self.metrics
+        timer = metrics.timer() if metrics is not None else None
+
+        if not self.ready.is_set():
+            self.fallback_predictions += len(texts)
+            intents, scores = zip(*(self.lexical_predict(t, threshold) for t in texts))
+            intents, scores = np.array(intents, dtype=object), np.array(scores, dtype=np.float32)
+            if timer:
+                timer.lap("lexical", len(texts))
+        else:
+            phrases = [self.preprocess(t) for t in texts]
+            if timer:
+                timer.lap("preprocess", len(texts))
+            intents = np.empty(len(phrases), dtype=object)
+            scores = np.zeros(len(phrases), dtype=np.float32)
+            # Positions of the messages no earlier stage has answered yet.
+            pending = np.arange(len(phrases))
+
+            if self.fast_path:
+                lookup = self.phrase_index.lookup
+                found = [lookup(phrase) for phrase in phrases]
+                hits = [i for i, intent in enumerate(found) if intent is not None]
+                if hits:
+                    intents[hits] = [found[i] for i in hits]
+                    scores[hits] = 1.0
+                    pending = np.array([i for i, intent in enumerate(found) if intent is None], dtype=np.intp)
+                    self.fast_path_hits += len(hits)
+                if timer:
+                    timer.lap("fast_path", len(texts))
+
+            cascade = self.cascade if not self.cascade_stale else None
+            if cascade is not None and len(pending):
+                screened = len(pending)
+                lexical_intents, confidences = cascade.predict([phrases[i] for i in pending])
+                confident = confidences >= self.cascade_threshold
+                intents[pending[confident]] = lexical_intents[confident]
+                scores[pending[confident]] = confidences[confident]
+                pending = pending[~confident]
+                self.cascade_answered += int(confident.sum())
+                self.escalations += len(pending)
+                if timer:
+                    timer.lap("cascade", screened)
+
+            if len(pending):
+                vectors = self.encode_queries(phrases if len(pending) == len(phrases) else [phrases[i] for i in pending])
+                if timer:
+                    timer.lap("embed", len(pending))
+                intents[pending], scores[pending] = self.classify_embeddings(vectors, threshold)
+                if timer:
+                    timer.lap("score", len(pending))
+
+        if metrics is not None:
+            for intent, count in Counter(intents.tolist()).items():
+                metrics.count_intent(intent, count)
+        return intents, scores
+
+    def project(self, vectors):
+        """
+        Maps encoder embeddings into the space the index searches: scaled to unit length, then through
+        the projection, if any. Projected vectors are not rescaled, so a query that the projection
+        mostly discards (nonsense or empty input) keeps a low score instead of matching confidently.
+
+        Args:
+            vectors (array): A single embedding or a 2D array with one embedding per row.
+        """
+        vectors = normalize_rows(vectors)
+        if self.projection is not None:
+            vectors = self.projection.transform(vectors)
+        return vectors
+
+    def classify_embeddings(self, vectors, threshold=0.5):
+        """
+        Looks up the nearest training phrase (or intent prototype) for each query embedding in the index.
+
+        Args:
+            vectors (array): A 2D array of query embeddings, one per row.
+            threshold (float): The minimum similarity for a match; weaker matches are "unknown".
+
+        Returns:
+            tuple: An object array of intents and a float32 array of their similarity scores.
+        """
+        index, label_rows = self._search
+        scores, ids = index.search(self.project(vectors), k=1)
+        # A random projection only roughly preserves lengths; cap scores at a perfect cosine match.
+        scores, ids = np.minimum(scores[:, 0], 1.0), ids[:, 0]
+        intents = np.where(scores < threshold, "unknown", label_rows.view[ids])
+        return intents, scores
+
+    def get_response(self, intent, rng=None):
         """
         Retrieves a random response for the given intent from the predefined responses.
         
         Args:
             intent (str): The predicted intent for which to retrieve a response.
+            rng (random.Random): The random source, e.g. a per-session one. Defaults to the `random` module.
         """
-        if intent in self.responses:
-            return random.choice(self.responses[intent])
+        timer = self.metrics.timer() if self.metrics is not None else None
+        responses = self.responses  # one read, so a concurrent update_responses cannot split the lookup
+        choice = (rng or random).choice
+        if intent in responses:
+            response = choice(responses[intent])
         else:
-            return random.choice(self.responses["unknown"])
+            response = choice(responses["unknown"])
+        if timer:
+            timer.lap("respond")
+        return response
 
     def chat(self):
         """
@@ -496,5 +1404,17 @@ responses = {
 }
 
 if __name__ == "__main__":
-    bot = IntelligentChatBot(training_data, responses)
-    bot.chat()
+    from chatbot_common.metrics import add_metrics_arguments, metrics_from_args
+
+    parser = argparse.ArgumentParser(description="Chat with the sentence-embedding chatbot.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics, dumper = metrics_from_args(args, "chatbot_3")
+
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache")
+    bot = IntelligentChatBot(training_data, responses, cache_dir=cache_dir, background=True, metrics=metrics)
+    try:
+        bot.chat()
+    finally:
+        if dumper is not None:
+            dumper.stop()
@@ -0,0 +1,197 @@
+# Version: 1.0
+# Description: Shrinks IntelligentChatBot's corpus by collapsing near-duplicate phrases of the same intent
+# into one representative row, and flags near-identical phrases that are labelled with different intents.
+# Similarities are computed one block of rows at a time, so memory stays at block_size^2 floats however
+# large the corpus is. Run this file to see how much a range of cutoffs shrinks the matrix and what it
+# does to accuracy on variations of phrases held out of the corpus.
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from intent_index import RowBuffer, normalize_rows
+
+
+def find_near_duplicates(normalized, intents, cutoff=0.95, conflict_cutoff=None, block_size=1024):
+    """
+    Greedily clusters rows in corpus order: a row joins the most similar earlier
+    representative of the same intent if their cosine similarity is at least `cutoff`, and becomes a
+    representative itself otherwise.
+
+    Args:
+        normalized (array): A 2D array of phrase embeddings. Rows are rescaled to unit length first, so
+            projected vectors (see `IntelligentChatBot.project`) are compared by cosine similarity too.
+        intents (array): The intent of every row.
+        cutoff (float): The similarity at or above which same-intent rows are duplicates.
+        conflict_cutoff (float): The similarity at or above which rows of different intents are flagged
+            as conflicting. Defaults to `cutoff`.
+        block_size (int): The number of rows scored at a time.
+
+    Returns:
+        tuple: The sorted positions of the representative rows, the position of every row's
+            representative, and a list of (row, other_row, similarity) conflicts, where `other_row` is
+            an earlier representative with a different intent.
+    """
+    normalized = normalize_rows(normalized)
+    intents = np.asarray(intents, dtype=object)
+    conflict_cutoff = cutoff if conflict_cutoff is None else conflict_cutoff
+    n = len(normalized)
+
+    representative = np.arange(n)
+    rep_rows = RowBuffer(np.zeros(0, dtype=np.int64))
+    rep_vectors = RowBuffer(np.zeros((0, normalized.shape[1] if normalized.ndim == 2 else 0), dtype=np.float32))
+    rep_intents = RowBuffer(np.zeros(0, dtype=object))
+    conflicts = []
+
+    for start in range(0, n, block_size):
+        block = normalized[start:start + block_size]
+        block_intents = intents[start:start + block_size]
+        m = len(block)
+        # Best earlier representative per row: same intent (to merge into) and other intent (to flag).
+        best_same = np.full(m, -np.inf, dtype=np.float32)
+        best_same_id = np.full(m, -1)
+        best_other = np.full(m, -np.inf, dtype=np.float32)
+        best_other_id = np.full(m, -1)
+        for rep_start in range(0, len(rep_rows), block_size):
+            scores = block @ rep_vectors.view[rep_start:rep_start + block_size].T
+            same = block_intents[:, None] == rep_intents.view[None, rep_start:rep_start + block_size]
+            for best, best_id, mask in ((best_same, best_same_id, same), (best_other, best_other_id, ~same)):
+                masked = np.where(mask, scores, -np.inf)
+                column = masked.argmax(axis=1)
+                value = masked[np.arange(m), column]
+                better = value > best
+                best[better] = value[better]
+                best_id[better] = rep_rows.view[rep_start + column[better]]
+
+        # Rows within the block are resolved in order against the block's earlier representatives.
+        within = block @ block.T
+        new_reps = []
+        for i in range(m):
+            row = start + i
+            if new_reps:
+                earlier = np.array(new_reps)
+                scores = within[i, earlier]
+                same = block_intents[earlier] == block_intents[i]
+                if same.any() and scores[same].max() > best_same[i]:
+                    j = scores[same].argmax()
+                    best_same[i], best_same_id[i] = scores[same][j], start + earlier[same][j]
+                if (~same).any() and scores[~same].max() > best_other[i]:
+                    j = scores[~same].argmax()
+                    best_other[i], best_other_id[i] = scores[~same][j], start + earlier[~same][j]
+            if best_other[i] >= conflict_cutoff:
+                conflicts.append((row, int(best_other_id[i]), float(best_other[i])))
+            if best_same[i] >= cutoff:
+                representative[row] = representative[best_same_id[i]]
+            else:
+                new_reps.append(i)
+
+        new_reps = np.array(new_reps, dtype=np.int64)
+        rep_rows.append(start + new_reps)
+        rep_vectors.append(block[new_reps])
+        rep_intents.append(block_intents[new_reps])
+
+    return rep_rows.view.copy(), representative, conflicts
+
+
+def describe_conflicts(training_data, conflicts):
+    """
+    Turns (row, other_row, similarity) conflicts into readable dicts with both phrases and intents.
+
+    Args:
+        training_data (list): The (phrase, intent) tuples the rows refer to.
+        conflicts (list): Conflicts from `find_near_duplicates`.
+    """
+    return [{"phrase": training_data[row][0], "intent": training_data[row][1],
+             "other_phrase": training_data[other][0], "other_intent": training_data[other][1],
+             "similarity": round(similarity, 4)}
+            for row, other, similarity in conflicts]
+
+
+def evaluate_compaction(bot, texts, labels, cutoffs, threshold=0.5, block_size=1024):
+    """
+    Compares exact nearest-phrase scoring over the full corpus with scoring over each cutoff's
+    representatives. The bot itself is not changed, and every text is encoded only once. Queries are
+    scored as the bot scores them; duplicates are found by cosine similarity (see `find_near_duplicates`).
+
+    Args:
+        bot (IntelligentChatBot): A ready chatbot.
+        texts (list): The input texts.
+        labels (list): The expected intent of every text.
+        cutoffs (list): The duplicate cutoffs to try.
+        threshold (float): The minimum similarity for a match.
+        block_size (int): The number of rows scored at a time while compacting.
+
+    Returns:
+        list: One dict per cutoff with the rows and bytes before and after, the number of conflicts,
+            the accuracy before and after, and how often the two agree.
+    """
+    bot.wait_until_ready()
+    labels = np.asarray(labels, dtype=object)
+    queries = bot.project(bot.model.encode([bot.preprocess(t) for t in texts]))
+    normalized, intent_labels = bot.normalized, bot.intent_labels
+
+    def classify(rows):
+        scores = queries @ normalized[rows].T
+        best = scores.argmax(axis=1)
+        matched = scores[np.arange(len(best)), best] >= threshold
+        return np.where(matched, intent_labels[rows][best], "unknown")
+
+    everything = np.arange(len(normalized))
+    full = classify(everything)
+    report = []
+    for cutoff in cutoffs:
+        start = time.perf_counter()
+        keep, _, conflicts = find_near_duplicates(normalized, intent_labels, cutoff, block_size=block_size)
+        seconds = time.perf_counter() - start
+        compacted = classify(keep)
+        report.append({
+            "cutoff": cutoff,
+            "rows": len(normalized),
+            "rows_kept": len(keep),
+            "bytes": int(normalized.nbytes),
+            "bytes_kept": int(normalized[keep].nbytes),
+            "reduction": 1 - len(keep) / len(normalized) if len(normalized) else 0.0,
+            "conflicts": len(conflicts),
+            "accuracy": float((full == labels).mean()) if len(labels) else 0.0,
+            "accuracy_kept": float((compacted == labels).mean()) if len(labels) else 0.0,
+            "agreement": float((compacted == full).mean()) if len(labels) else 0.0,
+            "compaction_s": seconds,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from chatbot_learning_demo import IntelligentChatBot, responses, training_data
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from chatbot_common.corpus import held_out_queries, scale_corpus, split_held_out
+
+    parser = argparse.ArgumentParser(description="Measure near-duplicate compaction of the corpus at several cutoffs.")
+    parser.add_argument("--cutoffs", type=float, nargs="+", default=[0.85, 0.9, 0.95, 0.98])
+    parser.add_argument("--scale", type=int, default=1, help="grow the corpus this many times with perturbed copies")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--held-out", type=float, default=0.2,
+                        help="share of each intent's phrases kept out of the corpus and used to build the queries")
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    parser.add_argument("--show-conflicts", action="store_true", help="also print the conflicts at the first cutoff")
+    args = parser.parse_args()
+
+    # Queries are variations of phrases the corpus does not contain, as in benchmark.py, so dropping a
+    # near-duplicate row can change what they match.
+    train, held_out = split_held_out(training_data, args.held_out)
+    corpus = scale_corpus(train, args.scale)
+    bot = IntelligentChatBot(corpus, responses, encoder=args.encoder, fast_path=False)
+    queries = held_out_queries(held_out, args.queries)
+    for row in evaluate_compaction(bot, [q for q, _ in queries], [i for _, i in queries], args.cutoffs,
+                                   block_size=args.block_size):
+        print(json.dumps(row))
+    if args.show_conflicts:
+        _, _, conflicts = find_near_duplicates(bot.normalized, bot.intent_labels, args.cutoffs[0], block_size=args.block_size)
+        for conflict in describe_conflicts(bot.training_data, conflicts):
+            print(json.dumps(conflict))
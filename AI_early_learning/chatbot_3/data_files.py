@@ -0,0 +1,246 @@
+# Version: 1.0
+# Description: Loads IntelligentChatBot's training data and responses from data files instead of the
+# module-level literals, and watches those files so edits are hot-reloaded into a running chatbot with
+# `IntelligentChatBot.reload` (only new phrases are encoded).
+#
+#   python data_files.py export data/                 # write the built-in corpus as data files
+#   python data_files.py watch data/training_data.jsonl data/responses.json --encoder hashed
+#   python data_files.py latency --encoder hashed     # query latency while reloads run
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+
+
+def load_training_data(path):
+    """
+    Reads (phrase, intent) tuples from a data file.
+
+    Args:
+        path (str): A .jsonl file of {"text": ..., "intent": ...} objects, a .csv file with "text" and
+            "intent" columns, or a .json file holding a list of [phrase, intent] pairs.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        elif path.endswith(".csv"):
+            records = list(csv.DictReader(f))
+        elif path.endswith(".json"):
+            return [(phrase, intent) for phrase, intent in json.load(f)]
+        else:
+            raise ValueError(f"{path}: expected a .jsonl, .csv or .json training data file")
+    try:
+        return [(record["text"], record["intent"]) for record in records]
+    except KeyError as error:
+        raise ValueError(f"{path}: every record needs 'text' and 'intent' fields, missing {error}")
+
+
+def load_responses(path):
+    """
+    Reads a JSON object mapping intents to lists of responses. It must have "unknown" responses.
+
+    Args:
+        path (str): The JSON file.
+    """
+    with open(path, encoding="utf-8") as f:
+        responses = json.load(f)
+    if not isinstance(responses, dict) or not responses.get("unknown"):
+        raise ValueError(f"{path}: expected a JSON object of intent -> responses with 'unknown' responses")
+    return responses
+
+
+def write_data_files(directory, training_data, responses):
+    """
+    Writes training data to `training_data.jsonl` and responses to `responses.json` in a directory.
+
+    Returns:
+        tuple: The paths of the two files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    training_path = os.path.join(directory, "training_data.jsonl")
+    responses_path = os.path.join(directory, "responses.json")
+    with open(training_path, "w", encoding="utf-8") as f:
+        for phrase, intent in training_data:
+            f.write(json.dumps({"text": phrase, "intent": intent}, ensure_ascii=False) + "\n")
+    with open(responses_path, "w", encoding="utf-8") as f:
+        json.dump(responses, f, ensure_ascii=False, indent=2)
+    return training_path, responses_path
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DataFileWatcher:
+    """
+    Polls the training data and responses files on a daemon thread and reloads the chatbot when
+    either one changes. Either file can be watched on its own: without a training data file, a changed
+    responses file replaces the chatbot's responses and leaves its training data alone.
+
+    A file that fails to parse, or a reload that fails, is reported and skipped; the chatbot keeps
+    serving the last good data until the files are fixed.
+    """
+
+    def __init__(self, bot, training_path, responses_path=None, interval=2.0, log=sys.stderr):
+        """
+        Args:
+            bot (IntelligentChatBot): The chatbot to reload.
+            training_path (str): The training data file, see `load_training_data`, or None to leave the
+                training data alone.
+            responses_path (str): The responses file, or None to leave the responses alone.
+            interval (float): Seconds between checks.
+            log (file): Where reloads and errors are reported, or None.
+        """
+        if training_path is None and responses_path is None:
+            raise ValueError("Pass a training data file, a responses file, or both to watch")
+        self.bot = bot
+        self.training_path = training_path
+        self.responses_path = responses_path
+        self.interval = interval
+        self.log = log
+        self.reloads = 0
+        self.last_report = None
+        self.last_error = None
+        self._signatures = self._current_signatures()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="data-file-watcher", daemon=True)
+
+    def _current_signatures(self):
+        return (self.training_path and _signature(self.training_path),
+                self.responses_path and _signature(self.responses_path))
+
+    def _report(self, message):
+        if self.log is not None:
+            print(message, file=self.log, flush=True)
+
+    def check(self):
+        """
+        Reloads the chatbot if a file changed since the last check. Returns whether it reloaded.
+        """
+        signatures = self._current_signatures()
+        if signatures == self._signatures:
+            return False
+        # Remember the new state up front so a broken file is reported once, not on every check.
+        self._signatures = signatures
+        try:
+            responses = load_responses(self.responses_path) if self.responses_path else None
+            if self.training_path:
+                self.last_report = self.bot.reload(load_training_data(self.training_path), responses)
+            else:
+                self.last_report = self._replace_responses(responses)
+        except Exception as error:
+            self.last_error = error
+            self._report(f"reload failed, still serving the previous data: {error!r}")
+            return False
+        self.last_error = None
+        self.reloads += 1
+        self._report("reloaded " + json.dumps(self.last_report))
+        return True
+
+    def _replace_responses(self, responses):
+        # The file is the complete table, so intents missing from it lose their responses, as in `reload`.
+        updates = dict(responses)
+        updates.update({intent: None for intent in self.bot.responses if intent not in responses})
+        self.bot.update_responses(updates)
+        return {"responses": len(responses)}
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+
+def reload_latency(bot, training_data, queries, repeats=3, threshold=0.5):
+    """
+    Measures prediction latency on one thread while another thread reloads the chatbot.
+
+    Args:
+        bot (IntelligentChatBot): A ready chatbot.
+        training_data (list): The data to reload, alternated with the bot's current data.
+        queries (list): Texts to classify one at a time while reloading.
+        repeats (int): The number of reloads.
+        threshold (float): The minimum similarity for a match.
+
+    Returns:
+        dict: Per-query latency percentiles in milliseconds while reloading, and the reload reports.
+    """
+    bot.wait_until_ready()
+    datasets = [list(training_data), list(bot.training_data)]
+    reports = []
+    done = threading.Event()
+
+    def reloader():
+        for i in range(repeats):
+            reports.append(bot.reload(datasets[i % 2]))
+        done.set()
+
+    thread = threading.Thread(target=reloader)
+    latencies = []
+    thread.start()
+    i = 0
+    while not done.is_set() or not latencies:
+        start = time.perf_counter()
+        bot.predict_intents([queries[i % len(queries)]], threshold)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    thread.join()
+
+    latencies.sort()
+
+    def percentile_ms(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+
+    return {"queries": len(latencies), "p50_ms": percentile_ms(0.5), "p99_ms": percentile_ms(0.99),
+            "max_ms": latencies[-1] * 1000, "reloads": reports}
+
+
+if __name__ == "__main__":
+    from chatbot_learning_demo import IntelligentChatBot, responses, training_data
+
+    parser = argparse.ArgumentParser(description="Export the chatbot's data files, or serve a chat loop that hot-reloads them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write the built-in training data and responses to a directory")
+    export.add_argument("directory")
+    watch = commands.add_parser("watch", help="chat in the terminal while the data files are watched for edits")
+    watch.add_argument("training_data")
+    watch.add_argument("responses", nargs="?")
+    watch.add_argument("--interval", type=float, default=2.0)
+    watch.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    latency = commands.add_parser("latency", help="measure query latency while reloads with 10%% of the phrases changed run")
+    latency.add_argument("--repeats", type=int, default=4)
+    latency.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for path in write_data_files(args.directory, training_data, responses):
+            print(path)
+    elif args.command == "latency":
+        bot = IntelligentChatBot(training_data, responses, encoder=args.encoder, query_cache_size=0, fast_path=False)
+        # Drop every tenth phrase and add as many reworded ones.
+        edited = [item for i, item in enumerate(training_data) if i % 10]
+        edited += [(phrase + " right now", intent) for phrase, intent in training_data[::10]]
+        print(json.dumps(reload_latency(bot, edited, [phrase for phrase, _ in training_data], args.repeats)))
+    else:
+        bot = IntelligentChatBot(load_training_data(args.training_data),
+                                 load_responses(args.responses) if args.responses else responses,
+                                 encoder=args.encoder)
+        watcher = DataFileWatcher(bot, args.training_data, args.responses, args.interval).start()
+        try:
+            bot.chat()
+        finally:
+            watcher.stop()
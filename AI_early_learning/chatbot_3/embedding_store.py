@@ -0,0 +1,147 @@
+# Version: 1.0
+# Description: A content-addressed, on-disk cache of phrase embeddings so the chatbot
+# only has to encode phrases it has never seen before when it starts up.
+
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """
+    A content-addressed store of phrase embeddings for a single encoder model.
+
+    Each phrase is keyed by a hash of the model name and the preprocessed phrase. Vectors live in
+    a plain `.npy` matrix that is memory-mapped on load, and a small JSON sidecar maps keys to rows.
+    Rows are written in corpus order, so a restart with an unchanged corpus gets a view of the
+    memory-mapped file back without copying anything.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory, model_name):
+        """
+        Initializes the store and loads any embeddings previously saved for the model.
+
+        Args:
+            directory (str): The directory the cache files are kept in.
+            model_name (str): The name of the encoder the embeddings belong to, including its backend
+                settings (an encoder's `name`), so different backends never share vectors.
+        """
+        self.directory = directory
+        self.model_name = model_name
+
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.matrix_path = os.path.join(directory, slug + ".npy")
+        self.index_path = os.path.join(directory, slug + ".json")
+
+        self.matrix = None
+        self.rows = {}
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def key(self, phrase):
+        """
+        Returns the content address of a phrase for this store's model.
+
+        Args:
+            phrase (str): The preprocessed phrase.
+        """
+        return hashlib.sha1((self.model_name + "\0" + phrase).encode("utf-8")).hexdigest()
+
+    def load(self):
+        """
+        Memory-maps the cached matrix and reads its sidecar index. A missing, foreign or
+        inconsistent cache is treated as empty.
+        """
+        self.matrix = None
+        self.rows = {}
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.index_path)):
+            return
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            matrix = np.load(self.matrix_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return
+
+        keys = index.get("keys", [])
+        if (index.get("version") != self.FORMAT_VERSION or index.get("model") != self.model_name
+                or matrix.ndim != 2 or matrix.shape[0] != len(keys)):
+            return
+
+        self.matrix = matrix
+        self.rows = {k: i for i, k in enumerate(keys)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, phrase):
+        return self.key(phrase) in self.rows
+
+    def encode(self, phrases, encode_fn):
+        """
+        Returns embeddings for the phrases, encoding only the ones missing from the store.
+
+        Newly encoded vectors are persisted before returning. When every phrase is cached and the
+        stored rows already line up with the requested order, the memory-mapped matrix is
+        returned as a read-only view instead of a copy.
+
+        Args:
+            phrases (list): The preprocessed phrases to embed.
+            encode_fn (callable): Encodes a list of phrases into a 2D array, e.g. `model.encode`.
+        """
+        keys = [self.key(p) for p in phrases]
+
+        missing = {}
+        for k, phrase in zip(keys, phrases):
+            if k not in self.rows and k not in missing:
+                missing[k] = phrase
+        self.misses += len(missing)
+        self.hits += len(phrases) - len(missing)
+
+        if missing:
+            new_vectors = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            self._write(keys, dict(zip(missing, new_vectors)))
+
+        rows = np.fromiter((self.rows[k] for k in keys), dtype=np.int64, count=len(keys))
+        if len(rows) and np.array_equal(rows, np.arange(len(rows))):
+            return self.matrix[:len(rows)]
+        return np.asarray(self.matrix[rows])
+
+    def _write(self, order, new_vectors):
+        """
+        Rewrites the cache with the requested keys first, in order, followed by every other cached
+        row, so the next identical request can be served as a contiguous view.
+
+        Args:
+            order (list): The keys of the current corpus, in corpus order.
+            new_vectors (dict): Freshly encoded vectors keyed by phrase key.
+        """
+        keys = list(dict.fromkeys(order))
+        wanted = set(keys)
+        keys += [k for k in self.rows if k not in wanted]
+
+        dim = len(next(iter(new_vectors.values())))
+        matrix = np.empty((len(keys), dim), dtype=np.float32)
+        for i, k in enumerate(keys):
+            matrix[i] = new_vectors[k] if k in new_vectors else self.matrix[self.rows[k]]
+
+        os.makedirs(self.directory, exist_ok=True)
+        # np.save appends ".npy" to names that lack it, so the temp name has to keep the suffix.
+        tmp_matrix = self.matrix_path[:-len(".npy")] + ".tmp.npy"
+        tmp_index = self.index_path + ".tmp"
+        np.save(tmp_matrix, matrix)
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump({"version": self.FORMAT_VERSION, "model": self.model_name, "dim": dim, "keys": keys}, f)
+
+        # Drop our mapping before replacing the file underneath it.
+        self.matrix = None
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_index, self.index_path)
+        self.load()
@@ -0,0 +1,197 @@
+# Version: 1.0
+# Description: Interchangeable encoder backends for IntelligentChatBot. Every backend has the same
+# `encode` interface as SentenceTransformer, a `name` that identifies it together with its settings
+# (used to key cached embeddings), and a `config()` that `make_encoder` can rebuild it from.
+#
+#   "sbert"   the SentenceTransformer model (the default)
+#   "hashed"  pure-NumPy hashed character and word n-grams, for low-latency or offline deployments
+#   "stub"    a deterministic word hash, for tests and offline benchmarks
+
+import hashlib
+import time
+import zlib
+
+import numpy as np
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+class SentenceTransformerEncoder:
+    """
+    A SentenceTransformer model. sentence_transformers (and with it torch) is imported on construction.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        """
+        Args:
+            model_name (str): The name of the sentence transformer model to load.
+        """
+        start = time.perf_counter()
+        from sentence_transformers import SentenceTransformer
+        imported = time.perf_counter()
+        self.model = SentenceTransformer(model_name)
+        self.import_s = imported - start
+        self.load_s = time.perf_counter() - imported
+        self.model_name = model_name
+        # Bare model names keep embedding caches written before there were other backends valid.
+        self.name = model_name
+
+    def config(self):
+        return {"backend": "sbert", "model_name": self.model_name}
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences, **kwargs):
+        """
+        Encodes a list of phrases into a 2D float32 array.
+
+        Args:
+            sentences (list): The phrases to encode.
+            **kwargs: Passed on to `SentenceTransformer.encode`.
+        """
+        return np.asarray(self.model.encode(sentences, **kwargs), dtype=np.float32)
+
+
+class HashedNgramEncoder:
+    """
+    Hashes word n-grams and per-word character n-grams (fastText style, with "<" and ">" marking word
+    boundaries) into a fixed-width signed count vector.
+
+    It needs no model and encodes a short message in microseconds. It captures spelling and word
+    overlap, so it tolerates typos, but it has no notion of synonyms or paraphrase.
+    """
+
+    def __init__(self, dim=512, char_ngrams=(3, 5), word_ngrams=(1, 2), seed=0):
+        """
+        Args:
+            dim (int): The width of the vectors.
+            char_ngrams (tuple): The smallest and largest character n-gram, or None to skip them.
+            word_ngrams (tuple): The smallest and largest word n-gram, or None to skip them.
+            seed (int): Selects a different hash function.
+        """
+        self.dim = dim
+        self.char_ngrams = tuple(char_ngrams) if char_ngrams else None
+        self.word_ngrams = tuple(word_ngrams) if word_ngrams else None
+        self.seed = seed
+        chars = "{}-{}".format(*self.char_ngrams) if self.char_ngrams else "none"
+        words = "{}-{}".format(*self.word_ngrams) if self.word_ngrams else "none"
+        self.name = f"hashed-d{dim}-c{chars}-w{words}-s{seed}"
+
+    def config(self):
+        return {"backend": "hashed", "dim": self.dim, "char_ngrams": self.char_ngrams,
+                "word_ngrams": self.word_ngrams, "seed": self.seed}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _features(self, sentence):
+        words = sentence.lower().split()
+        features = []
+        if self.word_ngrams:
+            low, high = self.word_ngrams
+            for n in range(low, high + 1):
+                features.extend(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+        if self.char_ngrams:
+            low, high = self.char_ngrams
+            for word in words:
+                padded = f"<{word}>"
+                for n in range(low, min(high, len(padded)) + 1):
+                    # A leading tab keeps character n-grams from colliding with whole words.
+                    features.extend("\t" + padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def encode(self, sentences, **kwargs):
+        """
+        Encodes a list of phrases into a 2D float32 array.
+
+        Args:
+            sentences (list): The phrases to encode.
+        """
+        rows, hashes = [], []
+        for row, sentence in enumerate(sentences):
+            features = self._features(sentence)
+            rows.extend([row] * len(features))
+            hashes.extend(zlib.crc32(f.encode("utf-8"), self.seed) for f in features)
+
+        hashes = np.array(hashes, dtype=np.uint64)
+        signs = np.where(hashes >> np.uint64(31) & np.uint64(1), 1.0, -1.0)
+        cells = np.array(rows, dtype=np.int64) * self.dim + (hashes % np.uint64(self.dim)).astype(np.int64)
+        counts = np.bincount(cells, weights=signs, minlength=len(sentences) * self.dim)
+        return counts.reshape(len(sentences), self.dim).astype(np.float32)
+
+
+class StubEncoder:
+    """
+    A deterministic encoder that hashes each word of a phrase into a fixed-width vector.
+
+    It has the same `encode` interface as SentenceTransformer, but it only captures shared words,
+    not meaning, so accuracy numbers obtained with it say nothing about the real model.
+    """
+
+    def __init__(self, dim=384):
+        """
+        Args:
+            dim (int): The width of the vectors.
+        """
+        self.dim = dim
+        self.name = "stub" if dim == 384 else f"stub-d{dim}"
+
+    def config(self):
+        return {"backend": "stub", "dim": self.dim}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, sentences, **kwargs):
+        """
+        Encodes a list of phrases into a 2D float32 array.
+
+        Args:
+            sentences (list): The phrases to encode.
+        """
+        vectors = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for word in sentence.split():
+                digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dim] += 1.0 if (digest >> 32) & 1 else -1.0
+        return vectors
+
+
+ENCODER_BACKENDS = {
+    "sbert": SentenceTransformerEncoder,
+    "hashed": HashedNgramEncoder,
+    "stub": StubEncoder,
+}
+
+
+def encoder_spec(spec="sbert", model_name=DEFAULT_MODEL_NAME):
+    """
+    Returns the config dict of an encoder given as a backend name or a config dict.
+
+    Args:
+        spec (str or dict): A key of `ENCODER_BACKENDS`, or a dict with a "backend" key and constructor arguments.
+        model_name (str): The model the "sbert" backend loads when the spec does not name one.
+    """
+    config = {"backend": spec} if isinstance(spec, str) else dict(spec)
+    if config.get("backend") not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend {config.get('backend')!r}; expected one of {sorted(ENCODER_BACKENDS)}")
+    if config["backend"] == "sbert":
+        config.setdefault("model_name", model_name)
+    return config
+
+
+def make_encoder(spec="sbert", model_name=DEFAULT_MODEL_NAME):
+    """
+    Builds an encoder from a backend name or config dict, or returns the given object if it already is one.
+
+    Args:
+        spec (str, dict or object): A key of `ENCODER_BACKENDS`, a config from an encoder's `config()`,
+            or an encoder instance.
+        model_name (str): The model the "sbert" backend loads when the spec does not name one.
+    """
+    if not isinstance(spec, (str, dict)):
+        return spec
+    config = encoder_spec(spec, model_name)
+    backend = config.pop("backend")
+    return ENCODER_BACKENDS[backend](**config)
@@ -0,0 +1,318 @@
+# Version: 1.0
+# Description: A multi-process inference pool for IntelligentChatBot. The arrays of the bot's search
+# index (exact or IVF, in its storage dtype, over phrases or prototypes) and the intent label codes are
+# placed in shared memory once; every worker attaches to them without copying and only loads its own
+# encoder, so adding workers adds encoder throughput without adding another copy of the corpus.
+
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from chatbot_learning_demo import IntelligentChatBot
+from encoders import make_encoder
+from intent_index import index_from_arrays
+
+
+def _share_array(array):
+    """
+    Copies an array into a new shared memory block and returns the block and its description.
+    """
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return block, {"name": block.name, "shape": array.shape, "dtype": array.dtype.str}
+
+
+def _attach_array(spec):
+    """
+    Attaches to a shared memory block written by `_share_array` and returns the block and a view of it.
+    """
+    block = shared_memory.SharedMemory(name=spec["name"])
+    return block, np.ndarray(spec["shape"], np.dtype(spec["dtype"]), buffer=block.buf)
+
+
+def _worker_main(index_meta, array_specs, codes_spec, intent_names, state, encoder_factory, encoder_config, model_name,
+                 threshold, tasks, results):
+    blocks, arrays, codes, bot = [], {}, None, None
+    try:
+        try:
+            for name, spec in array_specs.items():
+                block, arrays[name] = _attach_array(spec)
+                blocks.append(block)
+            block, codes = _attach_array(codes_spec)
+            blocks.append(block)
+            encoder = encoder_factory(model_name) if encoder_factory else make_encoder(encoder_config, model_name)
+            labels = np.array(intent_names, dtype=object)[codes]
+            # A worker runs exactly the bot's `predict_intents` decision path over the shared index.
+            bot = IntelligentChatBot.from_parts(encoder, index_from_arrays(index_meta, arrays), labels,
+                                                model_name=model_name, **state)
+        except Exception as error:
+            results.put(("ready", repr(error), os.getpid()))
+            return
+        results.put(("ready", None, os.getpid()))
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            job_id, texts = task
+            try:
+                intents, scores = bot.predict_intents(texts, threshold)
+                results.put((job_id, None, (intents.tolist(), scores.tolist())))
+            except Exception as error:
+                results.put((job_id, repr(error), None))
+    finally:
+        # Views of the shared blocks must be gone before the blocks can be closed.
+        bot = arrays = codes = None
+        for block in blocks:
+            block.close()
+
+
+class InferencePool:
+    """
+    Serves `predict_intent` requests from a pool of worker processes that share the bot's read-only
+    search index and label array through `multiprocessing.shared_memory`. Workers answer exactly as
+    `bot.predict_intents` does at the time the pool is created; later edits to the bot are not seen.
+
+    Workers pull chunks of texts from a shared task queue, so a busy worker never holds up the others.
+    If a worker dies, the pool is broken: pending and later requests fail with a RuntimeError, as with
+    `concurrent.futures.ProcessPoolExecutor`. Use the pool as a context manager, or call `close` to stop
+    the workers and free the shared memory.
+    """
+
+    def __init__(self, bot, processes=None, threshold=0.5, encoder_factory=None, start_method="spawn",
+                 poll_interval=0.5):
+        """
+        Args:
+            bot (IntelligentChatBot): The chatbot whose index, intents, fast path, cascade and projection are served.
+                The index arrays are shared; the phrase table, cascade model and projection are copied to
+                every worker.
+            processes (int): The number of worker processes. Defaults to the CPU count.
+            threshold (float): The minimum similarity for an intent match.
+            encoder_factory (callable): Builds a worker's encoder from the model name. It must be picklable.
+                Defaults to rebuilding the bot's encoder from its `encoder_config`; a bot built with a custom
+                encoder that has no config needs one, otherwise a ValueError is raised.
+            start_method (str): The multiprocessing start method. "spawn" avoids forking a process
+                that already has torch threads running.
+            poll_interval (float): Seconds between checks that the workers are still alive.
+        """
+        if encoder_factory is None and bot.encoder_config is None:
+            raise ValueError("The chatbot's encoder has no config to rebuild it from in the workers; pass encoder_factory")
+        bot.wait_until_ready()
+        self.bot = bot
+        self.processes = processes or os.cpu_count() or 1
+        self.threshold = threshold
+        self.poll_interval = poll_interval
+
+        index, label_rows = bot._search
+        index_meta, arrays = index.arrays()
+        intent_names = list(dict.fromkeys(label_rows.view.tolist()))
+        lookup = {name: code for code, name in enumerate(intent_names)}
+        codes = np.array([lookup[intent] for intent in label_rows.view], dtype=np.int32)
+        self._blocks, array_specs = [], {}
+        for name, array in arrays.items():
+            block, array_specs[name] = _share_array(array)
+            self._blocks.append(block)
+        block, codes_spec = _share_array(codes)
+        self._blocks.append(block)
+        state = {
+            "phrase_index": bot.phrase_index if bot.fast_path else None,
+            # A stale cascade is bypassed by the bot until refit_cascade, so the workers skip it too.
+            "cascade": None if bot.cascade_stale else bot.cascade,
+            "cascade_threshold": bot.cascade_threshold,
+            "projection": bot.projection,
+        }
+
+        context = mp.get_context(start_method)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._workers = [
+            context.Process(
+                target=_worker_main,
+                args=(index_meta, array_specs, codes_spec, intent_names, state, encoder_factory, bot.encoder_config,
+                      bot.model_name, threshold, self._tasks, self._results),
+                daemon=True,
+            )
+            for _ in range(self.processes)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._ready = 0
+        self._ready_event = threading.Event()
+        self.broken = None
+        self.closed = False
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def wait_ready(self, timeout=None):
+        """
+        Blocks until every worker has attached to the shared memory and loaded its encoder. Raises a
+        RuntimeError if a worker failed to start or died.
+
+        Args:
+            timeout (float): The longest time to wait in seconds.
+        """
+        ready = self._ready_event.wait(timeout)
+        if self.broken is not None:
+            raise self.broken
+        return ready
+
+    def _break(self, message):
+        """
+        Marks the pool broken, fails every pending request and wakes `wait_ready`.
+        """
+        with self._lock:
+            if self.broken is None:
+                self.broken = RuntimeError(message)
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(self.broken)
+        self._ready_event.set()
+
+    def _collect(self):
+        while True:
+            try:
+                job_id, error, payload = self._results.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if self.closed:
+                    break
+                if self.broken is None:
+                    dead = [worker for worker in self._workers if not worker.is_alive()]
+                    if dead:
+                        self._break(f"inference worker {dead[0].pid} exited with code {dead[0].exitcode}")
+                continue
+            if job_id == "ready":
+                if error is not None:
+                    self._break(f"inference worker {payload} failed to start: {error}")
+                    continue
+                self._ready += 1
+                if self._ready == self.processes:
+                    self._ready_event.set()
+                continue
+            with self._lock:
+                future = self._pending.pop(job_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(f"inference worker failed: {error}"))
+            else:
+                future.set_result(payload)
+
+    def submit(self, texts):
+        """
+        Queues a chunk of texts for classification.
+
+        Args:
+            texts (list): The input texts.
+
+        Returns:
+            Future: Resolves to a list of intents and a list of scores.
+        """
+        if self.closed:
+            raise RuntimeError("the inference pool is closed")
+        future = Future()
+        job_id = next(self._ids)
+        with self._lock:
+            if self.broken is not None:
+                raise self.broken
+            self._pending[job_id] = future
+        self._tasks.put((job_id, list(texts)))
+        return future
+
+    def predict_intents(self, texts, chunk_size=64):
+        """
+        Classifies texts across the workers, one chunk per task.
+
+        Args:
+            texts (list): The input texts.
+            chunk_size (int): The number of texts a worker encodes at a time.
+
+        Returns:
+            tuple: An object array of intents and a float32 array of their similarity scores.
+        """
+        texts = list(texts)
+        futures = [self.submit(texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+        intents, scores = [], []
+        for future in futures:
+            chunk_intents, chunk_scores = future.result()
+            intents.extend(chunk_intents)
+            scores.extend(chunk_scores)
+        return np.array(intents, dtype=object), np.array(scores, dtype=np.float32)
+
+    def predict_intent(self, text):
+        """
+        Classifies a single text on one of the workers.
+
+        Args:
+            text (str): The input text.
+        """
+        return self.submit([text]).result()[0][0]
+
+    def close(self):
+        """
+        Stops the workers and releases the shared memory.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        # No worker is left to read tasks a broken pool never delivered; drop them instead of
+        # blocking interpreter exit on the queue's feeder thread. The collector stops once the
+        # results queue is drained (a killed worker may hold its write lock, so no sentinel is sent).
+        self._tasks.cancel_join_thread()
+        self._tasks.close()
+        self._collector.join()
+        self._results.close()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+
+if __name__ == "__main__":
+    from chatbot_learning_demo import responses, training_data
+
+    parser = argparse.ArgumentParser(description="Measure inference pool throughput as workers are added.")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    parser.add_argument("--projection", choices=["pca", "random"])
+    args = parser.parse_args()
+
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache")
+    bot = IntelligentChatBot(training_data, responses, cache_dir=cache_dir, encoder=args.encoder, projection=args.projection)
+    texts = [phrase for phrase, _ in itertools.islice(itertools.cycle(training_data), args.messages)]
+
+    for processes in args.processes:
+        with InferencePool(bot, processes) as pool:
+            pool.wait_ready()
+            start = time.perf_counter()
+            pool.predict_intents(texts, args.chunk_size)
+            seconds = time.perf_counter() - start
+        print(json.dumps({"processes": processes, "messages": len(texts), "seconds": seconds,
+                          "messages_per_s": len(texts) / seconds}))
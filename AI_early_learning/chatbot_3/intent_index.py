@@ -0,0 +1,839 @@
+# Version: 1.0
+# Description: Nearest-neighbour indexes over unit-length phrase embeddings. The exact index scans
+# every row; the IVF index clusters the corpus and only scans the few clusters closest to a query,
+# so lookups stay sub-linear as the number of training phrases grows.
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+
+def normalize_rows(vectors):
+    """
+    Scales vectors to unit length so that a dot product between them is their cosine similarity.
+
+    Args:
+        vectors (array): A single vector or a 2D array with one vector per row.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores, k):
+    """
+    Returns the column indices of the k highest scores in each row, best first.
+
+    Args:
+        scores (array): A 2D array of scores, one row per query.
+        k (int): The number of results to keep per row.
+    """
+    k = min(k, scores.shape[1])
+    if k == scores.shape[1]:
+        return np.argsort(-scores, axis=1, kind="stable")
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def assign_clusters(vectors, centroids, block=8192):
+    """
+    Returns the index of the most similar centroid for each vector, scoring in blocks of rows.
+
+    Args:
+        vectors (array): A 2D array of unit-length vectors.
+        centroids (array): A 2D array of unit-length centroids.
+        block (int): The number of rows scored at a time.
+    """
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        assignment[start:start + block] = (vectors[start:start + block] @ centroids.T).argmax(axis=1)
+    return assignment
+
+
+def spherical_kmeans(vectors, k, iterations=10, seed=0):
+    """
+    Clusters unit-length vectors by cosine similarity.
+
+    Args:
+        vectors (array): A 2D array of unit-length vectors.
+        k (int): The number of clusters. It is capped at the number of vectors.
+        iterations (int): The number of assignment/update rounds.
+        seed (int or Generator): The random seed or generator for initialization.
+
+    Returns:
+        tuple: The unit-length centroids and the cluster index of every vector.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_clusters(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        present = np.flatnonzero(counts)
+        order = np.argsort(assignment, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts[present])[:-1]])
+
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(vectors[order], starts, axis=0)
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids, assign_clusters(vectors, centroids)
+
+
+def _save_arrays(path, meta, arrays):
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, name + ".npy"), array)
+    with open(os.path.join(path, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def _load_arrays(path, names, mmap=True, optional=("scales",)):
+    with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    mode = "r" if mmap else None
+    arrays = {}
+    for name in names:
+        file = os.path.join(path, name + ".npy")
+        if name in optional and not os.path.exists(file):
+            continue
+        arrays[name] = np.load(file, mmap_mode=mode)
+    return meta, arrays
+
+
+class RowBuffer:
+    """
+    A growable array of rows with amortized appends and in-place compaction on delete.
+
+    The buffer starts out as a view of the array it is given, so wrapping an existing (even
+    memory-mapped, read-only) matrix costs nothing; the data is only copied into an owned,
+    over-allocated array the first time it is modified.
+    """
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows (array): The initial rows. Any trailing shape and dtype is kept.
+        """
+        self._data = rows
+        self._size = len(rows)
+        self._owned = False
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def view(self):
+        """
+        The current rows, as a view of the underlying storage.
+        """
+        return self._data[:self._size]
+
+    def _reserve(self, capacity):
+        if self._owned and capacity <= len(self._data):
+            return
+        capacity = max(capacity, 2 * len(self._data), 16)
+        data = np.empty((capacity,) + self._data.shape[1:], dtype=self._data.dtype)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+        self._owned = True
+
+    def append(self, rows):
+        """
+        Appends rows, growing the storage geometrically when it is full.
+
+        Args:
+            rows (array): The rows to append, with the same trailing shape as the buffer.
+        """
+        rows = np.asarray(rows, dtype=self._data.dtype)
+        self._reserve(self._size + len(rows))
+        self._data[self._size:self._size + len(rows)] = rows
+        self._size += len(rows)
+
+    def replace(self, rows):
+        """
+        Overwrites the current rows in place.
+
+        Args:
+            rows (array): As many rows as the buffer currently holds.
+        """
+        self._reserve(self._size)
+        self._data[:self._size] = rows
+
+    def delete(self, positions):
+        """
+        Removes rows by position, shifting the remaining rows down in place.
+
+        Args:
+            positions (array): The positions of the rows to remove.
+        """
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        positions = positions[(positions >= 0) & (positions < self._size)]
+        if len(positions) == 0:
+            return
+        self._reserve(self._size)
+        write = positions[0]
+        bounds = np.append(positions, self._size)
+        for start, stop in zip(bounds[:-1] + 1, bounds[1:]):
+            count = stop - start
+            self._data[write:write + count] = self._data[start:stop]
+            write += count
+        self._size = int(write)
+
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize_rows(vectors, dtype):
+    """
+    Converts unit-length float vectors to a compact storage type.
+
+    float16 is a plain cast. int8 scales every vector by its own largest magnitude so it uses the
+    full [-127, 127] range; the per-vector scales are returned alongside the codes.
+
+    Args:
+        vectors (array): A 2D array of vectors.
+        dtype (str): One of `STORAGE_DTYPES`.
+
+    Returns:
+        tuple: The codes and a float32 array of per-vector scales (None unless dtype is int8).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, np.float32)
+        scales = scales.astype(np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown storage dtype {dtype!r}; expected one of {STORAGE_DTYPES}")
+
+
+class QuantizedRows:
+    """
+    Growable storage for unit-length vectors in float32, float16 or per-vector-scaled int8, with a
+    scoring kernel that works on the compact codes.
+
+    Compact rows are widened to float32 a block at a time while scoring, so the full-precision
+    matrix never exists in memory and the bytes streamed per query shrink by 2x (float16) or 4x (int8).
+    """
+
+    def __init__(self, vectors, dtype="float32", block_size=16384, codes=None, scales=None):
+        """
+        Args:
+            vectors (array): The initial unit-length vectors, or None when passing `codes`.
+            dtype (str): One of `STORAGE_DTYPES`.
+            block_size (int): The number of rows widened to float32 at a time while scoring.
+            codes (array): Already quantized rows, e.g. loaded from disk.
+            scales (array): The per-vector scales that go with int8 `codes`.
+        """
+        if codes is None:
+            codes, scales = quantize_rows(vectors, dtype)
+        self.dtype = dtype
+        self.block_size = block_size
+        self.codes = RowBuffer(codes)
+        self.scales = RowBuffer(scales) if dtype == "int8" else None
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def dim(self):
+        return self.codes.view.shape[1] if self.codes.view.ndim == 2 else 0
+
+    def nbytes(self):
+        """
+        Returns the number of bytes the stored rows (and scales) take up.
+        """
+        size = self.codes.view.nbytes
+        if self.scales is not None:
+            size += self.scales.view.nbytes
+        return size
+
+    def append(self, vectors):
+        """
+        Quantizes and appends vectors.
+
+        Args:
+            vectors (array): A 2D array of unit-length vectors.
+        """
+        codes, scales = quantize_rows(vectors, self.dtype)
+        self.codes.append(codes)
+        if self.scales is not None:
+            self.scales.append(scales)
+
+    def delete(self, positions):
+        """
+        Removes rows by position, shifting the remaining rows down in place.
+
+        Args:
+            positions (array): The positions of the rows to remove.
+        """
+        self.codes.delete(positions)
+        if self.scales is not None:
+            self.scales.delete(positions)
+
+    def dequantize(self):
+        """
+        Returns the stored rows widened back to float32. Quantizing the result again gives the same codes.
+        """
+        vectors = self.codes.view.astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales.view[:, None]
+        return vectors
+
+    def scores(self, queries):
+        """
+        Returns the similarity of every query to every stored row.
+
+        Args:
+            queries (array): A 2D float32 array of unit-length queries.
+        """
+        codes = self.codes.view
+        if self.dtype == "float32":
+            return queries @ codes.T
+
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), self.block_size):
+            block = codes[start:start + self.block_size].astype(np.float32)
+            out[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            out *= self.scales.view
+        return out
+
+
+class BruteForceIndex:
+    """
+    An exact index that scores a query against every stored vector with one matrix multiply.
+    """
+
+    kind = "exact"
+
+    def __init__(self, dtype="float32"):
+        """
+        Args:
+            dtype (str): How vectors are stored: "float32", "float16" or "int8". See `QuantizedRows`.
+        """
+        self.dtype = dtype
+        self.rows = QuantizedRows(np.zeros((0, 0), dtype=np.float32), dtype)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def nbytes(self):
+        """
+        Returns the number of bytes the stored vectors take up.
+        """
+        return self.rows.nbytes()
+
+    def vectors(self):
+        """
+        Returns the stored vectors as a float32 array in row order, dequantized if stored compactly.
+        """
+        return self.rows.dequantize()
+
+    def build(self, vectors):
+        """
+        Stores the vectors to search. Row positions are used as result ids.
+
+        Args:
+            vectors (array): A 2D array of unit-length vectors. With float32 storage it is used as-is, not copied.
+        """
+        self.rows = QuantizedRows(np.asarray(vectors, dtype=np.float32), self.dtype)
+        return self
+
+    def add(self, vectors):
+        """
+        Appends vectors, which get the next ids in order.
+
+        Args:
+            vectors (array): A 2D array of unit-length vectors.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(self.rows) == 0:
+            return self.build(vectors.copy())
+        self.rows.append(vectors)
+        return self
+
+    def remove(self, ids):
+        """
+        Removes vectors by id. Later ids shift down so that ids stay equal to row positions.
+
+        Args:
+            ids (array): The ids to remove.
+        """
+        self.rows.delete(ids)
+        return self
+
+    def search(self, queries, k=1):
+        """
+        Finds the k most similar stored vectors for each query.
+
+        Args:
+            queries (array): A 2D array of unit-length query vectors.
+            k (int): The number of neighbours to return per query.
+
+        Returns:
+            tuple: A (queries, k) array of similarities and a matching array of ids. Missing
+                neighbours are reported with a score of -inf and an id of -1.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if len(self.rows) == 0:
+            return scores, ids
+
+        similarities = self.rows.scores(queries)
+        best = top_k(similarities, k)
+        scores[:, :best.shape[1]] = np.take_along_axis(similarities, best, axis=1)
+        ids[:, :best.shape[1]] = best
+        return scores, ids
+
+    def arrays(self):
+        """
+        Returns the index's settings and its arrays by name, as written by `save`.
+        """
+        arrays = {"vectors": self.rows.codes.view}
+        if self.rows.scales is not None:
+            arrays["scales"] = self.rows.scales.view
+        return {"kind": self.kind, "version": 1, "dtype": self.dtype}, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """
+        Rebuilds an index from `arrays` output without copying the arrays.
+        """
+        dtype = meta.get("dtype", "float32")
+        index = cls(dtype)
+        index.rows = QuantizedRows(None, dtype, codes=arrays["vectors"], scales=arrays.get("scales"))
+        return index
+
+    def save(self, path):
+        """
+        Saves the index to a directory of `.npy` files.
+
+        Args:
+            path (str): The directory to write to.
+        """
+        _save_arrays(path, *self.arrays())
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads an index saved with `save`, memory-mapping its arrays by default.
+
+        Args:
+            path (str): The directory the index was saved to.
+            mmap (bool): Whether to memory-map the arrays instead of reading them into memory.
+        """
+        return cls.from_arrays(*_load_arrays(path, ["vectors", "scales"], mmap))
+
+
+class IVFIndex:
+    """
+    An approximate inverted-file index. The corpus is split into clusters with spherical k-means,
+    and a query only scans the `n_probe` clusters whose centroids are most similar to it.
+
+    Each cluster keeps its vectors and ids in its own growable buffer, so vectors can be added to
+    and removed from a built index without re-clustering. The centroids stay fixed until the next
+    `build`, so heavy edits slowly degrade recall.
+
+    The lists store stable ids that never change. Until the first removal they equal row positions;
+    after it, a sorted array of the live ids maps them back to positions. A removal only marks its ids
+    dead (a tombstone), and a list is compacted once half of its entries are dead, so an edit costs
+    time in proportion to the rows removed and the lists they sit in, not to the whole index.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, n_lists=None, n_probe=4, iterations=10, sample_size=65536, seed=0, dtype="float32"):
+        """
+        Args:
+            n_lists (int): The number of clusters. Defaults to roughly the square root of the corpus size.
+            n_probe (int): The number of clusters scanned per query. Higher is slower but more accurate.
+            iterations (int): The number of k-means iterations used to fit the centroids.
+            sample_size (int): The maximum number of vectors the centroids are fitted on.
+            seed (int): The random seed for centroid initialization and sampling.
+            dtype (str): How vectors are stored: "float32", "float16" or "int8". Centroids stay float32.
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.seed = seed
+        self.dtype = dtype
+
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.list_vectors = []
+        self.list_ids = []
+        self.size = 0
+        self._reset_ids(0)
+
+    def __len__(self):
+        return self.size
+
+    def nbytes(self):
+        """
+        Returns the number of bytes the stored vectors, ids and centroids take up.
+        """
+        size = (self.centroids.nbytes + sum(v.nbytes() for v in self.list_vectors)
+                + sum(i.view.nbytes for i in self.list_ids))
+        if self._live_ids is not None:
+            size += self._live_ids.view.nbytes + self._dead.view.nbytes + self._list_of.view.nbytes
+        return size
+
+    def vectors(self):
+        """
+        Returns the stored vectors as a float32 array in row order, dequantized if stored compactly.
+        """
+        _, arrays = self.arrays()
+        rows = QuantizedRows(None, self.dtype, codes=arrays["vectors"], scales=arrays.get("scales"))
+        vectors = np.empty((self.size, self.centroids.shape[1]), dtype=np.float32)
+        vectors[arrays["ids"]] = rows.dequantize()
+        return vectors
+
+    def build(self, vectors):
+        """
+        Clusters the vectors and stores them grouped by cluster. Row positions are used as result ids.
+
+        Args:
+            vectors (array): A 2D array of unit-length vectors.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        if n == 0:
+            self.centroids = np.zeros((0, vectors.shape[-1]), dtype=np.float32)
+            self.list_vectors, self.list_ids, self.size = [], [], 0
+            self._reset_ids(0)
+            return self
+
+        n_lists = min(n, self.n_lists or max(1, int(round(np.sqrt(n)))))
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if n > self.sample_size:
+            sample = vectors[rng.choice(n, self.sample_size, replace=False)]
+
+        centroids, _ = spherical_kmeans(sample, n_lists, self.iterations, rng)
+        assignment = assign_clusters(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))])
+        codes, scales = quantize_rows(vectors[order], self.dtype)
+        self._set_lists(centroids, codes, scales, order.astype(np.int64), offsets)
+        return self
+
+    def _set_lists(self, centroids, codes, scales, ids, offsets):
+        self.centroids = centroids
+        self.list_vectors = [
+            QuantizedRows(None, self.dtype, codes=codes[a:b], scales=None if scales is None else scales[a:b])
+            for a, b in zip(offsets[:-1], offsets[1:])
+        ]
+        self.list_ids = [RowBuffer(ids[a:b]) for a, b in zip(offsets[:-1], offsets[1:])]
+        self.size = len(ids)
+        self._reset_ids(len(ids))
+
+    def _reset_ids(self, size):
+        # While nothing has been removed, stable ids are row positions and none of this is allocated.
+        self._next_id = size
+        self._live_ids = None  # the stable id at each row position, ascending
+        self._dead = None  # per stable id, whether it was removed
+        self._list_of = None  # per stable id, the list holding it
+        self._dead_counts = None  # per list, the tombstones it still holds
+
+    def _track_ids(self):
+        self._live_ids = RowBuffer(np.arange(self._next_id, dtype=np.int64))
+        self._dead = RowBuffer(np.zeros(self._next_id, dtype=bool))
+        list_of = np.zeros(self._next_id, dtype=np.int32)
+        for cluster, ids in enumerate(self.list_ids):
+            list_of[ids.view] = cluster
+        self._list_of = RowBuffer(list_of)
+        self._dead_counts = np.zeros(len(self.list_ids), dtype=np.int64)
+
+    def add(self, vectors):
+        """
+        Assigns vectors to their nearest existing cluster and appends them there. They get the next ids in order.
+
+        Args:
+            vectors (array): A 2D array of unit-length vectors.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(self.centroids) == 0:
+            return self.build(vectors)
+
+        assignment = assign_clusters(vectors, self.centroids)
+        ids = np.arange(self._next_id, self._next_id + len(vectors), dtype=np.int64)
+        for cluster in np.unique(assignment):
+            members = assignment == cluster
+            self.list_vectors[cluster].append(vectors[members])
+            self.list_ids[cluster].append(ids[members])
+        if self._live_ids is not None:
+            self._live_ids.append(ids)
+            self._dead.append(np.zeros(len(ids), dtype=bool))
+            self._list_of.append(assignment.astype(np.int32))
+        self._next_id += len(vectors)
+        self.size += len(vectors)
+        return self
+
+    def remove(self, ids):
+        """
+        Removes vectors by id. Later ids shift down so that ids stay equal to corpus positions.
+
+        The removed entries are tombstoned; only lists that end up at least half dead are compacted.
+
+        Args:
+            ids (array): The ids (row positions) to remove.
+        """
+        removed = np.unique(np.asarray(ids, dtype=np.int64))
+        removed = removed[(removed >= 0) & (removed < self.size)]
+        if len(removed) == 0:
+            return self
+        if self._live_ids is None:
+            self._track_ids()
+        stable = self._live_ids.view[removed]
+        self._live_ids.delete(removed)
+        self._dead.view[stable] = True
+        touched = np.bincount(self._list_of.view[stable], minlength=len(self.list_ids))
+        self._dead_counts += touched
+        for cluster in np.flatnonzero(touched):
+            if 2 * self._dead_counts[cluster] >= len(self.list_ids[cluster]):
+                self._compact_list(cluster)
+        self.size -= len(removed)
+        return self
+
+    def _compact_list(self, cluster):
+        drop = np.flatnonzero(self._dead.view[self.list_ids[cluster].view])
+        self.list_vectors[cluster].delete(drop)
+        self.list_ids[cluster].delete(drop)
+        self._dead_counts[cluster] = 0
+
+    def _positions(self, ids):
+        """
+        Maps stable ids to row positions, with -1 for removed ones.
+        """
+        if self._live_ids is None:
+            return ids
+        return np.where(self._dead.view[ids], -1, np.searchsorted(self._live_ids.view, ids))
+
+    def search(self, queries, k=1):
+        """
+        Finds approximately the k most similar stored vectors for each query.
+
+        Args:
+            queries (array): A 2D array of unit-length query vectors.
+            k (int): The number of neighbours to return per query.
+
+        Returns:
+            tuple: A (queries, k) array of similarities and a matching array of ids. Missing
+                neighbours are reported with a score of -inf and an id of -1.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if self.size == 0:
+            return scores, ids
+
+        probes = top_k(queries @ self.centroids.T, self.n_probe)
+        for i, query in enumerate(queries):
+            probed = [c for c in probes[i] if len(self.list_ids[c])]
+            if not probed:
+                continue
+            query = query[None, :]
+            similarities = np.concatenate([self.list_vectors[c].scores(query)[0] for c in probed])
+            candidates = self._positions(np.concatenate([self.list_ids[c].view for c in probed]))
+            similarities[candidates < 0] = -np.inf
+            best = top_k(similarities[None, :], k)[0]
+            best = best[np.isfinite(similarities[best])]
+            scores[i, :len(best)] = similarities[best]
+            ids[i, :len(best)] = candidates[best]
+        return scores, ids
+
+    def arrays(self):
+        """
+        Returns the index's settings and its arrays by name, with the clusters laid out back to back, as
+        written by `save`.
+        """
+        dim = self.centroids.shape[1] if self.centroids.ndim == 2 else 0
+        list_vectors, list_ids = self.list_vectors, self.list_ids
+        if self._live_ids is not None:
+            # Written without tombstones and with ids back to row positions.
+            list_vectors, list_ids = [], []
+            for vectors, ids in zip(self.list_vectors, self.list_ids):
+                positions = self._positions(ids.view)
+                keep = positions >= 0
+                list_vectors.append(QuantizedRows(None, self.dtype, codes=vectors.codes.view[keep],
+                                                  scales=None if vectors.scales is None else vectors.scales.view[keep]))
+                list_ids.append(RowBuffer(positions[keep]))
+        sizes = [len(ids) for ids in list_ids]
+        meta = {"kind": self.kind, "version": 1, "n_probe": self.n_probe, "iterations": self.iterations,
+                "sample_size": self.sample_size, "seed": self.seed, "dtype": self.dtype}
+        empty_codes, empty_scales = quantize_rows(np.zeros((0, dim), np.float32), self.dtype)
+        arrays = {
+            "centroids": self.centroids,
+            "vectors": np.concatenate([v.codes.view for v in list_vectors]) if sizes else empty_codes,
+            "ids": np.concatenate([i.view for i in list_ids]) if sizes else np.zeros(0, np.int64),
+            "offsets": np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+        }
+        if self.dtype == "int8":
+            arrays["scales"] = np.concatenate([v.scales.view for v in list_vectors]) if sizes else empty_scales
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """
+        Rebuilds an index from `arrays` output; each cluster is a view of the given arrays.
+        """
+        index = cls(len(arrays["centroids"]), meta["n_probe"], meta["iterations"], meta["sample_size"], meta["seed"],
+                    meta.get("dtype", "float32"))
+        index._set_lists(arrays["centroids"], arrays["vectors"], arrays.get("scales"), arrays["ids"], arrays["offsets"])
+        return index
+
+    def save(self, path):
+        """
+        Saves the index to a directory of `.npy` files.
+
+        Args:
+            path (str): The directory to write to.
+        """
+        _save_arrays(path, *self.arrays())
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads an index saved with `save`, memory-mapping its arrays by default.
+
+        Args:
+            path (str): The directory the index was saved to.
+            mmap (bool): Whether to memory-map the arrays instead of reading them into memory.
+        """
+        return cls.from_arrays(*_load_arrays(path, ["centroids", "vectors", "ids", "offsets", "scales"], mmap))
+
+
+INDEX_TYPES = {
+    BruteForceIndex.kind: BruteForceIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def make_index(spec="exact", **kwargs):
+    """
+    Returns an unbuilt index from a backend name, or the given object if it already is an index.
+
+    Args:
+        spec (str or object): A key of `INDEX_TYPES` or an index instance.
+        **kwargs: Constructor arguments for the backend.
+    """
+    if isinstance(spec, str):
+        if spec not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {spec!r}; expected one of {sorted(INDEX_TYPES)}")
+        return INDEX_TYPES[spec](**kwargs)
+    return spec
+
+
+def index_from_arrays(meta, arrays):
+    """
+    Rebuilds an index of any backend from the settings and arrays its `arrays` method returned.
+    """
+    return INDEX_TYPES[meta["kind"]].from_arrays(meta, arrays)
+
+
+def load_index(path, mmap=True):
+    """
+    Loads an index of any backend from a directory written by its `save` method.
+
+    Args:
+        path (str): The directory the index was saved to.
+        mmap (bool): Whether to memory-map the arrays instead of reading them into memory.
+    """
+    with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+        kind = json.load(f)["kind"]
+    return INDEX_TYPES[kind].load(path, mmap)
+
+
+def evaluate_index(index, vectors, queries, k=1):
+    """
+    Measures an index's recall against an exact scan together with its query latency.
+
+    Args:
+        index (object): A built index over `vectors`.
+        vectors (array): The unit-length vectors the index was built on.
+        queries (array): Unit-length query vectors.
+        k (int): The number of neighbours compared per query.
+
+    Returns:
+        dict: Recall@k, per-query latency percentiles in milliseconds, and batched queries per second.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    _, expected = BruteForceIndex().build(vectors).search(queries, k)
+
+    latencies = []
+    found = np.empty_like(expected)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        found[i] = index.search(query[None, :], k)[1][0]
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    index.search(queries, k)
+    batch_seconds = time.perf_counter() - start
+
+    hits = sum(len(np.intersect1d(a[a >= 0], b)) for a, b in zip(found, expected))
+    return {
+        "index": index.kind,
+        "size": len(index),
+        "k": k,
+        "recall": hits / float(expected.size),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "batch_qps": len(queries) / batch_seconds if batch_seconds > 0 else float("inf"),
+    }
+
+
+def synthetic_corpus(size, dim=384, clusters=200, noise=1.0, seed=0):
+    """
+    Generates clustered unit vectors that stand in for a large phrase corpus.
+
+    Args:
+        size (int): The number of vectors.
+        dim (int): The vector width.
+        clusters (int): The number of underlying topics.
+        noise (float): The spread of each vector around its topic.
+        seed (int): The random seed.
+    """
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((clusters, dim)))
+    topics = rng.integers(0, clusters, size)
+    jitter = rng.standard_normal((size, dim)).astype(np.float32) * (noise / np.sqrt(dim))
+    return normalize_rows(centers[topics] + jitter)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare index backends on a synthetic corpus.")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    data = synthetic_corpus(args.size + args.queries, args.dim)
+    corpus, queries = data[:args.size], data[args.size:]
+
+    candidates = [BruteForceIndex()] + [IVFIndex(n_lists=args.n_lists, n_probe=p) for p in args.n_probe]
+    for candidate in candidates:
+        start = time.perf_counter()
+        candidate.build(corpus)
+        build_seconds = time.perf_counter() - start
+        report = evaluate_index(candidate, corpus, queries, args.k)
+        report["build_s"] = build_seconds
+        report["n_probe"] = getattr(candidate, "n_probe", None)
+        print(json.dumps(report))
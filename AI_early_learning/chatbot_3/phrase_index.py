@@ -0,0 +1,138 @@
+# Version: 1.0
+# Description: A hash index from normalized training phrases to intents, so messages that are (nearly)
+# literally a training phrase are answered in O(1) without an encoder call.
+
+from collections import Counter
+
+# Words that carry no intent on their own. Only used for the optional stopword-insensitive keys.
+STOPWORDS = frozenset({
+    "a", "an", "the", "so", "just", "really", "very", "please", "um", "uh", "well", "ok", "okay", "oh", "like",
+})
+
+
+def normalize_phrase(phrase):
+    """
+    Collapses runs of whitespace and trims the ends of a preprocessed phrase.
+    """
+    return " ".join(phrase.split())
+
+
+class PhraseIndex:
+    """
+    Maps normalized phrases to intents, optionally with a second table keyed on the phrase minus its
+    stopwords.
+
+    When a key occurs under several intents (e.g. "i feel uneasy" labelled both feeling_worried and
+    feeling_fear), the intent with the most occurrences wins and ties go to the intent whose first
+    occurrence comes earliest in the training data, so the result never depends on hash order.
+    """
+
+    def __init__(self, stopwords=None):
+        """
+        Args:
+            stopwords (iterable): Words ignored by the second, stopword-insensitive table, or None to
+                match normalized phrases only.
+        """
+        self.stopwords = frozenset(stopwords) if stopwords is not None else None
+        self._tables = ({}, {}) if self.stopwords is not None else ({},)
+        self._counts = tuple({} for _ in self._tables)
+        self._position = 0
+
+    def _keys(self, phrase):
+        key = normalize_phrase(phrase)
+        keys = [key]
+        if self.stopwords is not None:
+            keys.append(" ".join(w for w in key.split() if w not in self.stopwords))
+        return keys
+
+    def build(self, phrases, intents):
+        """
+        Indexes phrases and their intents from scratch.
+
+        Args:
+            phrases (list): The preprocessed training phrases.
+            intents (list): The intent of every phrase.
+        """
+        self._tables = tuple({} for _ in self._tables)
+        self._counts = tuple({} for _ in self._tables)
+        self._position = 0
+        return self.add(phrases, intents)
+
+    def add(self, phrases, intents):
+        """
+        Indexes more phrases; conflicts are re-resolved with the new occurrences included.
+
+        Args:
+            phrases (list): The preprocessed phrases.
+            intents (list): The intent of every phrase.
+        """
+        for phrase, intent in zip(phrases, intents):
+            for table, counts, key in zip(self._tables, self._counts, self._keys(phrase)):
+                if not key:
+                    continue
+                # Per intent, the positions of each phrase's occurrences, oldest first.
+                entry = counts.setdefault(key, {})
+                entry.setdefault(intent, {}).setdefault(phrase, []).append(self._position)
+                table[key] = self._winner(entry)
+            self._position += 1
+        return self
+
+    def remove(self, phrases, intents):
+        """
+        Forgets one occurrence of each (phrase, intent) pair, the most recently added one, and
+        re-resolves the affected keys. The cost depends only on the pairs removed.
+
+        Args:
+            phrases (list): The preprocessed phrases, as they were added.
+            intents (list): The intent of every phrase.
+        """
+        for phrase, intent in zip(phrases, intents):
+            for table, counts, key in zip(self._tables, self._counts, self._keys(phrase)):
+                entry = counts.get(key)
+                positions = entry and entry.get(intent, {}).get(phrase)
+                if not positions:
+                    continue
+                positions.pop()
+                if not positions:
+                    del entry[intent][phrase]
+                    if not entry[intent]:
+                        del entry[intent]
+                if entry:
+                    table[key] = self._winner(entry)
+                else:
+                    del counts[key], table[key]
+        return self
+
+    @staticmethod
+    def _winner(entry):
+        # The intent with the most occurrences, ties going to the earliest first occurrence.
+        def rank(intent):
+            occurrences = entry[intent].values()
+            return -sum(map(len, occurrences)), min(p[0] for p in occurrences)
+        return min(entry, key=rank)
+
+    def lookup(self, phrase):
+        """
+        Returns the intent of a preprocessed phrase, or None when it is not a known phrase.
+
+        Args:
+            phrase (str): The preprocessed text.
+        """
+        for table, key in zip(self._tables, self._keys(phrase)):
+            intent = table.get(key)
+            if intent is not None:
+                return intent
+        return None
+
+    def __contains__(self, phrase):
+        return self.lookup(phrase) is not None
+
+    def __len__(self):
+        return len(self._tables[0])
+
+    def conflicts(self):
+        """
+        Returns the normalized phrases indexed under more than one intent, mapped to a Counter of their intents.
+        """
+        return {key: Counter({intent: sum(map(len, occurrences.values())) for intent, occurrences in entry.items()})
+                for key, entry in self._counts[0].items() if len(entry) > 1}
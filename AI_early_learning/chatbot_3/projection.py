@@ -0,0 +1,251 @@
+# Version: 1.0
+# Description: Linear projections that shrink unit-length encoder embeddings (384 wide for
+# all-MiniLM-L6-v2) to a narrower search space before they are indexed. A query then costs one small
+# matrix multiply to project plus a narrower scan of the corpus. Projected vectors are not scaled back to
+# unit length, so their dot products approximate the original cosine similarities and the match threshold
+# keeps its meaning. Run this file to sweep widths and report memory, scoring latency, intent accuracy
+# and how much out-of-domain text still comes out "unknown" at each one.
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from intent_index import normalize_rows
+
+
+class PCAProjection:
+    """
+    Projects onto the top principal directions of the training embeddings about the origin (the top
+    right singular vectors of the training matrix). The embeddings are deliberately not centered:
+    after subtracting the mean, similarities would measure direction from the average phrase, so
+    nonsense or empty input near the origin would match some intent confidently and the match
+    threshold would lose its meaning.
+
+    The directions are the eigenvectors of the second moment matrix, which is accumulated a block of
+    rows at a time, so fitting needs memory for one block plus a d x d matrix.
+    """
+
+    kind = "pca"
+
+    def __init__(self, dim=128, block_size=65536):
+        """
+        Args:
+            dim (int): The output width. It is capped at the input width.
+            block_size (int): The number of rows accumulated into the second moment matrix at a time.
+        """
+        self.dim = dim
+        self.block_size = block_size
+        self.components = None
+
+    @property
+    def fitted(self):
+        return self.components is not None
+
+    def fit(self, vectors):
+        """
+        Fits the projection to a 2D array of embeddings, one per row.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n, width = vectors.shape
+        scatter = np.zeros((width, width), dtype=np.float64)
+        for start in range(0, n, self.block_size):
+            block = vectors[start:start + self.block_size].astype(np.float64)
+            scatter += block.T @ block
+        # eigh returns eigenvalues in ascending order.
+        _, eigenvectors = np.linalg.eigh(scatter / max(n, 1))
+        dim = min(self.dim, width)
+        self.components = np.ascontiguousarray(eigenvectors[:, ::-1][:, :dim].T, dtype=np.float32)
+        return self
+
+    def transform(self, vectors):
+        """
+        Projects a single vector or a 2D array of vectors.
+        """
+        return np.asarray(vectors, dtype=np.float32) @ self.components.T
+
+    def nbytes(self):
+        return 0 if not self.fitted else self.components.nbytes
+
+    def save(self, path):
+        """
+        Writes the fitted projection to a directory.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "components.npy"), self.components)
+        with open(os.path.join(path, "projection.json"), "w", encoding="utf-8") as f:
+            json.dump({"kind": self.kind, "version": 2, "dim": self.dim}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "projection.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != 2:
+            raise ValueError(f"{path}: unsupported projection version {meta.get('version')!r}; refit the projection")
+        projection = cls(meta["dim"])
+        projection.components = np.load(os.path.join(path, "components.npy"))
+        return projection
+
+
+class RandomProjection(PCAProjection):
+    """
+    Projects onto a fixed random Gaussian basis (Johnson-Lindenstrauss). It costs nothing to fit and
+    does not depend on the training data, but it needs a wider output than PCA for the same accuracy.
+
+    The basis only preserves lengths approximately, so projected unit vectors have norms around 1 (about
+    0.8 to 1.3 at 128 wide) and raw dot products can exceed 1. `IntelligentChatBot` caps match scores at 1,
+    and compaction compares rescaled vectors.
+    """
+
+    kind = "random"
+
+    def __init__(self, dim=128, seed=0):
+        """
+        Args:
+            dim (int): The output width.
+            seed (int): The random seed for the basis.
+        """
+        super().__init__(dim)
+        self.seed = seed
+
+    def fit(self, vectors):
+        width = np.asarray(vectors).shape[1]
+        rng = np.random.default_rng(self.seed)
+        self.components = (rng.standard_normal((self.dim, width)) / np.sqrt(self.dim)).astype(np.float32)
+        return self
+
+
+PROJECTION_TYPES = {
+    PCAProjection.kind: PCAProjection,
+    RandomProjection.kind: RandomProjection,
+}
+
+
+def make_projection(spec="pca", dim=128):
+    """
+    Returns an unfitted projection from a name, or the given object if it already is a projection.
+
+    Args:
+        spec (str or object): A key of `PROJECTION_TYPES` or a projection instance.
+        dim (int): The output width for a named projection.
+    """
+    if isinstance(spec, str):
+        if spec not in PROJECTION_TYPES:
+            raise ValueError(f"Unknown projection {spec!r}; expected one of {sorted(PROJECTION_TYPES)}")
+        return PROJECTION_TYPES[spec](dim)
+    return spec
+
+
+def load_projection(path):
+    """
+    Loads a projection of any kind from a directory written by its `save` method.
+    """
+    with open(os.path.join(path, "projection.json"), "r", encoding="utf-8") as f:
+        kind = json.load(f)["kind"]
+    return PROJECTION_TYPES[kind].load(path)
+
+
+def sweep_projections(corpus, corpus_labels, queries, labels, dims, kinds=("pca", "random"), threshold=0.5, repeats=200,
+                      out_of_domain=None):
+    """
+    Scores queries against the corpus at full width and after each projection.
+
+    Args:
+        corpus (array): The raw training embeddings.
+        corpus_labels (array): The intent of every training row.
+        queries (array): The raw query embeddings.
+        labels (array): The expected intent of every query.
+        dims (list): The output widths to try.
+        kinds (list): The projections to try, keys of `PROJECTION_TYPES`.
+        threshold (float): The minimum similarity for a match.
+        repeats (int): The number of single-query scorings timed per configuration.
+        out_of_domain (array): Raw embeddings of texts that match no intent, e.g. nonsense or empty input.
+
+    Returns:
+        list: One dict per configuration with its width, index bytes, multiply-adds and latency per
+            query (projection included), accuracy, agreement with full width, and the share of
+            out-of-domain texts answered "unknown".
+    """
+    corpus = np.asarray(corpus, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    corpus_labels = np.asarray(corpus_labels, dtype=object)
+    labels = np.asarray(labels, dtype=object)
+    out_of_domain = np.zeros((0, corpus.shape[1]), np.float32) if out_of_domain is None else np.asarray(out_of_domain, np.float32)
+
+    def run(projection):
+        def project(vectors):
+            vectors = normalize_rows(vectors)
+            return vectors if projection is None else projection.transform(vectors)
+
+        matrix = project(corpus)
+        scores = project(queries) @ matrix.T
+        best = scores.argmax(axis=1)
+        matched = scores[np.arange(len(best)), best] >= threshold
+        predicted = np.where(matched, corpus_labels[best], "unknown")
+
+        start = time.perf_counter()
+        for i in range(repeats):
+            (project(queries[i % len(queries)][None]) @ matrix.T).argmax()
+        latency = (time.perf_counter() - start) / repeats
+
+        unmatched = (project(out_of_domain) @ matrix.T).max(axis=1, initial=-np.inf) < threshold
+
+        width = matrix.shape[1]
+        return predicted, {
+            "width": width,
+            "index_bytes": int(matrix.nbytes) + (0 if projection is None else projection.nbytes()),
+            "madds_per_query": len(matrix) * width + (0 if projection is None else corpus.shape[1] * width),
+            "latency_us": latency * 1e6,
+            "accuracy": float((predicted == labels).mean()) if len(labels) else 0.0,
+            "ood_unknown_rate": float(unmatched.mean()) if len(unmatched) else None,
+        }
+
+    full, row = run(None)
+    row.update({"projection": None, "agreement": 1.0})
+    report = [row]
+    for kind in kinds:
+        for dim in dims:
+            start = time.perf_counter()
+            projection = make_projection(kind, dim).fit(corpus)
+            fit_s = time.perf_counter() - start
+            predicted, row = run(projection)
+            row.update({"projection": kind, "fit_s": fit_s,
+                        "agreement": float((predicted == full).mean()) if len(labels) else 0.0})
+            report.append(row)
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+
+    from chatbot_learning_demo import IntelligentChatBot, responses, training_data
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from chatbot_common.corpus import held_out_queries, scale_corpus, split_held_out
+
+    parser = argparse.ArgumentParser(description="Sweep projection widths for memory, scoring latency and accuracy.")
+    parser.add_argument("--dims", type=int, nargs="+", default=[32, 64, 128, 256])
+    parser.add_argument("--kinds", nargs="+", default=["pca", "random"], choices=sorted(PROJECTION_TYPES))
+    parser.add_argument("--scale", type=int, default=1, help="grow the corpus this many times with perturbed copies")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--held-out", type=float, default=0.2,
+                        help="share of each intent's phrases kept out of the corpus and used to build the queries")
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    args = parser.parse_args()
+
+    # Texts that should come out "unknown" at any width.
+    out_of_domain = ["", "!!!", "xyzzy", "qwertyuiop asdfgh", "zxcv bnm", "the mitochondria is the powerhouse of the cell",
+                     "parse the yaml config before deploying", "17 38 2049"]
+    # Accuracy is measured on variations of phrases the corpus does not contain, as in benchmark.py.
+    train, held_out = split_held_out(training_data, args.held_out)
+    corpus = scale_corpus(train, args.scale)
+    bot = IntelligentChatBot(corpus, responses, encoder=args.encoder)
+    bot.wait_until_ready()
+    queries = held_out_queries(held_out, args.queries)
+    query_vectors = bot.model.encode([bot.preprocess(q) for q, _ in queries])
+    ood_vectors = bot.model.encode([bot.preprocess(t) for t in out_of_domain])
+    for row in sweep_projections(bot.embedding, bot.intent_labels, query_vectors, [i for _, i in queries], args.dims, args.kinds,
+                                 out_of_domain=ood_vectors):
+        print(json.dumps(row))
@@ -0,0 +1,126 @@
+# Version: 1.0
+# Description: Per-intent prototype vectors. Each intent's phrase embeddings are compressed into a
+# centroid (or a few k-means sub-centroids), so a query is scored against tens of vectors instead
+# of every training phrase. Run this file to compare its accuracy with per-phrase scoring.
+
+import argparse
+import json
+
+import numpy as np
+
+from intent_index import normalize_rows, spherical_kmeans
+
+
+def build_prototypes(vectors, labels, per_intent=1, iterations=10, seed=0):
+    """
+    Compresses each intent's vectors into at most `per_intent` unit-length prototypes.
+
+    Args:
+        vectors (array): A 2D array of unit-length phrase embeddings.
+        labels (array): The intent of every row of `vectors`.
+        per_intent (int): The number of prototypes per intent. 1 uses the plain centroid.
+        iterations (int): The number of k-means iterations when `per_intent` is above 1.
+        seed (int): The random seed for k-means initialization.
+
+    Returns:
+        tuple: A 2D array of prototypes and an object array of their intents.
+    """
+    labels = np.asarray(labels, dtype=object)
+    prototypes, prototype_labels = [], []
+    for intent in dict.fromkeys(labels):
+        members = vectors[labels == intent]
+        centroids = _intent_prototypes(members, per_intent, iterations, seed)
+        prototypes.append(centroids)
+        prototype_labels.extend([intent] * len(centroids))
+
+    if not prototypes:
+        return np.zeros((0, vectors.shape[1]), dtype=np.float32), np.array([], dtype=object)
+    return np.vstack(prototypes), np.array(prototype_labels, dtype=object)
+
+
+def _intent_prototypes(members, per_intent, iterations, seed):
+    if per_intent <= 1 or len(members) <= 1:
+        return normalize_rows(members.sum(axis=0, keepdims=True))
+    centroids, _ = spherical_kmeans(members, per_intent, iterations, seed)
+    return centroids
+
+
+def leave_one_out_accuracy(vectors, labels, per_intent=None, threshold=0.5):
+    """
+    Measures intent accuracy by classifying every training phrase against all of the others.
+
+    Args:
+        vectors (array): A 2D array of unit-length phrase embeddings.
+        labels (array): The intent of every row of `vectors`.
+        per_intent (int): The number of prototypes per intent, or None for per-phrase scoring.
+        threshold (float): The minimum similarity for a match; weaker matches count as wrong.
+    """
+    labels = np.asarray(labels, dtype=object)
+    n = len(labels)
+    if n == 0:
+        return 0.0
+
+    if per_intent is None:
+        similarities = vectors @ vectors.T
+        np.fill_diagonal(similarities, -np.inf)
+        best = similarities.argmax(axis=1)
+        scores = similarities[np.arange(n), best]
+        predicted = labels[best]
+    else:
+        # Only the held-out phrase's own intent changes, so every other intent keeps the
+        # prototypes fitted on the full data.
+        intents = list(dict.fromkeys(labels))
+        fitted = {intent: _intent_prototypes(vectors[labels == intent], per_intent, 10, 0) for intent in intents}
+        predicted = np.empty(n, dtype=object)
+        scores = np.empty(n, dtype=np.float32)
+        for i in range(n):
+            own = labels[i]
+            rest = vectors[(labels == own) & (np.arange(n) != i)]
+            candidates = [fitted[intent] for intent in intents if intent != own]
+            candidate_labels = [intent for intent in intents if intent != own for _ in range(len(fitted[intent]))]
+            if len(rest):
+                held_out = _intent_prototypes(rest, per_intent, 10, 0)
+                candidates.append(held_out)
+                candidate_labels.extend([own] * len(held_out))
+            similarities = np.vstack(candidates) @ vectors[i]
+            best = similarities.argmax()
+            scores[i] = similarities[best]
+            predicted[i] = candidate_labels[best]
+
+    correct = (predicted == labels) & (scores >= threshold)
+    return float(correct.mean())
+
+
+def compare_scoring_modes(vectors, labels, per_intent=(1, 2, 3), threshold=0.5):
+    """
+    Reports leave-one-out accuracy of per-phrase scoring and of each prototype setting.
+
+    Args:
+        vectors (array): A 2D array of unit-length phrase embeddings.
+        labels (array): The intent of every row of `vectors`.
+        per_intent (tuple): The prototype counts to try.
+        threshold (float): The minimum similarity for a match.
+
+    Returns:
+        list: One dict per mode with its vector count, accuracy, and accuracy delta versus per-phrase scoring.
+    """
+    baseline = leave_one_out_accuracy(vectors, labels, None, threshold)
+    report = [{"mode": "phrase", "vectors": len(vectors), "accuracy": baseline, "delta": 0.0}]
+    for k in per_intent:
+        accuracy = leave_one_out_accuracy(vectors, labels, k, threshold)
+        count = len(build_prototypes(vectors, labels, k)[0])
+        report.append({"mode": f"prototype-{k}", "vectors": count, "accuracy": accuracy, "delta": accuracy - baseline})
+    return report
+
+
+if __name__ == "__main__":
+    from chatbot_learning_demo import IntelligentChatBot, responses, training_data
+
+    parser = argparse.ArgumentParser(description="Compare per-phrase and prototype scoring on the bundled training data.")
+    parser.add_argument("--per-intent", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    bot = IntelligentChatBot(training_data, responses)
+    for row in compare_scoring_modes(bot.normalized, bot.intent_labels, args.per_intent, args.threshold):
+        print(json.dumps(row))
@@ -0,0 +1,117 @@
+# Version: 1.0
+# Description: A bounded, thread-safe cache of query embeddings keyed on normalized text, so the
+# encoder only runs on inputs the chatbot has not seen recently.
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """
+    A bounded mapping from preprocessed text to its embedding with LRU or FIFO eviction and an
+    optional time-to-live. Hit, miss, eviction and expiration counts are kept for monitoring.
+    """
+
+    POLICIES = ("lru", "fifo")
+
+    def __init__(self, maxsize=1024, ttl=None, policy="lru", clock=time.monotonic):
+        """
+        Args:
+            maxsize (int): The maximum number of cached embeddings.
+            ttl (float): Seconds an entry stays valid after it is stored, or None to keep it until evicted.
+            policy (str): "lru" evicts the least recently used entry, "fifo" the oldest stored one.
+            clock (callable): The time source, overridable for tests.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}; expected one of {self.POLICIES}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.policy = policy
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the cached embedding for a key, or None if it is missing or expired.
+
+        Args:
+            key (str): The preprocessed text.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and self.clock() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Stores an embedding, evicting entries once the cache is over its size limit.
+
+        Args:
+            key (str): The preprocessed text.
+            value (array): The embedding. A copy is stored, so a row of an encoder batch does not keep
+                the whole batch alive, and it is marked read-only since it is shared between callers.
+        """
+        value = np.array(value, copy=True)
+        value.setflags(write=False)
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+            self._entries[key] = (value, self.clock())
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes every entry. The counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def nbytes(self):
+        """
+        Returns the number of bytes the cached embeddings take up.
+        """
+        with self._lock:
+            return sum(value.nbytes for value, _ in self._entries.values())
+
+    def stats(self):
+        """
+        Returns the cache's size and counters, including its hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
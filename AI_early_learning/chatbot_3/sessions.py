@@ -0,0 +1,226 @@
+# Version: 1.0
+# Description: Serves many concurrent conversations from one shared IntelligentChatBot. Each session
+# only keeps a small, bounded amount of state (its own random source for responses and the last few
+# turns); the model, the embedding matrix and the index are shared read-only across threads. Idle
+# sessions are evicted, and the number of sessions is capped. Run this file to measure how throughput
+# scales with the number of threads.
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Session:
+    """
+    The state of one conversation. Slots keep the per-session overhead to a few hundred bytes plus the RNG.
+    """
+
+    __slots__ = ("session_id", "rng", "created", "last_seen", "turns", "history")
+
+    def __init__(self, session_id, seed, history_size, now):
+        self.session_id = session_id
+        self.rng = random.Random(seed)
+        self.created = now
+        self.last_seen = now
+        self.turns = 0
+        self.history = deque(maxlen=history_size)
+
+
+class SessionManager:
+    """
+    A thread-safe registry of conversations over one shared chatbot.
+
+    Sessions are kept in least-recently-used order, so idle eviction only looks at the oldest entries
+    and a full registry drops the least recently active session to make room.
+    """
+
+    def __init__(self, bot, max_sessions=10000, idle_timeout=900.0, history_size=8, threshold=0.5,
+                 seed=None, clock=time.monotonic):
+        """
+        Args:
+            bot (IntelligentChatBot): The shared chatbot. It is only read from.
+            max_sessions (int): The most sessions kept at once.
+            idle_timeout (float): Seconds without a message after which a session is evicted, or None.
+            history_size (int): The number of (text, intent) turns kept per session.
+            threshold (float): The minimum similarity for an intent match.
+            seed (int): Makes every session's responses reproducible; sessions still get distinct streams.
+            clock (callable): The time source, overridable for tests.
+        """
+        self.bot = bot
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.history_size = history_size
+        self.threshold = threshold
+        self.seed = seed
+        self.clock = clock
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = clock()
+        self.created = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _session_seed(self, session_id):
+        if self.seed is None:
+            return None
+        return f"{self.seed}:{session_id}"
+
+    def session(self, session_id):
+        """
+        Returns the session with this id, creating it if needed, and marks it as active.
+
+        Args:
+            session_id (str): The conversation id.
+        """
+        now = self.clock()
+        with self._lock:
+            if self.idle_timeout is not None and now >= self._next_sweep:
+                self._evict_idle(now)
+                self._next_sweep = now + self.idle_timeout / 4
+
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+                session = Session(session_id, self._session_seed(session_id), self.history_size, now)
+                self._sessions[session_id] = session
+                self.created += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            return session
+
+    def _evict_idle(self, now):
+        # Callers hold the lock. The oldest sessions come first, so stop at the first active one.
+        evicted = 0
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen < self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    def evict_idle(self):
+        """
+        Drops every session that has been idle longer than `idle_timeout` and returns how many were dropped.
+        """
+        if self.idle_timeout is None:
+            return 0
+        with self._lock:
+            return self._evict_idle(self.clock())
+
+    def end_session(self, session_id):
+        """
+        Forgets a session. Returns whether it existed.
+        """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def respond(self, session_id, text):
+        """
+        Classifies one message of a conversation and picks a response with the session's random source.
+
+        Args:
+            session_id (str): The conversation id.
+            text (str): The user's message.
+
+        Returns:
+            dict: The intent, its score, the response and the session's turn number.
+        """
+        return self.respond_many([(session_id, text)])[0]
+
+    def respond_many(self, messages):
+        """
+        Answers messages from any number of sessions with one batched prediction.
+
+        Args:
+            messages (list): (session_id, text) pairs.
+
+        Returns:
+            list: One result dict per message, as returned by `respond`.
+        """
+        messages = list(messages)
+        intents, scores = self.bot.predict_intents([text for _, text in messages], self.threshold)
+        results = []
+        for (session_id, text), intent, score in zip(messages, intents, scores):
+            session = self.session(session_id)
+            # A session's RNG and history are only touched by whoever holds its turn; two threads
+            # answering the same session at once may interleave, but each still gets a valid response.
+            response = self.bot.get_response(intent, session.rng)
+            session.turns += 1
+            session.history.append((text, intent))
+            results.append({"session_id": session_id, "intent": str(intent), "score": float(score),
+                            "response": response, "turn": session.turns})
+        return results
+
+    def stats(self):
+        """
+        Returns the number of live, created and evicted sessions.
+        """
+        with self._lock:
+            return {"sessions": len(self._sessions), "created": self.created, "evicted": self.evicted,
+                    "max_sessions": self.max_sessions}
+
+
+def measure_thread_scaling(bot, texts, thread_counts, sessions=1000, batch_size=1):
+    """
+    Measures message throughput through a SessionManager as threads are added.
+
+    Args:
+        bot (IntelligentChatBot): A ready chatbot.
+        texts (list): The messages to send; they are spread round-robin over the sessions.
+        thread_counts (list): The thread pool sizes to try.
+        sessions (int): The number of concurrent conversations.
+        batch_size (int): Messages per `respond_many` call; 1 sends every message on its own.
+
+    Returns:
+        list: One dict per thread count with its throughput and speedup over the first count.
+    """
+    bot.wait_until_ready()
+    ids = [f"session-{i}" for i in range(sessions)]
+    messages = list(zip(itertools.cycle(ids), texts))
+    batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+
+    report = []
+    for threads in thread_counts:
+        manager = SessionManager(bot, max_sessions=sessions, seed=0)
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            start = time.perf_counter()
+            for _ in pool.map(manager.respond_many, batches):
+                pass
+            seconds = time.perf_counter() - start
+        row = {"threads": threads, "messages": len(messages), "seconds": seconds,
+               "messages_per_s": len(messages) / seconds}
+        row["speedup"] = row["messages_per_s"] / report[0]["messages_per_s"] if report else 1.0
+        report.append(row)
+    return report
+
+
+if __name__ == "__main__":
+    from chatbot_learning_demo import IntelligentChatBot, responses, training_data
+
+    parser = argparse.ArgumentParser(description="Measure session manager throughput as threads are added.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    args = parser.parse_args()
+
+    # The query cache would turn the repeated messages into cache hits; measure the full path.
+    bot = IntelligentChatBot(training_data, responses, encoder=args.encoder, query_cache_size=0, fast_path=False)
+    rng = random.Random(0)
+    texts = [rng.choice(training_data)[0] for _ in range(args.messages)]
+    for row in measure_thread_scaling(bot, texts, args.threads, args.sessions, args.batch_size):
+        print(json.dumps(row))
@@ -0,0 +1,78 @@
+# Version: 1.0
+# Description: Compares float32, float16 and int8 storage of the normalized training embeddings.
+# Reports the memory each one takes, how much it saves, its scoring latency, and how often its
+# top-1 match agrees with the float32 one, and what a whole chatbot holds with each. Run this file
+# to report on the bundled training data.
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from intent_index import STORAGE_DTYPES, BruteForceIndex
+
+
+def _nearest_other(index, vectors):
+    # Each training phrase is its own best match, so look at the best match among the other rows.
+    scores, ids = index.search(vectors, k=2)
+    own = ids[:, 0] == np.arange(len(vectors))
+    return np.where(own, ids[:, 1], ids[:, 0]), np.where(own, scores[:, 1], scores[:, 0])
+
+
+def compare_storage_dtypes(vectors, labels, dtypes=STORAGE_DTYPES, repeats=20):
+    """
+    Scores every training phrase against the rest of the corpus with each storage type.
+
+    Args:
+        vectors (array): A 2D array of unit-length phrase embeddings.
+        labels (array): The intent of every row of `vectors`.
+        dtypes (tuple): The storage types to compare. float32 is always used as the reference.
+        repeats (int): The number of timed batched scoring passes per storage type.
+
+    Returns:
+        list: One dict per storage type with its bytes, memory saved, per-query latency, and
+            top-1 phrase and intent agreement with float32.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    labels = np.asarray(labels, dtype=object)
+    reference = BruteForceIndex("float32").build(vectors)
+    expected_ids, expected_scores = _nearest_other(reference, vectors)
+
+    report = []
+    for dtype in dtypes:
+        index = BruteForceIndex(dtype).build(vectors)
+        ids, scores = _nearest_other(index, vectors)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            index.search(vectors, k=1)
+        seconds = (time.perf_counter() - start) / (repeats * max(len(vectors), 1))
+
+        report.append({
+            "dtype": dtype,
+            "bytes": index.nbytes(),
+            "saved": 1.0 - index.nbytes() / float(max(reference.nbytes(), 1)),
+            "us_per_query": seconds * 1e6,
+            "top1_agreement": float((ids == expected_ids).mean()),
+            "intent_agreement": float((labels[ids] == labels[expected_ids]).mean()),
+            "max_score_error": float(np.abs(scores - expected_scores).max()) if len(vectors) else 0.0,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    from chatbot_learning_demo import IntelligentChatBot, responses, training_data
+
+    parser = argparse.ArgumentParser(description="Compare embedding storage types on the bundled training data.")
+    parser.add_argument("--dtypes", nargs="+", default=list(STORAGE_DTYPES), choices=STORAGE_DTYPES)
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    args = parser.parse_args()
+
+    bot = IntelligentChatBot(training_data, responses, encoder=args.encoder)
+    for row in compare_storage_dtypes(bot.normalized, bot.intent_labels, args.dtypes):
+        print(json.dumps(row))
+    # What a whole chatbot holds with each storage type, reusing the loaded encoder.
+    for dtype in args.dtypes:
+        stored = IntelligentChatBot(training_data, responses, model=bot.model, storage_dtype=dtype)
+        print(json.dumps({"dtype": dtype, "bot": stored.memory_report()}))
@@ -0,0 +1 @@
+# Description: Shared helpers for driving the three chatbots from tools such as benchmark.py.
@@ -0,0 +1,229 @@
+# Version: 1.0
+# Description: A versioned on-disk format for the fitted sparse chatbots (chatbot_1 and chatbot_2), so a
+# process can load its model in milliseconds instead of re-fitting it on every start.
+#
+# An artifact is a directory holding `model.json` (format version, estimator classes and parameters,
+# the label set, the vocabulary and a hash of the training data) and `.npy` files for the large arrays
+# (coefficients, intercepts, IDF weights), which are memory-mapped on load.
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+ARTIFACT_VERSION = 1
+
+
+def _estimator_classes():
+    """
+    Returns the supported vectorizer and classifier classes by name. scikit-learn is imported here
+    rather than at module level, so `training_data_hash` and the artifact metadata can be used without it.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+    vectorizers = {cls.__name__: cls for cls in (CountVectorizer, TfidfVectorizer, HashingVectorizer)}
+    classifiers = {cls.__name__: cls for cls in (LogisticRegression, SGDClassifier)}
+    return vectorizers, classifiers
+
+
+class StaleArtifactError(ValueError):
+    """
+    Raised when an artifact was fitted on different training data than the caller expects.
+    """
+
+
+def training_data_hash(training_data):
+    """
+    Returns a SHA-256 hex digest of (phrase, intent) pairs, order included.
+
+    Args:
+        training_data (iterable): The (phrase, intent) tuples.
+    """
+    digest = hashlib.sha256()
+    for phrase, intent in training_data:
+        digest.update(f"{phrase}\0{intent}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _json_params(estimator):
+    params = {}
+    for name, value in estimator.get_params().items():
+        if name == "dtype":
+            value = np.dtype(value).name
+        elif name == "vocabulary":
+            value = None
+        elif isinstance(value, tuple):
+            value = list(value)
+        elif callable(value):
+            raise ValueError(f"Cannot save {type(estimator).__name__} with a custom {name}")
+        params[name] = value
+    return params
+
+
+def _restore_params(params):
+    params = dict(params)
+    if "dtype" in params:
+        params["dtype"] = np.dtype(params["dtype"]).type
+    if "ngram_range" in params:
+        params["ngram_range"] = tuple(params["ngram_range"])
+    return params
+
+
+def save_sparse_model(path, model, vectorizer, training_data=None):
+    """
+    Writes a fitted vectorizer and linear classifier to an artifact directory.
+
+    Arrays are written first and `model.json` last, each through a temporary file, so a reader
+    never sees a half-written artifact.
+
+    Args:
+        path (str): The directory to write to.
+        model (object): A fitted LogisticRegression or SGDClassifier.
+        vectorizer (object): A fitted CountVectorizer or TfidfVectorizer, or a HashingVectorizer.
+        training_data (list): The (phrase, intent) pairs the model was fitted on, hashed into the
+            artifact so `load_sparse_model` can detect stale models.
+    """
+    vectorizers, classifiers = _estimator_classes()
+    if type(vectorizer).__name__ not in vectorizers or type(model).__name__ not in classifiers:
+        raise ValueError(f"Unsupported model {type(vectorizer).__name__} + {type(model).__name__}")
+
+    arrays = {"coef": np.asarray(model.coef_), "intercept": np.asarray(model.intercept_)}
+    if isinstance(vectorizer, vectorizers["TfidfVectorizer"]) and vectorizer.use_idf:
+        arrays["idf"] = np.asarray(vectorizer.idf_)
+
+    vocabulary = None
+    if hasattr(vectorizer, "vocabulary_"):
+        vocabulary = [None] * len(vectorizer.vocabulary_)
+        for term, column in vectorizer.vocabulary_.items():
+            vocabulary[column] = term
+
+    meta = {
+        "version": ARTIFACT_VERSION,
+        "created": time.time(),
+        "training_hash": training_data_hash(training_data) if training_data is not None else None,
+        "vectorizer": {"class": type(vectorizer).__name__, "params": _json_params(vectorizer)},
+        "classifier": {"class": type(model).__name__, "params": _json_params(model)},
+        "classes": np.asarray(model.classes_).tolist(),
+        "vocabulary": vocabulary,
+        "arrays": sorted(arrays),
+    }
+
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        tmp = os.path.join(path, name + ".tmp.npy")
+        np.save(tmp, np.ascontiguousarray(array))
+        os.replace(tmp, os.path.join(path, name + ".npy"))
+    tmp = os.path.join(path, "model.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, "model.json"))
+
+
+def read_artifact_meta(path):
+    """
+    Returns the parsed `model.json` of an artifact directory.
+
+    Args:
+        path (str): The artifact directory.
+    """
+    with open(os.path.join(path, "model.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"{path}: unsupported artifact version {meta.get('version')!r}; expected {ARTIFACT_VERSION}")
+    return meta
+
+
+def load_sparse_model(path, training_data=None, mmap=True):
+    """
+    Loads an artifact written by `save_sparse_model`.
+
+    Args:
+        path (str): The artifact directory.
+        training_data (list): When given, the artifact must have been fitted on exactly these pairs,
+            otherwise a StaleArtifactError is raised.
+        mmap (bool): Whether to memory-map the arrays instead of reading them into memory. Mapped
+            arrays are read-only, so load with mmap=False to keep training an SGD model with `partial_fit`.
+
+    Returns:
+        tuple: The model and vectorizer, usable with the chatbot's `predict_intents`.
+    """
+    meta = read_artifact_meta(path)
+    if training_data is not None and meta["training_hash"] != training_data_hash(training_data):
+        raise StaleArtifactError(f"{path} was fitted on different training data")
+
+    mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode) for name in meta["arrays"]}
+
+    vectorizers, classifiers = _estimator_classes()
+    vectorizer = vectorizers[meta["vectorizer"]["class"]](**_restore_params(meta["vectorizer"]["params"]))
+    if meta["vocabulary"] is not None:
+        vectorizer.vocabulary_ = {term: column for column, term in enumerate(meta["vocabulary"])}
+    if "idf" in arrays:
+        vectorizer.idf_ = arrays["idf"]
+
+    model = classifiers[meta["classifier"]["class"]](**_restore_params(meta["classifier"]["params"]))
+    model.classes_ = np.array(meta["classes"])
+    model.coef_ = arrays["coef"]
+    model.intercept_ = arrays["intercept"]
+    model.n_features_in_ = model.coef_.shape[1]
+    return model, vectorizer
+
+
+def load_or_compile(path, training_data, train, mmap=True):
+    """
+    Loads the compiled scorer saved in the artifact at `path` if it matches `training_data`, otherwise
+    fits a new model with `train`, saves it there along with its compiled scorer, and returns that.
+    Loading imports neither scikit-learn nor the fitted model, so a warm start serves without sklearn.
+
+    Args:
+        path (str): The artifact directory. The scorer is kept in its `compiled` subdirectory.
+        training_data (list): The (phrase, intent) pairs to serve.
+        train (callable): Fits and returns (model, vectorizer) from `training_data`, e.g. `train_chatbot`.
+        mmap (bool): Whether to memory-map the arrays of a loaded scorer.
+
+    Returns:
+        tuple: A `chatbot_common.compiled.CompiledScorer` and whether it was loaded rather than trained.
+    """
+    from chatbot_common.compiled import CompiledScorer
+
+    compiled_path = os.path.join(path, "compiled")
+    expected = training_data_hash(training_data)
+    try:
+        scorer = CompiledScorer.load(compiled_path, mmap)
+        if scorer.training_hash == expected:
+            return scorer, True
+    except (OSError, ValueError, KeyError):
+        pass
+    model, vectorizer = train(training_data)
+    save_sparse_model(path, model, vectorizer, training_data)
+    scorer = CompiledScorer.compile(model, vectorizer)
+    scorer.training_hash = expected
+    scorer.save(compiled_path)
+    return scorer, False
+
+
+def load_or_train(path, training_data, train, mmap=True):
+    """
+    Loads the artifact at `path` if it matches `training_data`, otherwise fits a new model with
+    `train` and saves it there for the next start.
+
+    Args:
+        path (str): The artifact directory.
+        training_data (list): The (phrase, intent) pairs to serve.
+        train (callable): Fits and returns (model, vectorizer) from `training_data`, e.g. `train_chatbot`.
+        mmap (bool): Whether to memory-map the arrays of a loaded artifact.
+
+    Returns:
+        tuple: The model, the vectorizer, and whether they were loaded rather than trained.
+    """
+    try:
+        model, vectorizer = load_sparse_model(path, training_data, mmap)
+        return model, vectorizer, True
+    except (OSError, ValueError, KeyError):
+        pass
+    model, vectorizer = train(training_data)
+    save_sparse_model(path, model, vectorizer, training_data)
+    return model, vectorizer, False
@@ -0,0 +1,176 @@
+# Version: 1.0
+# Description: Loads any of the three chatbots behind one small interface (train, predict, respond),
+# so tools can drive them interchangeably. Each chatbot folder is put on sys.path, the same way
+# running its script from inside the folder would.
+
+import importlib
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOT_MODULES = {
+    "chatbot_1": "chatbot_lr_demo",
+    "chatbot_2": "chatbot_basic_demo",
+    "chatbot_3": "chatbot_learning_demo",
+}
+
+FALLBACK_RESPONSE = "I'm not sure how to respond to that."
+
+
+def import_bot_module(name):
+    """
+    Imports a chatbot's script as a module.
+
+    Args:
+        name (str): A key of `BOT_MODULES`, e.g. "chatbot_2".
+    """
+    if name not in BOT_MODULES:
+        raise ValueError(f"Unknown chatbot {name!r}; expected one of {sorted(BOT_MODULES)}")
+    folder = os.path.join(ROOT, name)
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+    return importlib.import_module(BOT_MODULES[name])
+
+
+class SparseBot:
+    """
+    Drives chatbot_1 (CountVectorizer + LR) or chatbot_2 (TF-IDF + LR) through their
+    `train_chatbot` and `predict_intents` functions.
+    """
+
+    def __init__(self, name, compiled=False):
+        """
+        Args:
+            name (str): "chatbot_1" or "chatbot_2".
+            compiled (bool): Compile the model into a token-weight scorer after every `train`.
+        """
+        self.name = name
+        self.compiled = compiled
+        self.module = import_bot_module(name)
+        self.training_data = self.module.training_data
+        self.responses = self.module.responses
+        self.model = None
+        self.vectorizer = None
+        self.scorer = None
+
+    def train(self, training_data=None, candidate=None):
+        """
+        Fits the bot on its bundled training data or on the given pairs.
+
+        Args:
+            training_data (list): Optional (phrase, intent) tuples.
+            candidate (dict): Vectorizer and classifier settings picked by
+                `chatbot_common.model_selection`, used instead of the chatbot's own `train_chatbot`.
+        """
+        if candidate is not None:
+            from chatbot_common.model_selection import train_candidate
+
+            self.model, self.vectorizer = train_candidate(self.name, training_data or self.training_data, candidate)
+        else:
+            self.model, self.vectorizer = self.module.train_chatbot(training_data or self.training_data)
+        self.scorer = self.compile() if self.compiled else None
+
+    def train_files(self, paths, **options):
+        """
+        Trains out of core from JSONL or CSV files with a hashed vectorizer and SGD.
+
+        Args:
+            paths (list): The files of phrase/intent records.
+            **options: Extra `chatbot_common.streaming.train_streaming` arguments.
+        """
+        from chatbot_common.streaming import train_streaming
+
+        self.model, self.vectorizer = train_streaming(self.name, paths, **options)
+        self.scorer = None  # hashed models have no vocabulary to compile
+
+    def compile(self):
+        """
+        Replaces the sklearn pipeline in `predict` with a `chatbot_common.compiled.CompiledScorer`
+        that gives the same predictions at a fraction of the per-call cost.
+        """
+        from chatbot_common.compiled import CompiledScorer
+
+        self.scorer = CompiledScorer.compile(self.model, self.vectorizer)
+        return self.scorer
+
+    def predict(self, texts):
+        """
+        Returns an array of intents and an array of their scores for a batch of texts.
+        """
+        if self.scorer is not None:
+            return self.scorer.predict_intents(texts, getattr(self.module, "preprocess", None))
+        return self.module.predict_intents(self.model, self.vectorizer, texts)
+
+    def respond(self, intent):
+        """
+        Returns a random response for an intent.
+        """
+        options = self.responses.get(intent) or self.responses.get("unknown") or [FALLBACK_RESPONSE]
+        return random.choice(options)
+
+
+class EmbeddingBot:
+    """
+    Drives chatbot_3's IntelligentChatBot. The encoder is loaded once and shared across `train` calls,
+    so training time covers the corpus encode and index build but not the model load.
+    """
+
+    def __init__(self, name="chatbot_3", encoder="sbert", **options):
+        """
+        Args:
+            name (str): The chatbot folder, "chatbot_3".
+            encoder (str or object): An encoder backend name from chatbot_3's `encoders.ENCODER_BACKENDS`
+                ("sbert" for the real model, "hashed" or "stub" to run offline), or an encoder object
+                with an `encode` method.
+            **options: Extra IntelligentChatBot constructor arguments.
+        """
+        self.name = name
+        self.module = import_bot_module(name)
+        self.training_data = self.module.training_data
+        self.responses = self.module.responses
+        self.options = options
+        self.encoder = self._load_encoder(encoder)
+        self.bot = None
+
+    def _load_encoder(self, encoder):
+        encoders = importlib.import_module("encoders")
+        return encoders.make_encoder(encoder, self.options.get("model_name", encoders.DEFAULT_MODEL_NAME))
+
+    def train(self, training_data=None):
+        """
+        Builds an IntelligentChatBot on its bundled training data or on the given pairs.
+
+        Args:
+            training_data (list): Optional (phrase, intent) tuples.
+        """
+        self.bot = self.module.IntelligentChatBot(
+            training_data or self.training_data, self.responses, model=self.encoder, **self.options)
+
+    def predict(self, texts):
+        """
+        Returns an array of intents and an array of their scores for a batch of texts.
+        """
+        return self.bot.predict_intents(texts)
+
+    def respond(self, intent):
+        """
+        Returns a random response for an intent.
+        """
+        return self.bot.get_response(intent)
+
+
+def load_bot(name, encoder="sbert", compiled=False, **options):
+    """
+    Returns an untrained adapter for one of the chatbots.
+
+    Args:
+        name (str): A key of `BOT_MODULES`.
+        encoder (str or object): The encoder for chatbot_3; ignored by the sparse chatbots.
+        compiled (bool): Serve the sparse chatbots through a compiled token-weight scorer; ignored by chatbot_3.
+        **options: Extra IntelligentChatBot constructor arguments for chatbot_3.
+    """
+    if name == "chatbot_3":
+        return EmbeddingBot(name, encoder, **options)
+    return SparseBot(name, compiled)
@@ -0,0 +1,314 @@
+# Version: 1.0
+# Description: Compiles a fitted sparse chatbot (CountVectorizer or TF-IDF followed by a linear classifier)
+# into a token-weight scorer. Because the vectorizer and the classifier are both linear in the token
+# counts, each vocabulary term's (IDF-weighted) contribution to every class score can be precomputed;
+# scoring a message is then tokenize, sum a few rows, apply the norm correction, and argmax.
+#
+# Compiling needs the fitted sklearn objects, but this module does not import sklearn, so a process
+# that only loads a saved scorer serves without it.
+#
+#   python -m chatbot_common.compiled --bot chatbot_2
+
+import json
+import math
+import os
+import re
+
+import numpy as np
+
+SCORER_VERSION = 1
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores
+
+
+def _sigmoid(scores):
+    return 1.0 / (1.0 + np.exp(-scores))
+
+
+class CompiledScorer:
+    """
+    Scores texts like `classifier.predict_proba(vectorizer.transform(texts))`, without sparse matrices
+    or sklearn's input validation.
+
+    `token_weights[t]` holds term t's contribution to every class score (its classifier weights
+    times its IDF); a message's scores are the count-weighted sum of its terms' rows, divided by the
+    norm the vectorizer would have applied, plus the intercepts.
+    """
+
+    def __init__(self, classes, vocabulary, token_weights, idf, intercept, token_pattern, lowercase=True,
+                 ngram_range=(1, 1), stop_words=(), binary=False, sublinear_tf=False, norm=None, proba="softmax",
+                 training_hash=None):
+        """
+        Args:
+            classes (list): The class labels, in classifier order.
+            vocabulary (list): The terms, in feature column order.
+            token_weights (array): A (terms, scored classes) array of per-term class contributions.
+            idf (array): Per-term IDF weights, used only for the norm correction, or None.
+            intercept (array): Per-class intercepts.
+            token_pattern (str): The vectorizer's token regular expression.
+            lowercase (bool): Whether texts are lowercased before tokenizing.
+            ngram_range (tuple): The smallest and largest word n-grams.
+            stop_words (iterable): Tokens dropped before building n-grams.
+            binary (bool): Whether term counts are clipped to 1.
+            sublinear_tf (bool): Whether term counts are replaced by 1 + log(count).
+            norm (str): "l2", "l1" or None, as in the vectorizer.
+            proba (str): How scores become probabilities: "softmax" (multinomial LR), "ovr" (one-vs-rest
+                sigmoids, normalized) or "binary" (one sigmoid score for two classes).
+            training_hash (str): The `artifacts.training_data_hash` of the data the model was fitted on, if known.
+        """
+        self.classes_ = np.asarray(classes)
+        self.vocabulary = list(vocabulary)
+        self.columns = {term: column for column, term in enumerate(self.vocabulary)}
+        self.token_weights = token_weights
+        self.idf = idf
+        self.intercept = intercept
+        self.token_pattern = token_pattern
+        self._token_re = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = frozenset(stop_words or ())
+        self.binary = binary
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self.proba = proba
+        self.training_hash = training_hash
+
+    @classmethod
+    def compile(cls, model, vectorizer):
+        """
+        Builds a scorer from a fitted CountVectorizer or TfidfVectorizer and a fitted linear classifier
+        (LogisticRegression, or SGDClassifier with log loss).
+
+        Args:
+            model (object): The fitted classifier.
+            vectorizer (object): The fitted vectorizer.
+        """
+        if (getattr(vectorizer, "analyzer", None) != "word" or vectorizer.tokenizer is not None
+                or vectorizer.preprocessor is not None or vectorizer.strip_accents is not None
+                or not hasattr(vectorizer, "vocabulary_")):
+            raise ValueError("Only word-analyzer CountVectorizer/TfidfVectorizer models with default "
+                             "preprocessing and a fitted vocabulary can be compiled")
+
+        vocabulary = [None] * len(vectorizer.vocabulary_)
+        for term, column in vectorizer.vocabulary_.items():
+            vocabulary[column] = term
+
+        idf = np.asarray(vectorizer.idf_, dtype=np.float64) if getattr(vectorizer, "use_idf", False) else None
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        token_weights = coef.T * idf[:, None] if idf is not None else coef.T.copy()
+
+        if type(model).__name__ == "SGDClassifier":
+            proba = "binary" if coef.shape[0] == 1 else "ovr"
+        else:
+            proba = "binary" if coef.shape[0] == 1 else "softmax"
+
+        return cls(
+            model.classes_, vocabulary, np.ascontiguousarray(token_weights), idf,
+            np.asarray(model.intercept_, dtype=np.float64), vectorizer.token_pattern,
+            lowercase=vectorizer.lowercase, ngram_range=vectorizer.ngram_range,
+            stop_words=vectorizer.get_stop_words(), binary=vectorizer.binary,
+            sublinear_tf=getattr(vectorizer, "sublinear_tf", False), norm=getattr(vectorizer, "norm", None),
+            proba=proba,
+        )
+
+    def _terms(self, text):
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        if self.stop_words:
+            tokens = [t for t in tokens if t not in self.stop_words]
+        low, high = self.ngram_range
+        if high == 1:
+            return tokens
+        terms = tokens if low == 1 else []
+        for n in range(max(low, 2), high + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _counts(self, text):
+        counts = {}
+        columns = self.columns
+        for term in self._terms(text):
+            column = columns.get(term)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        return counts
+
+    def decision_function(self, texts):
+        """
+        Returns the raw class scores of a batch of texts, one row per text.
+
+        Args:
+            texts (list): The input texts, preprocessed the same way as at training time.
+        """
+        texts = list(texts)
+        scores = np.empty((len(texts), self.token_weights.shape[1]), dtype=np.float64)
+        for row, text in enumerate(texts):
+            counts = self._counts(text)
+            if not counts:
+                scores[row] = 0.0
+                continue
+            columns = list(counts)
+            tf = np.fromiter(counts.values(), dtype=np.float64, count=len(columns))
+            if self.binary:
+                tf[:] = 1.0
+            elif self.sublinear_tf:
+                tf = np.log(tf) + 1.0
+            total = tf @ self.token_weights[columns]
+            if self.norm is not None:
+                weighted = tf * self.idf[columns] if self.idf is not None else tf
+                norm = math.sqrt(weighted @ weighted) if self.norm == "l2" else float(np.abs(weighted).sum())
+                if norm > 0:
+                    total /= norm
+            scores[row] = total
+        scores += self.intercept
+        return scores
+
+    def predict_proba(self, texts):
+        """
+        Returns class probabilities for a batch of texts, matching the classifier's `predict_proba`.
+
+        Args:
+            texts (list): The input texts, preprocessed the same way as at training time.
+        """
+        scores = self.decision_function(texts)
+        if self.proba == "binary":
+            positive = _sigmoid(scores[:, 0])
+            return np.column_stack([1.0 - positive, positive])
+        if self.proba == "ovr":
+            probabilities = _sigmoid(scores)
+            totals = probabilities.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            return probabilities / totals
+        return _softmax(scores)
+
+    def predict(self, texts):
+        """
+        Returns the predicted class of each text.
+
+        Args:
+            texts (list): The input texts, preprocessed the same way as at training time.
+        """
+        scores = self.decision_function(texts)
+        if self.proba == "binary":
+            return self.classes_[(scores[:, 0] > 0).astype(int)]
+        return self.classes_[scores.argmax(axis=1)]
+
+    def predict_intents(self, texts, preprocess=None):
+        """
+        Classifies a batch of texts the way the chatbots' `predict_intents` functions do.
+
+        Args:
+            texts (list): The input texts.
+            preprocess (callable): Applied to each text first, e.g. chatbot_2's `preprocess`.
+
+        Returns:
+            tuple: An array of intents and an array of their probabilities.
+        """
+        if preprocess is not None:
+            texts = [preprocess(text) for text in texts]
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return self.classes_[best], probabilities[np.arange(len(best)), best]
+
+    def save(self, path):
+        """
+        Saves the scorer to a directory: `scorer.json` plus `.npy` files for the weight arrays.
+
+        Args:
+            path (str): The directory to write to.
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = {"token_weights": self.token_weights, "intercept": self.intercept}
+        if self.idf is not None:
+            arrays["idf"] = self.idf
+        for name, array in arrays.items():
+            tmp = os.path.join(path, name + ".tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, name + ".npy"))
+
+        meta = {
+            "version": SCORER_VERSION,
+            "classes": self.classes_.tolist(),
+            "vocabulary": self.vocabulary,
+            "token_pattern": self.token_pattern,
+            "lowercase": self.lowercase,
+            "ngram_range": list(self.ngram_range),
+            "stop_words": sorted(self.stop_words),
+            "binary": self.binary,
+            "sublinear_tf": self.sublinear_tf,
+            "norm": self.norm,
+            "proba": self.proba,
+            "training_hash": self.training_hash,
+        }
+        tmp = os.path.join(path, "scorer.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "scorer.json"))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a scorer written by `save`, memory-mapping the weight arrays by default.
+
+        Args:
+            path (str): The directory the scorer was saved to.
+            mmap (bool): Whether to memory-map the arrays instead of reading them into memory.
+        """
+        with open(os.path.join(path, "scorer.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != SCORER_VERSION:
+            raise ValueError(f"{path}: unsupported scorer version {meta.get('version')!r}; expected {SCORER_VERSION}")
+        mode = "r" if mmap else None
+        idf_path = os.path.join(path, "idf.npy")
+        return cls(
+            meta["classes"], meta["vocabulary"],
+            np.load(os.path.join(path, "token_weights.npy"), mmap_mode=mode),
+            np.load(idf_path, mmap_mode=mode) if os.path.exists(idf_path) else None,
+            np.load(os.path.join(path, "intercept.npy")),
+            meta["token_pattern"], lowercase=meta["lowercase"], ngram_range=meta["ngram_range"],
+            stop_words=meta["stop_words"], binary=meta["binary"], sublinear_tf=meta["sublinear_tf"],
+            norm=meta["norm"], proba=meta["proba"], training_hash=meta.get("training_hash"),
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from chatbot_common.bots import SparseBot
+    from chatbot_common.corpus import held_out_queries
+
+    parser = argparse.ArgumentParser(description="Compare a compiled scorer with the sklearn pipeline it was compiled from.")
+    parser.add_argument("--bot", default="chatbot_2", choices=["chatbot_1", "chatbot_2"])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    bot = SparseBot(args.bot)
+    bot.train()
+    scorer = CompiledScorer.compile(bot.model, bot.vectorizer)
+    preprocess = getattr(bot.module, "preprocess", None)
+    texts = [text for text, _ in held_out_queries(bot.training_data, args.queries)]
+
+    expected, expected_scores = bot.predict(texts)
+    intents, scores = scorer.predict_intents(texts, preprocess)
+
+    def per_call(predict):
+        start = time.perf_counter()
+        for text in texts:
+            predict([text])
+        return (time.perf_counter() - start) / len(texts) * 1e6
+
+    print(json.dumps({
+        "bot": args.bot,
+        "queries": len(texts),
+        "agreement": float((intents == expected).mean()),
+        "max_probability_error": float(np.abs(scores - expected_scores).max()),
+        "sklearn_us_per_call": per_call(bot.predict),
+        "compiled_us_per_call": per_call(lambda batch: scorer.predict_intents(batch, preprocess)),
+    }))
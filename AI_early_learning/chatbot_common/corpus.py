@@ -0,0 +1,127 @@
+# Version: 1.0
+# Description: Synthetic variations of the bundled training phrases, used to scale corpora up for
+# benchmarks, to hold out phrases from training, and to build queries from the held-out phrases.
+
+import random
+
+def _phrase_key(phrase):
+    # Phrases that differ only in case or spacing count as the same phrase.
+    return " ".join(phrase.lower().split())
+
+
+FILLERS = ["please", "really", "just", "so", "um", "hey", "well", "today", "now", "ok", "honestly", "like"]
+
+
+def perturb(text, rng, drop_rate=0.15, filler_rate=0.35, typo_rate=0.15):
+    """
+    Returns a noisy variation of a phrase: words may be dropped, filler words inserted, and
+    adjacent letters swapped.
+
+    Args:
+        text (str): The phrase to vary.
+        rng (random.Random): The random source.
+        drop_rate (float): The chance of dropping one word (phrases keep at least one word).
+        filler_rate (float): The chance of inserting a filler word.
+        typo_rate (float): The chance of swapping two adjacent letters in one word.
+    """
+    words = text.split()
+    if len(words) > 1 and rng.random() < drop_rate:
+        del words[rng.randrange(len(words))]
+    if rng.random() < filler_rate:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FILLERS))
+    if words and rng.random() < typo_rate:
+        i = rng.randrange(len(words))
+        word = words[i]
+        if len(word) > 3:
+            j = rng.randrange(len(word) - 1)
+            words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:]
+    return " ".join(words)
+
+
+def scale_corpus(training_data, factor, seed=0, **perturbation):
+    """
+    Grows a training set by `factor`: the original pairs followed by perturbed copies.
+
+    Args:
+        training_data (list): (phrase, intent) tuples.
+        factor (int): The size multiplier. 1 returns the original data.
+        seed (int): The random seed.
+        **perturbation: Rates passed to `perturb`.
+    """
+    rng = random.Random(seed)
+    scaled = list(training_data)
+    for _ in range(int(factor) - 1):
+        scaled.extend((perturb(phrase, rng, **perturbation), intent) for phrase, intent in training_data)
+    return scaled
+
+
+def source_groups(training_data, factor):
+    """
+    Returns, for every pair `scale_corpus(training_data, factor)` produces, the id of the source phrase
+    it was made from. Equal phrases (ignoring case and spacing) share an id. Use them as cross-validation
+    groups, so that no perturbed copy of a test phrase is trained on.
+
+    Args:
+        training_data (list): (phrase, intent) tuples, as passed to `scale_corpus`.
+        factor (int): The size multiplier passed to `scale_corpus`.
+    """
+    ids = {}
+    base = [ids.setdefault(_phrase_key(phrase), len(ids)) for phrase, _ in training_data]
+    return base * max(int(factor), 1)
+
+
+def split_held_out(training_data, fraction=0.2, seed=0):
+    """
+    Splits a training set into the pairs to train on and the pairs held out from training, for
+    measuring accuracy on phrases a chatbot has never seen.
+
+    Every intent gives up about `fraction` of its distinct phrases but keeps at least one. Pairs are
+    grouped by phrase (ignoring case and spacing), so a held-out phrase does not also appear in the
+    training part, under this or another intent.
+
+    Args:
+        training_data (list): (phrase, intent) tuples.
+        fraction (float): The share of each intent's phrases to hold out.
+        seed (int): The random seed.
+
+    Returns:
+        tuple: The training pairs and the held-out pairs, each in their original order.
+    """
+    rng = random.Random(seed)
+    key = _phrase_key
+    phrases_of = {}
+    for phrase, intent in training_data:
+        phrases = phrases_of.setdefault(intent, [])
+        if key(phrase) not in phrases:
+            phrases.append(key(phrase))
+
+    held = set()
+    for intent, phrases in phrases_of.items():
+        candidates = [phrase for phrase in phrases if phrase not in held]
+        rng.shuffle(candidates)
+        kept = len(phrases) - sum(phrase in held for phrase in phrases)
+        count = min(int(round(fraction * len(phrases))), kept - 1)
+        held.update(candidates[:max(count, 0)])
+    train = [(phrase, intent) for phrase, intent in training_data if key(phrase) not in held]
+    held_out = [(phrase, intent) for phrase, intent in training_data if key(phrase) in held]
+    return train, held_out
+
+
+def held_out_queries(training_data, count, seed=1, **perturbation):
+    """
+    Samples perturbed phrases with their intents, for measuring accuracy on unseen wording. Pass the
+    held-out part of `split_held_out`: perturbing phrases the chatbot was trained on leaves many queries
+    unchanged or nearly so, which measures recall of the training set rather than generalization.
+
+    Args:
+        training_data (list): (phrase, intent) tuples to draw from.
+        count (int): The number of queries.
+        seed (int): The random seed. Use a different one than for `scale_corpus`.
+        **perturbation: Rates passed to `perturb`.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        phrase, intent = rng.choice(training_data)
+        queries.append((perturb(phrase, rng, **perturbation), intent))
+    return queries
@@ -0,0 +1,311 @@
+# Version: 1.0
+# Description: Low-overhead per-stage timing and counters for the chatbot pipelines, exported in the
+# Prometheus text format or as periodic JSON dumps.
+#
+# The chatbots take any object with this interface through a `metrics` argument and only call
+# `timer()`, `StageTimer.lap()` and `count_intent()`. When metrics are off, or a request is not
+# sampled, `timer()` returns None and the only cost left is an `if` per stage.
+
+import json
+import os
+import random
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """
+    A fixed-bucket latency histogram with a running sum and count, like a Prometheus histogram.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value, count=1):
+        """
+        Records `count` observations of the same value. Callers hold the owning Metrics lock.
+        """
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += count
+                break
+        else:
+            self.counts[-1] += count
+        self.sum += value * count
+        self.count += count
+
+    def cumulative(self):
+        """
+        Returns (upper bound, cumulative count) pairs, ending with +Inf.
+        """
+        total, pairs = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q):
+        """
+        Estimates a quantile as the upper bound of the bucket that contains it.
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        for bound, total in self.cumulative():
+            if total >= target:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+
+class StageTimer:
+    """
+    Times consecutive pipeline stages of one request. Each `lap` records the time since the
+    previous lap (or since the timer was created) under a stage name.
+
+    A stage that handled a batch of messages at once is recorded per message: its time is split
+    evenly over the `items` in the batch, so every histogram counts messages, not batches.
+    """
+
+    __slots__ = ("metrics", "last")
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.last = time.perf_counter()
+
+    def lap(self, stage, items=1):
+        now = time.perf_counter()
+        if items > 0:
+            self.metrics.observe(stage, (now - self.last) / items, items)
+        self.last = now
+
+
+class Metrics:
+    """
+    Collects per-stage latency histograms, request counts and per-intent counts for one chatbot.
+    """
+
+    def __init__(self, bot="chatbot", sample_rate=1.0, enabled=True, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            bot (str): The value of the `bot` label on every exported series.
+            sample_rate (float): The fraction of requests whose stages are timed. Intents are
+                counted for every request while metrics are enabled.
+            enabled (bool): The master switch. When False nothing is recorded.
+            buckets (tuple): Histogram bucket upper bounds in seconds.
+        """
+        self.bot = bot
+        self.enabled = enabled
+        self.buckets = buckets
+        self.set_sample_rate(sample_rate)
+
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._intents = {}
+        self._requests = 0
+        self._started_at = time.time()
+
+    def set_sample_rate(self, sample_rate):
+        """
+        Changes the fraction of requests that are timed. Each `timer()` call is sampled
+        independently, so callers that time several steps of one request do not alias with a
+        fixed every-Nth pattern.
+
+        Args:
+            sample_rate (float): A number between 0 and 1.
+        """
+        self.sample_rate = sample_rate
+        self._random = random.Random()
+
+    def timer(self):
+        """
+        Returns a StageTimer when this request should be timed, otherwise None.
+        """
+        if not self.enabled or self.sample_rate <= 0:
+            return None
+        if self.sample_rate < 1 and self._random.random() >= self.sample_rate:
+            return None
+        return StageTimer(self)
+
+    def observe(self, stage, seconds, count=1):
+        """
+        Records how long a stage took.
+
+        Args:
+            stage (str): The stage name, e.g. "embed".
+            seconds (float): The elapsed time, per message.
+            count (int): The number of messages that each took `seconds`.
+        """
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds, count)
+
+    def count_intent(self, intent, count=1):
+        """
+        Counts predicted intents; "unknown" predictions drive the unknown rate.
+
+        Args:
+            intent (str): The predicted intent.
+            count (int): How many predictions to count.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._requests += count
+            self._intents[intent] = self._intents.get(intent, 0) + count
+
+    def reset(self):
+        """
+        Clears every histogram and counter.
+        """
+        with self._lock:
+            self._stages.clear()
+            self._intents.clear()
+            self._requests = 0
+            self._started_at = time.time()
+
+    def snapshot(self):
+        """
+        Returns the current metrics as a JSON-serializable dict.
+        """
+        with self._lock:
+            unknown = self._intents.get("unknown", 0)
+            return {
+                "bot": self.bot,
+                "timestamp": time.time(),
+                "since": self._started_at,
+                "sample_rate": self.sample_rate,
+                "predictions": self._requests,
+                "unknown_rate": unknown / self._requests if self._requests else 0.0,
+                "intents": dict(sorted(self._intents.items())),
+                "stages": {
+                    stage: {
+                        "count": h.count,
+                        "sum_s": h.sum,
+                        "mean_s": h.sum / h.count if h.count else 0.0,
+                        "p50_s": h.quantile(0.5),
+                        "p99_s": h.quantile(0.99),
+                        "buckets": [[bound, total] for bound, total in h.cumulative() if bound != float("inf")],
+                    }
+                    for stage, h in sorted(self._stages.items())
+                },
+            }
+
+    def to_prometheus(self, namespace="chatbot"):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Args:
+            namespace (str): The metric name prefix.
+        """
+        bot = _escape(self.bot)
+        lines = [
+            f"# HELP {namespace}_stage_seconds Time spent in each pipeline stage.",
+            f"# TYPE {namespace}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._stages.items()):
+                labels = f'bot="{bot}",stage="{_escape(stage)}"'
+                for bound, total in h.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{namespace}_stage_seconds_bucket{{{labels},le="{le}"}} {total}')
+                lines.append(f"{namespace}_stage_seconds_sum{{{labels}}} {h.sum!r}")
+                lines.append(f"{namespace}_stage_seconds_count{{{labels}}} {h.count}")
+
+            lines.append(f"# HELP {namespace}_predictions_total Predicted intents.")
+            lines.append(f"# TYPE {namespace}_predictions_total counter")
+            for intent, count in sorted(self._intents.items()):
+                lines.append(f'{namespace}_predictions_total{{bot="{bot}",intent="{_escape(intent)}"}} {count}')
+
+            unknown = self._intents.get("unknown", 0) / self._requests if self._requests else 0.0
+            lines.append(f"# HELP {namespace}_unknown_ratio Share of predictions that were 'unknown'.")
+            lines.append(f"# TYPE {namespace}_unknown_ratio gauge")
+            lines.append(f'{namespace}_unknown_ratio{{bot="{bot}"}} {unknown!r}')
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        """
+        Writes a snapshot to a file atomically, so readers never see a partial dump.
+
+        Args:
+            path (str): The file to write.
+        """
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class JsonDumper:
+    """
+    Writes a metrics snapshot to a JSON file every `interval` seconds on a daemon thread.
+    """
+
+    def __init__(self, metrics, path, interval=10.0):
+        """
+        Args:
+            metrics (Metrics): The metrics to dump.
+            path (str): The file to (over)write.
+            interval (float): Seconds between dumps.
+        """
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-json-dump", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the thread after writing one last snapshot.
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.metrics.write_json(self.path)
+        self.metrics.write_json(self.path)
+
+
+def add_metrics_arguments(parser):
+    """
+    Adds the `--metrics-*` options shared by the chatbots' command lines to an argparse parser.
+    """
+    parser.add_argument("--metrics-sample-rate", type=float, default=0.0,
+                        help="fraction of requests whose stages are timed; 0 disables metrics")
+    parser.add_argument("--metrics-json", help="also dump the metrics to this JSON file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=10.0)
+
+
+def metrics_from_args(args, bot):
+    """
+    Builds the metrics requested with the `add_metrics_arguments` options.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+        bot (str): The `bot` label of the exported series.
+
+    Returns:
+        tuple: The Metrics, or None when the sample rate is 0, and a started JsonDumper, or None
+            without `--metrics-json`. Stop the dumper on exit to write the final snapshot.
+    """
+    if args.metrics_sample_rate <= 0:
+        return None, None
+    metrics = Metrics(bot, sample_rate=args.metrics_sample_rate)
+    dumper = JsonDumper(metrics, args.metrics_json, args.metrics_interval).start() if args.metrics_json else None
+    return metrics, dumper
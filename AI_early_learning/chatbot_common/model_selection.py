@@ -0,0 +1,268 @@
+# Version: 1.0
+# Description: Cross-validated model selection for the sparse chatbots (chatbot_1 and chatbot_2). A grid
+# of vectorizer settings (n-grams, min_df, sublinear TF) and logistic regression strengths is scored with
+# stratified k-fold cross-validation on a process pool. Perturbed copies of one source phrase are kept in
+# the same fold, so a test phrase is never trained on. Each task vectorizes one fold once and fits every
+# classifier strength on it, so the vectorized fold is shared by all the candidates that use it. Every
+# candidate is then refit on all the data to measure its size and its per-message latency, and the fastest
+# one that meets an accuracy bar is picked.
+#
+#   python -m chatbot_common.model_selection --bot chatbot_2 --scale 5 --min-accuracy 0.9 --workers 4
+
+import argparse
+import itertools
+import json
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# The vectorizer each chatbot's `train_chatbot` uses.
+VECTORIZERS = {
+    "chatbot_1": "count",
+    "chatbot_2": "tfidf",
+}
+
+DEFAULT_GRID = {
+    "ngram_range": [(1, 1), (1, 2)],
+    "min_df": [1, 2],
+    "sublinear_tf": [False, True],  # TF-IDF only
+    "C": [0.1, 1.0, 10.0],
+}
+
+# Enough iterations for lbfgs to converge on these corpora, unlike the default 100.
+MAX_ITER = 1000
+
+
+def make_vectorizer(kind, **params):
+    """
+    Returns an unfitted CountVectorizer ("count") or TfidfVectorizer ("tfidf").
+    """
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+    if kind == "count":
+        params.pop("sublinear_tf", None)
+        return CountVectorizer(**params)
+    return TfidfVectorizer(**params)
+
+
+def make_classifier(C):
+    from sklearn.linear_model import LogisticRegression
+
+    return LogisticRegression(C=C, max_iter=MAX_ITER)
+
+
+def expand_grid(kind, grid=None):
+    """
+    Returns the (vectorizer params, classifier strengths) pairs a grid expands to.
+
+    Args:
+        kind (str): "count" or "tfidf". Count vectorizers ignore `sublinear_tf`.
+        grid (dict): Lists of values for "ngram_range", "min_df", "sublinear_tf" and "C".
+    """
+    grid = dict(DEFAULT_GRID, **(grid or {}))
+    keys = ["ngram_range", "min_df"] + (["sublinear_tf"] if kind == "tfidf" else [])
+    return [(dict(zip(keys, values)), list(grid["C"]))
+            for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def _score_fold(kind, params, Cs, texts, labels, train, test):
+    # One worker task: vectorize the fold once, then fit every strength on the cached matrices.
+    vectorizer = make_vectorizer(kind, **params)
+    X_train = vectorizer.fit_transform([texts[i] for i in train])
+    X_test = vectorizer.transform([texts[i] for i in test])
+    y_train, y_test = labels[train], labels[test]
+    return [float((make_classifier(C).fit(X_train, y_train).predict(X_test) == y_test).mean()) for C in Cs]
+
+
+def stratified_folds(labels, folds=5, seed=0, groups=None):
+    """
+    Returns stratified (train, test) index arrays. The number of folds is capped at the size of the
+    smallest intent.
+
+    With `groups`, examples of one group (e.g. the perturbed copies of one source phrase) always share a
+    fold, so no test example has a copy in training. An intent with a single group cannot be tested on an
+    unseen phrase, so its examples stay in every training fold and are never tested; the number of folds is
+    then capped at the fewest groups of the tested intents.
+
+    Args:
+        labels (array): The intent of every example.
+        folds (int): The number of folds wanted.
+        seed (int): The random seed for shuffling.
+        groups (array): Optional group ids, one per example.
+    """
+    from sklearn.model_selection import StratifiedGroupKFold, StratifiedKFold
+
+    if groups is not None:
+        groups = np.asarray(groups)
+        counts = {intent: len(np.unique(groups[labels == intent])) for intent in np.unique(labels)}
+        tested = np.array([counts[intent] >= 2 for intent in labels], dtype=bool)
+        if not tested.any():
+            raise ValueError("no intent has 2 distinct source phrases to cross-validate on")
+        rows, always = np.flatnonzero(tested), np.flatnonzero(~tested)
+        splitter = StratifiedGroupKFold(n_splits=min(folds, min(c for c in counts.values() if c >= 2)),
+                                        shuffle=True, random_state=seed)
+        return [(np.concatenate([rows[train], always]), rows[test])
+                for train, test in splitter.split(np.zeros(len(rows)), labels[rows], groups[rows])]
+
+    smallest = min(np.unique(labels, return_counts=True)[1])
+    if smallest < 2:
+        raise ValueError("every intent needs at least 2 examples for cross-validation; grow the corpus with `scale`")
+    splitter = StratifiedKFold(n_splits=min(folds, smallest), shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(labels)), labels))
+
+
+def measure_latency(predict_intents, model, vectorizer, texts, repeats=200, rounds=5):
+    """
+    Returns the seconds the chatbot's `predict_intents` takes for one message: the median over `rounds`
+    timed passes of `repeats` messages each, after one untimed warm-up pass, so a single slow pass (a
+    scheduler hiccup, a cold cache) does not decide the ranking.
+    """
+    def one_pass():
+        start = time.perf_counter()
+        for i in range(repeats):
+            predict_intents(model, vectorizer, [texts[i % len(texts)]])
+        return (time.perf_counter() - start) / repeats
+
+    one_pass()
+    return float(np.median([one_pass() for _ in range(rounds)]))
+
+
+def cross_validate(name, training_data, grid=None, folds=5, workers=None, seed=0, latency_repeats=200, groups=None):
+    """
+    Scores every candidate of a grid for a sparse chatbot.
+
+    Args:
+        name (str): "chatbot_1" or "chatbot_2".
+        training_data (list): (phrase, intent) tuples.
+        grid (dict): Overrides for `DEFAULT_GRID`.
+        folds (int): The number of cross-validation folds.
+        workers (int): The number of worker processes; None uses every CPU, 0 runs in this process.
+        seed (int): The random seed for the fold split.
+        latency_repeats (int): The number of single-message predictions per timed pass (see `measure_latency`).
+        groups (list): The source phrase of every example, e.g. from `corpus.source_groups`, so that copies
+            of one phrase stay in one fold. Without it, copies leak between training and test folds.
+
+    Returns:
+        list: One dict per candidate with its parameters, mean and standard deviation of fold accuracy,
+            vocabulary size, serialized size and latency per message, sorted by latency.
+    """
+    from chatbot_common.bots import import_bot_module
+
+    module = import_bot_module(name)
+    preprocess = getattr(module, "preprocess", None)
+    kind = VECTORIZERS[name]
+    texts = [preprocess(phrase) if preprocess else phrase for phrase, _ in training_data]
+    labels = np.array([intent for _, intent in training_data], dtype=object)
+    splits = stratified_folds(labels, folds, seed, groups)
+    candidates = expand_grid(kind, grid)
+
+    tasks = [(kind, params, Cs, texts, labels, train, test) for params, Cs in candidates for train, test in splits]
+    if workers == 0:
+        results = [_score_fold(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_score_fold, *zip(*tasks)))
+
+    # Refit each candidate on all the data here, not in the pool, so latencies are not skewed by
+    # workers competing for the CPU.
+    report = []
+    for position, (params, Cs) in enumerate(candidates):
+        scores = np.array(results[position * len(splits):(position + 1) * len(splits)])
+        vectorizer = make_vectorizer(kind, **params)
+        X = vectorizer.fit_transform(texts)
+        for column, C in enumerate(Cs):
+            model = make_classifier(C).fit(X, labels)
+            report.append(dict(
+                params, C=C,
+                accuracy=float(scores[:, column].mean()),
+                accuracy_std=float(scores[:, column].std()),
+                features=len(vectorizer.vocabulary_),
+                model_bytes=len(pickle.dumps((model, vectorizer))),
+                latency_us=measure_latency(module.predict_intents, model, vectorizer, [p for p, _ in training_data],
+                                           latency_repeats) * 1e6,
+            ))
+    report.sort(key=lambda row: row["latency_us"])
+    return report
+
+
+def select_candidate(report, min_accuracy=None):
+    """
+    Returns the fastest candidate whose accuracy reaches `min_accuracy`, or the most accurate one if
+    none does (or no bar is given).
+    """
+    if min_accuracy is not None:
+        passing = [row for row in report if row["accuracy"] >= min_accuracy]
+        if passing:
+            return min(passing, key=lambda row: row["latency_us"])
+    return max(report, key=lambda row: (row["accuracy"], -row["latency_us"]))
+
+
+def train_candidate(name, training_data, candidate):
+    """
+    Fits a sparse chatbot with a candidate's settings.
+
+    Args:
+        name (str): "chatbot_1" or "chatbot_2".
+        training_data (list): (phrase, intent) tuples.
+        candidate (dict): A row of `cross_validate`'s report, or just its parameters.
+
+    Returns:
+        tuple: The fitted model and vectorizer, usable with the chatbot's `predict_intents` and `chat`.
+    """
+    from chatbot_common.bots import import_bot_module
+
+    preprocess = getattr(import_bot_module(name), "preprocess", None)
+    kind = VECTORIZERS[name]
+    params = {key: candidate[key] for key in ("ngram_range", "min_df", "sublinear_tf") if key in candidate}
+    params["ngram_range"] = tuple(params.get("ngram_range", (1, 1)))
+    vectorizer = make_vectorizer(kind, **params)
+    X = vectorizer.fit_transform([preprocess(phrase) if preprocess else phrase for phrase, _ in training_data])
+    model = make_classifier(candidate.get("C", 1.0)).fit(X, [intent for _, intent in training_data])
+    return model, vectorizer
+
+
+def main(argv=None):
+    from chatbot_common.bots import import_bot_module
+    from chatbot_common.corpus import scale_corpus, source_groups
+
+    parser = argparse.ArgumentParser(description="Cross-validate a grid of sparse chatbot models and pick the fastest accurate one.")
+    parser.add_argument("--bot", default="chatbot_2", choices=sorted(VECTORIZERS))
+    parser.add_argument("--scale", type=int, default=5,
+                        help="grow the bundled corpus this many times with perturbed copies; copies of a phrase stay in one fold")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, help="worker processes; defaults to every CPU, 0 runs inline")
+    parser.add_argument("--min-accuracy", type=float, help="pick the fastest candidate at or above this accuracy")
+    parser.add_argument("--ngram-max", type=int, nargs="+", help="largest n-gram sizes to try, e.g. 1 2 3")
+    parser.add_argument("--min-df", type=int, nargs="+")
+    parser.add_argument("--C", type=float, nargs="+", dest="C")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the selected candidate to this JSON file, for SparseBot.train(candidate=...)")
+    args = parser.parse_args(argv)
+
+    grid = {}
+    if args.ngram_max:
+        grid["ngram_range"] = [(1, n) for n in args.ngram_max]
+    if args.min_df:
+        grid["min_df"] = args.min_df
+    if args.C:
+        grid["C"] = args.C
+
+    source = import_bot_module(args.bot).training_data
+    training_data = scale_corpus(source, args.scale, seed=args.seed)
+    report = cross_validate(args.bot, training_data, grid, args.folds, args.workers, args.seed,
+                            groups=source_groups(source, args.scale))
+    for row in report:
+        print(json.dumps(row))
+    selected = select_candidate(report, args.min_accuracy)
+    print(json.dumps({"selected": selected}))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(selected, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
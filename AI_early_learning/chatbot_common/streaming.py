@@ -0,0 +1,245 @@
+# Version: 1.0
+# Description: Out-of-core training for the sparse chatbots (chatbot_1 and chatbot_2). (phrase, intent)
+# records are streamed from JSONL or CSV files in fixed-size chunks, hashed into a stateless feature
+# space, and fed to an SGD logistic regression through `partial_fit`, so memory use does not grow with
+# the corpus and a trained model can keep learning from new logs.
+#
+#   python -m chatbot_common.streaming intents.jsonl --bot chatbot_2 --epochs 3
+#
+# The returned (model, vectorizer) pair works with the chatbot's own `predict_intents` and `chat`.
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import time
+
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from chatbot_common.bots import import_bot_module
+
+# How each chatbot's in-memory features are approximated in the hashed space. TF-IDF needs corpus-wide
+# document frequencies, which a stateless vectorizer cannot keep, so chatbot_2 gets L2-normalized term
+# frequencies instead.
+HASHED_FEATURES = {
+    "chatbot_1": {"norm": None},
+    "chatbot_2": {"norm": "l2"},
+}
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_records(path, text_field="text", intent_field="intent"):
+    """
+    Yields (phrase, intent) pairs from a JSONL or CSV file, one line at a time. Files ending in
+    ".gz" are decompressed on the fly.
+
+    JSONL lines are objects with `text_field` and `intent_field` keys, or [phrase, intent] lists.
+    CSV files need a header row naming both fields.
+
+    Args:
+        path (str): A .jsonl, .json, .csv (optionally .gz) file.
+        text_field (str): The key or column holding the phrase.
+        intent_field (str): The key or column holding the intent.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    is_csv = os.path.splitext(name)[1].lower() == ".csv"
+    with _open_text(path) as f:
+        if is_csv:
+            reader = csv.DictReader(f)
+            if reader.fieldnames is None or text_field not in reader.fieldnames or intent_field not in reader.fieldnames:
+                raise ValueError(f"{path}: the CSV header must name the {text_field!r} and {intent_field!r} columns")
+            for row in reader:
+                yield row[text_field], row[intent_field]
+            return
+
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    yield record[text_field], record[intent_field]
+                else:
+                    phrase, intent = record
+                    yield phrase, intent
+            except (ValueError, KeyError, TypeError) as error:
+                raise ValueError(f"{path}:{line_number}: expected a JSON object or [phrase, intent] pair: {error}")
+
+
+def iter_records(paths, **fields):
+    """
+    Yields (phrase, intent) pairs from several files in order.
+
+    Args:
+        paths (list): The files to read.
+        **fields: `text_field` and `intent_field`, passed on to `read_records`.
+    """
+    for path in paths:
+        yield from read_records(path, **fields)
+
+
+def shuffled(records, buffer_size, seed=0):
+    """
+    Yields records in a locally shuffled order using a bounded buffer, so logs that are grouped
+    by intent do not reach SGD one class at a time.
+
+    Args:
+        records (iterable): The records to shuffle.
+        buffer_size (int): How many records are held at once. 0 or 1 keeps the input order.
+        seed (int): The random seed.
+    """
+    if buffer_size <= 1:
+        yield from records
+        return
+    rng = random.Random(seed)
+    buffer = []
+    for record in records:
+        if len(buffer) < buffer_size:
+            buffer.append(record)
+            continue
+        i = rng.randrange(buffer_size)
+        yield buffer[i]
+        buffer[i] = record
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def chunked(records, chunk_size):
+    """
+    Yields lists of at most `chunk_size` records.
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def scan_intents(paths, **fields):
+    """
+    Reads every file once and returns the sorted set of intents. `partial_fit` needs the full list
+    of classes up front; only the distinct intents are kept in memory.
+
+    Args:
+        paths (list): The files to read.
+        **fields: `text_field` and `intent_field`, passed on to `read_records`.
+    """
+    return sorted({intent for _, intent in iter_records(paths, **fields)})
+
+
+def make_streaming_model(name, n_features=2 ** 20, alpha=1e-5, seed=0):
+    """
+    Returns an untrained SGD logistic regression and a hashing vectorizer for a sparse chatbot.
+
+    Args:
+        name (str): "chatbot_1" or "chatbot_2".
+        n_features (int): The width of the hashed feature space.
+        alpha (float): The L2 regularization strength.
+        seed (int): The random seed of the classifier.
+    """
+    if name not in HASHED_FEATURES:
+        raise ValueError(f"Streaming training supports {sorted(HASHED_FEATURES)}, not {name!r}")
+    vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, **HASHED_FEATURES[name])
+    model = SGDClassifier(loss="log_loss", alpha=alpha, random_state=seed)
+    return model, vectorizer
+
+
+def partial_fit_records(model, vectorizer, records, classes=None, chunk_size=10000, preprocess=None):
+    """
+    Updates a model with records, one chunk at a time.
+
+    Args:
+        model (SGDClassifier): The model to update. It must already be fitted unless `classes` is given.
+        vectorizer (HashingVectorizer): The stateless vectorizer the model was trained with.
+        records (iterable): (phrase, intent) pairs.
+        classes (list): Every intent the model will ever see. Required on the first call only.
+        chunk_size (int): The number of records vectorized and fitted together.
+        preprocess (callable): Applied to each phrase before vectorizing, matching what the
+            chatbot's `predict_intents` does at inference time.
+
+    Returns:
+        int: The number of records fitted.
+    """
+    fitted = 0
+    for chunk in chunked(records, chunk_size):
+        texts = [preprocess(phrase) if preprocess else phrase for phrase, _ in chunk]
+        labels = [intent for _, intent in chunk]
+        model.partial_fit(vectorizer.transform(texts), labels, classes=classes)
+        classes = None
+        fitted += len(chunk)
+    return fitted
+
+
+def train_streaming(name, paths, classes=None, epochs=1, chunk_size=10000, shuffle_buffer=10000,
+                    n_features=2 ** 20, alpha=1e-5, seed=0, **fields):
+    """
+    Trains a sparse chatbot from files that need not fit in memory.
+
+    Args:
+        name (str): "chatbot_1" or "chatbot_2".
+        paths (list): JSONL or CSV files of (phrase, intent) records.
+        classes (list): Every intent in the data. Scanned from the files when omitted.
+        epochs (int): The number of passes over the files.
+        chunk_size (int): The number of records fitted together.
+        shuffle_buffer (int): The size of the local shuffle buffer; 0 keeps the file order.
+        n_features (int): The width of the hashed feature space.
+        alpha (float): The L2 regularization strength.
+        seed (int): The random seed for the classifier and shuffling.
+        **fields: `text_field` and `intent_field`, passed on to `read_records`.
+
+    Returns:
+        tuple: The model and vectorizer, usable with the chatbot's `predict_intents`.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    preprocess = getattr(import_bot_module(name), "preprocess", None)
+    model, vectorizer = make_streaming_model(name, n_features, alpha, seed)
+    classes = sorted(classes) if classes is not None else scan_intents(paths, **fields)
+    if not classes:
+        raise ValueError("The training files contain no records")
+
+    for epoch in range(epochs):
+        records = shuffled(iter_records(paths, **fields), shuffle_buffer, seed + epoch)
+        partial_fit_records(model, vectorizer, records, classes if epoch == 0 else None, chunk_size, preprocess)
+    return model, vectorizer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train a sparse chatbot from JSONL/CSV files in constant memory.")
+    parser.add_argument("paths", nargs="+", help="JSONL or CSV files of phrase/intent records")
+    parser.add_argument("--bot", default="chatbot_2", choices=sorted(HASHED_FEATURES))
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--shuffle-buffer", type=int, default=10000)
+    parser.add_argument("--n-features", type=int, default=2 ** 20)
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--intent-field", default="intent")
+    parser.add_argument("--chat", action="store_true", help="chat with the trained model afterwards")
+    args = parser.parse_args()
+
+    fields = {"text_field": args.text_field, "intent_field": args.intent_field}
+    start = time.perf_counter()
+    model, vectorizer = train_streaming(args.bot, args.paths, epochs=args.epochs, chunk_size=args.chunk_size,
+                                        shuffle_buffer=args.shuffle_buffer, n_features=args.n_features, **fields)
+    print(json.dumps({"bot": args.bot, "intents": len(model.classes_), "epochs": args.epochs,
+                      "seconds": time.perf_counter() - start}))
+
+    if args.chat:
+        module = import_bot_module(args.bot)
+        if args.bot == "chatbot_1":
+            module.chat(model, vectorizer, module.responses)
+        else:
+            module.chat(model, vectorizer)
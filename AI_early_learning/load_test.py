@@ -0,0 +1,412 @@
+# Version: 1.0
+# Description: A load generator and soak test for the chat pipeline. Utterances are replayed from a
+# chatbot's bundled training data (with perturbations) or from log files. They are sent through predict
+# and respond, either in-process or to a running chat_server.py, at a fixed concurrency (closed loop) or
+# a target rate (open loop, with a cap on requests in flight). Every interval a JSON line with throughput,
+# latency percentiles, errors and resident memory is printed, followed by a summary. Optional limits turn
+# the run into a pass/fail check.
+#
+#   python load_test.py --bot chatbot_2 --concurrency 8 --duration 60
+#   python load_test.py --bot chatbot_3 --encoder hashed --rate 500 --duration 600 --max-rss-growth-mb 50
+#   python load_test.py --url http://127.0.0.1:8080 --pid 12345 --rate 200 --logs queries.txt
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from chatbot_common.bots import BOT_MODULES, import_bot_module, load_bot
+from chatbot_common.corpus import perturb
+
+
+def rss_mb(pid=None):
+    """
+    Returns the current resident set size of a process in MB. Without /proc (e.g. on macOS), returns
+    the peak RSS of this process instead.
+
+    Args:
+        pid (int): The process to measure, or None for this one.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        if pid is not None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def build_utterances(training_data=None, log_paths=None, count=10000, seed=0, **perturbation):
+    """
+    Returns the utterances to replay: the lines of the log files, or `count` perturbed training phrases.
+
+    Args:
+        training_data (list): (phrase, intent) tuples to sample from when there are no logs.
+        log_paths (list): Text or JSONL files, read as by `bulk_classify.read_utterances`.
+        count (int): The number of utterances sampled from the training data.
+        seed (int): The random seed for sampling and perturbing.
+        **perturbation: Rates passed to `chatbot_common.corpus.perturb`.
+    """
+    if log_paths:
+        from bulk_classify import read_utterances
+
+        utterances = list(read_utterances(log_paths))
+        if not utterances:
+            raise ValueError("the log files hold no utterances")
+        return utterances
+    rng = random.Random(seed)
+    return [perturb(rng.choice(training_data)[0], rng, **perturbation) for _ in range(count)]
+
+
+class InProcessTarget:
+    """
+    Sends each utterance through a trained chatbot adapter's `predict` and `respond`.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def __call__(self, text):
+        intents, _ = self.bot.predict([text])
+        return self.bot.respond(intents[0])
+
+
+class HttpTarget:
+    """
+    POSTs each utterance to a chat_server.py `/chat` endpoint over one keep-alive connection per thread.
+    """
+
+    def __init__(self, url, timeout=10.0):
+        parsed = urllib.parse.urlsplit(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.path = parsed.path.rstrip("/") + "/chat"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self, text):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request("POST", self.path, json.dumps({"text": text}), {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next request.
+            connection.close()
+            self._local.connection = None
+            raise
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}: {body[:200]!r}")
+        return json.loads(body)
+
+
+class LatencyHistogram:
+    """
+    Counts latencies in fixed, geometrically spaced buckets, so a soak run's overall percentiles take
+    constant memory however many requests it sends. A percentile is the upper edge of its bucket, at
+    most `growth` - 1 (1% by default) above the exact value; the maximum is exact.
+    """
+
+    def __init__(self, smallest=1e-6, largest=1e3, growth=1.01):
+        """
+        Args:
+            smallest (float): The upper edge of the first bucket, in seconds. Smaller latencies go in it.
+            largest (float): Latencies above this, in seconds, go in the last bucket.
+            growth (float): The ratio between the edges of consecutive buckets.
+        """
+        count = int(np.ceil(np.log(largest / smallest) / np.log(growth))) + 1
+        self.edges = smallest * growth ** np.arange(count)
+        self.counts = np.zeros(count + 1, dtype=np.int64)
+        self.max = 0.0
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    def add(self, latencies):
+        """
+        Adds latencies in seconds.
+        """
+        latencies = np.asarray(latencies, dtype=np.float64)
+        if len(latencies):
+            self.counts += np.bincount(np.searchsorted(self.edges, latencies), minlength=len(self.counts))
+            self.max = max(self.max, float(latencies.max()))
+        return self
+
+    def percentile(self, p):
+        """
+        Returns the latency in seconds below which `p` percent of the added latencies fall.
+        """
+        cumulative = np.cumsum(self.counts)
+        bucket = int(np.searchsorted(cumulative, p / 100 * cumulative[-1]))
+        if bucket == len(self.edges):
+            return self.max
+        return min(float(self.edges[bucket]), self.max)
+
+
+class Recorder:
+    """
+    Collects latencies and errors from many threads, one window per reporting interval. Closed windows are
+    folded into a `LatencyHistogram`, so memory does not grow with the length of the run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._errors = 0
+        self._dropped = 0
+        self.total = 0
+        self.total_errors = 0
+        self.total_dropped = 0
+        self.histogram = LatencyHistogram()
+        self.last_error = None
+
+    def record(self, latency, error=None):
+        with self._lock:
+            self._latencies.append(latency)
+            self.total += 1
+            if error is not None:
+                self._errors += 1
+                self.total_errors += 1
+                self.last_error = repr(error)
+
+    def drop(self):
+        """
+        Counts a request that was never sent because too many were already in flight.
+        """
+        with self._lock:
+            self._dropped += 1
+            self.total_dropped += 1
+
+    def take_window(self):
+        """
+        Returns the latencies, the error count and the dropped count since the last call, and starts a
+        new window.
+        """
+        with self._lock:
+            latencies, errors, dropped = self._latencies, self._errors, self._dropped
+            self._latencies, self._errors, self._dropped = [], 0, 0
+        self.histogram.add(latencies)
+        return latencies, errors, dropped
+
+
+def summarize(latencies, errors, seconds, dropped=0):
+    """
+    Returns the request count, throughput, error and drop rates and latency percentiles in milliseconds of
+    a window. `latencies` is a list of seconds or a `LatencyHistogram`.
+    """
+    count = len(latencies)
+    summary = {"requests": count, "errors": errors, "dropped": dropped,
+               "rps": count / seconds if seconds > 0 else 0.0,
+               "error_rate": errors / count if count else 0.0,
+               "drop_rate": dropped / (count + dropped) if count + dropped else 0.0}
+    if count:
+        if isinstance(latencies, LatencyHistogram):
+            for p in (50, 95, 99):
+                summary[f"p{p}_ms"] = latencies.percentile(p) * 1000
+            summary["max_ms"] = latencies.max * 1000
+        else:
+            latencies_ms = np.asarray(latencies) * 1000
+            for p in (50, 95, 99):
+                summary[f"p{p}_ms"] = float(np.percentile(latencies_ms, p))
+            summary["max_ms"] = float(latencies_ms.max())
+    return summary
+
+
+def _send(target, text, recorder, scheduled, in_flight=None):
+    # Latency runs from the scheduled send time, so a backlog in open-loop mode shows up as latency
+    # instead of silently lowering the request rate.
+    try:
+        target(text)
+        error = None
+    except Exception as exc:
+        error = exc
+    finally:
+        if in_flight is not None:
+            in_flight.release()
+    recorder.record(time.perf_counter() - scheduled, error)
+
+
+def run_load(target, utterances, duration, concurrency=1, rate=None, interval=5.0, warmup=0.0, pid=None,
+             out=sys.stdout, max_in_flight=None):
+    """
+    Drives a target with load for `duration` seconds and reports every `interval` seconds.
+
+    Args:
+        target (callable): Called with one utterance per request; an exception counts as an error.
+        utterances (list): The utterances, replayed round-robin.
+        duration (float): Seconds to run for.
+        concurrency (int): The number of worker threads.
+        rate (float): Requests per second to start, spread over the workers (open loop), or None to
+            have every worker send its next request as soon as the last one returns (closed loop).
+        max_in_flight (int): In open loop, the most requests that may be sent or queued for a worker at
+            once; a request due while the cap is reached is dropped and counted. Bounding the queue keeps
+            an overloaded target from building a backlog that outlives `duration`. Defaults to twice
+            `concurrency`.
+        interval (float): Seconds between report lines.
+        warmup (float): Seconds at the start that are excluded from the RSS growth baseline.
+        pid (int): The process whose RSS is reported, e.g. a chat server's, or None for this one.
+        out (file): Where the report lines are written, or None.
+
+    Returns:
+        dict: The overall throughput, error and drop rates and latency percentiles, and the RSS at the
+            end of the warm-up, at the end, and the growth in between.
+    """
+    recorder = Recorder()
+    texts = itertools.cycle(utterances)
+    next_text = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + duration
+    stop = threading.Event()
+    in_flight = threading.BoundedSemaphore(max_in_flight or 2 * concurrency)
+
+    def take_text():
+        with next_text:
+            return next(texts)
+
+    def closed_loop():
+        while not stop.is_set() and time.perf_counter() < deadline:
+            _send(target, take_text(), recorder, time.perf_counter())
+
+    def open_loop(pool):
+        for i in itertools.count():
+            scheduled = started + i / rate
+            if scheduled >= deadline or stop.is_set():
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if in_flight.acquire(blocking=False):
+                pool.submit(_send, target, take_text(), recorder, scheduled, in_flight)
+            else:
+                recorder.drop()
+
+    timeline = []
+    baseline_rss = rss_mb(pid) if warmup <= 0 else None
+
+    def report():
+        nonlocal baseline_rss
+        last = started
+        while True:
+            finished = stop.wait(max(0.0, last + interval - time.perf_counter()))
+            now = time.perf_counter()
+            latencies, errors, dropped = recorder.take_window()
+            row = {"t": round(now - started, 3), **summarize(latencies, errors, now - last, dropped),
+                   "rss_mb": rss_mb(pid)}
+            timeline.append(row)
+            if baseline_rss is None and now - started >= warmup:
+                baseline_rss = row["rss_mb"]
+            if out is not None:
+                print(json.dumps(row), file=out, flush=True)
+            last = now
+            if finished:
+                return
+
+    reporter = threading.Thread(target=report, name="load-test-report", daemon=True)
+    reporter.start()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load-test") as pool:
+            if rate:
+                open_loop(pool)
+            else:
+                for _ in range(concurrency):
+                    pool.submit(closed_loop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        reporter.join()
+
+    seconds = time.perf_counter() - started
+    summary = summarize(recorder.histogram, recorder.total_errors, seconds, recorder.total_dropped)
+    final_rss = timeline[-1]["rss_mb"] if timeline else rss_mb(pid)
+    if baseline_rss is None:
+        baseline_rss = final_rss
+    summary.update({
+        "seconds": seconds,
+        "concurrency": concurrency,
+        "target_rps": rate,
+        "max_in_flight": (max_in_flight or 2 * concurrency) if rate else None,
+        "rss_baseline_mb": baseline_rss,
+        "rss_final_mb": final_rss,
+        "rss_growth_mb": None if final_rss is None or baseline_rss is None else final_rss - baseline_rss,
+        "last_error": recorder.last_error,
+    })
+    return summary
+
+
+def check_limits(summary, max_p99_ms=None, max_error_rate=None, max_rss_growth_mb=None, max_drop_rate=None):
+    """
+    Returns a description of every limit the summary exceeds.
+    """
+    failures = []
+    if max_p99_ms is not None and summary.get("p99_ms", 0.0) > max_p99_ms:
+        failures.append(f"p99 latency {summary['p99_ms']:.2f}ms is above {max_p99_ms}ms")
+    if max_error_rate is not None and summary["error_rate"] > max_error_rate:
+        failures.append(f"error rate {summary['error_rate']:.4f} is above {max_error_rate}")
+    if max_drop_rate is not None and summary["drop_rate"] > max_drop_rate:
+        failures.append(f"drop rate {summary['drop_rate']:.4f} is above {max_drop_rate}")
+    if max_rss_growth_mb is not None and (summary["rss_growth_mb"] or 0.0) > max_rss_growth_mb:
+        failures.append(f"RSS grew {summary['rss_growth_mb']:.1f}MB, more than {max_rss_growth_mb}MB")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test and soak test the chatbots in-process or over HTTP.")
+    parser.add_argument("--bot", default="chatbot_2", choices=sorted(BOT_MODULES),
+                        help="the chatbot to test in-process, and whose training data is replayed")
+    parser.add_argument("--encoder", default="sbert", choices=["sbert", "hashed", "stub"])
+    parser.add_argument("--compiled", action="store_true", help="serve chatbot_1/chatbot_2 through the compiled scorer")
+    parser.add_argument("--url", help="test a running chat_server.py at this base URL instead of an in-process bot")
+    parser.add_argument("--pid", type=int, help="report this process's RSS, e.g. the chat server's")
+    parser.add_argument("--logs", nargs="+", help="replay these text or JSONL files instead of the training data")
+    parser.add_argument("--utterances", type=int, default=10000, help="perturbed training phrases to sample")
+    parser.add_argument("--drop-rate", type=float, default=0.15)
+    parser.add_argument("--filler-rate", type=float, default=0.35)
+    parser.add_argument("--typo-rate", type=float, default=0.15)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, help="target requests per second (open loop); default is closed loop")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="with --rate, drop requests due while this many are in flight (default 2 x concurrency)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds excluded from the RSS growth baseline")
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--max-error-rate", type=float)
+    parser.add_argument("--max-drop-rate", type=float, help="with --rate, the largest share of requests that may be dropped")
+    parser.add_argument("--max-rss-growth-mb", type=float)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    utterances = build_utterances(import_bot_module(args.bot).training_data, args.logs, args.utterances, args.seed,
+                                  drop_rate=args.drop_rate, filler_rate=args.filler_rate, typo_rate=args.typo_rate)
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        bot = load_bot(args.bot, encoder=args.encoder, compiled=args.compiled)
+        bot.train()
+        target = InProcessTarget(bot)
+
+    summary = run_load(target, utterances, args.duration, args.concurrency, args.rate, args.interval,
+                       args.warmup, args.pid, max_in_flight=args.max_in_flight)
+    summary["target"] = args.url or args.bot
+    failures = check_limits(summary, args.max_p99_ms, args.max_error_rate, args.max_rss_growth_mb, args.max_drop_rate)
+    summary["failures"] = failures
+    print(json.dumps({"summary": summary}))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
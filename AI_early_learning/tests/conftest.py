@@ -0,0 +1,23 @@
+# Version: 1.0
+# Description: Shared setup for the tests. chatbot_3's modules import each other by bare name, as when its
+# scripts run from inside the folder, so the folder goes on sys.path next to the repository root.
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "chatbot_3")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(scope="session")
+def chatbot_3():
+    """
+    The chatbot_3 module. Tests use the NumPy "hashed" encoder, so sentence_transformers is not needed.
+    """
+    import chatbot_learning_demo
+
+    return chatbot_learning_demo
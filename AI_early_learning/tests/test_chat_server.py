@@ -0,0 +1,87 @@
+# Version: 1.0
+# Description: chat_server must answer malformed and oversized requests with an error status and close
+# the connection, without an unhandled exception, and keep serving well-formed ones.
+
+import asyncio
+import json
+
+import pytest
+
+from chat_server import ChatServer
+
+
+@pytest.fixture(scope="module")
+def bot(chatbot_3):
+    return chatbot_3.IntelligentChatBot(chatbot_3.training_data, chatbot_3.responses, encoder="hashed")
+
+
+def exchange(bot, *requests):
+    """
+    Starts a server on a free port, sends each raw request on its own connection, and returns the status
+    code and body of every response and the server's exceptions left unhandled by the event loop.
+    """
+    async def run():
+        loop = asyncio.get_running_loop()
+        unhandled = []
+        loop.set_exception_handler(lambda _, context: unhandled.append(context))
+        server = ChatServer(bot)
+        await server.start("127.0.0.1", 0)
+        port = server.server.sockets[0].getsockname()[1]
+        responses = []
+        try:
+            for raw in requests:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(raw)
+                await writer.drain()
+                data = await asyncio.wait_for(reader.read(), 10)
+                writer.close()
+                head, _, body = data.partition(b"\r\n\r\n")
+                responses.append((int(head.split()[1]), json.loads(body)))
+        finally:
+            await server.stop()
+        return responses, unhandled
+
+    return asyncio.run(run())
+
+
+def post(body, headers=b""):
+    return (b"POST /chat HTTP/1.1\r\nConnection: close\r\n" + headers
+            + b"Content-Length: %d\r\n\r\n" % len(body) + body)
+
+
+def test_well_formed_request(bot):
+    [(status, payload)], unhandled = exchange(bot, post(b'{"text": "hello there"}'))
+    assert status == 200
+    assert payload["intent"] == "greeting"
+    assert not unhandled
+
+
+@pytest.mark.parametrize("raw, status", [
+    (b"GARBAGE\r\n\r\n", 400),
+    (b"POST /chat HTTP/1.1\r\nContent-Length: ten\r\n\r\n", 400),
+    (b"POST /chat HTTP/1.1\r\nContent-Length: -1\r\n\r\n", 400),
+    (b"POST /chat HTTP/1.1\r\nno colon here\r\n\r\n", 400),
+    (b"POST /chat HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (ChatServer.MAX_BODY + 1), 413),
+    (b"GET /" + b"a" * (ChatServer.MAX_LINE + 1) + b" HTTP/1.1\r\n\r\n", 400),
+    (b"POST /chat HTTP/1.1\r\nX-Long: " + b"a" * (ChatServer.MAX_LINE + 1) + b"\r\n\r\n", 431),
+    (b"POST /chat HTTP/1.1\r\n" + b"X-Repeat: 1\r\n" * (ChatServer.MAX_HEADERS + 1) + b"\r\n", 431),
+])
+def test_bad_requests_are_rejected(bot, raw, status):
+    (rejected, payload), (after, _) = exchange(bot, raw, post(b'{"text": "hi"}'))[0]
+    assert rejected == status
+    assert "error" in payload
+    # The server keeps accepting connections.
+    assert after == 200
+
+
+@pytest.mark.parametrize("body", [b"not json", b'{"message": "hi"}', b'{"text": 3}'])
+def test_bad_bodies_are_rejected(bot, body):
+    [(status, payload)], _ = exchange(bot, post(body))
+    assert status == 400
+    assert "text" in payload["error"]
+
+
+def test_rejections_are_not_unhandled(bot):
+    _, unhandled = exchange(bot, b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n",
+                            post(b"{}", b"X-Long: " + b"a" * 70000 + b"\r\n"))
+    assert not unhandled
@@ -0,0 +1,63 @@
+# Version: 1.0
+# Description: add_examples, remove_examples and reload edit a live chatbot by delta. After any edit the
+# chatbot must answer exactly as one built from scratch on the resulting training data.
+
+import numpy as np
+import pytest
+
+from chatbot_common.corpus import held_out_queries
+from intent_index import IVFIndex
+
+INDEXES = ["exact", "ivf"]
+DTYPES = ["float32", "float16", "int8"]
+
+
+def make_bot(chatbot_3, training_data, kind, dtype):
+    # Probing every IVF list makes the search exhaustive, so a delta-updated index and a freshly
+    # clustered one return the same neighbours.
+    index = IVFIndex(n_lists=4, n_probe=4, dtype=dtype) if kind == "ivf" else kind
+    return chatbot_3.IntelligentChatBot(training_data, chatbot_3.responses, encoder="hashed", index=index,
+                                        storage_dtype=dtype, fast_path=False, query_cache_size=0)
+
+
+def assert_same_answers(bot, fresh, texts):
+    intents, scores = bot.predict_intents(texts)
+    fresh_intents, fresh_scores = fresh.predict_intents(texts)
+    assert intents.tolist() == fresh_intents.tolist()
+    np.testing.assert_allclose(scores, fresh_scores, atol=1e-2)
+    assert bot.intent_labels.tolist() == fresh.intent_labels.tolist()
+
+
+@pytest.fixture(scope="module")
+def queries(chatbot_3):
+    return [text for text, _ in held_out_queries(chatbot_3.training_data, 300)]
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+@pytest.mark.parametrize("kind", INDEXES)
+def test_add_and_remove_match_a_fresh_build(chatbot_3, queries, kind, dtype):
+    data = list(chatbot_3.training_data)
+    base, added = data[:-20], data[-20:]
+    removed = [base[0][0], base[7][0], (base[30][0], base[30][1])]
+
+    bot = make_bot(chatbot_3, base, kind, dtype)
+    assert bot.add_examples(added) == len(added)
+    assert bot.remove_examples(removed) >= len(removed)
+
+    gone = {bot.preprocess(phrase if isinstance(phrase, str) else phrase[0]) for phrase in removed}
+    expected = [item for item in base + added if bot.preprocess(item[0]) not in gone]
+    assert bot.phrases == [bot.preprocess(phrase) for phrase, _ in expected]
+    assert_same_answers(bot, make_bot(chatbot_3, expected, kind, dtype), queries + [p for p, _ in added])
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+@pytest.mark.parametrize("kind", INDEXES)
+def test_reload_matches_a_fresh_build(chatbot_3, queries, kind, dtype):
+    data = list(chatbot_3.training_data)
+    new_data = data[10:] + [("could you play some jazz", "music"), ("put on a song", "music")]
+
+    bot = make_bot(chatbot_3, data, kind, dtype)
+    report = bot.reload(new_data)
+    assert report["removed"] == 10
+    assert report["encoded"] == 2
+    assert_same_answers(bot, make_bot(chatbot_3, new_data, kind, dtype), queries + ["put on a song"])
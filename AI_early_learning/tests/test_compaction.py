@@ -0,0 +1,42 @@
+# Version: 1.0
+# Description: compact() must drop only near-duplicate phrases, including when a projection shrinks the
+# search space and leaves the searched vectors off unit length.
+
+import numpy as np
+import pytest
+
+from compaction import find_near_duplicates
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+@pytest.mark.parametrize("projection", [None, "random", "pca"])
+def test_compact_keeps_distinct_phrases(chatbot_3, projection, dtype):
+    data = list(chatbot_3.training_data)
+    # Copies that preprocess to an existing phrase, so they encode to the same vector under the same intent.
+    copies = [(data[i][0].upper() + "!", data[i][1]) for i in (0, 25, 50)]
+    bot = chatbot_3.IntelligentChatBot(data + copies, chatbot_3.responses, encoder="hashed", projection=projection,
+                                       storage_dtype=dtype)
+
+    report = bot.compact(cutoff=0.95)
+    assert report["rows_before"] == len(data) + len(copies)
+    assert report["rows"] == len(data)
+    assert bot.training_data == data
+    # The corpus labels "I feel uneasy" with two intents; that is reported, and both rows are kept.
+    assert [(c["phrase"], c["intent"], c["other_intent"]) for c in report["conflicts"]] == [
+        ("I feel uneasy", "feeling_fear", "feeling_worried")]
+
+
+def test_duplicates_do_not_depend_on_row_length():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 16)).astype(np.float32)
+    vectors = np.vstack([vectors, vectors[:5] * 1.01 + 1e-3])
+    intents = np.array([f"intent_{i % 7}" for i in range(50)] + [f"intent_{i % 7}" for i in range(5)], dtype=object)
+
+    keep, representative, _ = find_near_duplicates(vectors, intents, cutoff=0.99)
+    assert keep.tolist() == list(range(50))
+    assert representative[50:].tolist() == list(range(5))
+
+    # Rows scaled to different lengths, as under a random projection, are still compared by cosine similarity.
+    scales = rng.uniform(0.7, 1.3, size=(len(vectors), 1)).astype(np.float32)
+    scaled_keep, _, _ = find_near_duplicates(vectors * scales, intents, cutoff=0.99)
+    assert scaled_keep.tolist() == keep.tolist()
@@ -0,0 +1,82 @@
+# Version: 1.0
+# Description: A CompiledScorer must give the same probabilities as the sklearn pipeline it was compiled
+# from, for the two sparse chatbots and for the vectorizer and classifier options it supports.
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+from chatbot_common.bots import SparseBot, import_bot_module
+from chatbot_common.compiled import CompiledScorer
+from chatbot_common.corpus import held_out_queries
+
+
+def sample_texts(training_data):
+    # Perturbed phrases, plus texts with unseen words only, repeated words and punctuation.
+    return [text for text, _ in held_out_queries(training_data, 200)] + ["", "zzz qqq", "hi hi hi HI!", "thanks, bye."]
+
+
+def assert_parity(model, vectorizer, texts):
+    scorer = CompiledScorer.compile(model, vectorizer)
+    expected = model.predict_proba(vectorizer.transform(texts))
+    np.testing.assert_allclose(scorer.predict_proba(texts), expected, rtol=1e-9, atol=1e-12)
+    assert scorer.predict(texts).tolist() == model.predict(vectorizer.transform(texts)).tolist()
+    return scorer
+
+
+@pytest.mark.parametrize("name", ["chatbot_1", "chatbot_2"])
+def test_chatbot_scorers_match_predict_proba(name):
+    module = import_bot_module(name)
+    model, vectorizer = module.train_chatbot(module.training_data)
+    preprocess = getattr(module, "preprocess", None)
+    texts = sample_texts(module.training_data)
+    assert_parity(model, vectorizer, [preprocess(text) for text in texts] if preprocess else texts)
+
+    bot = SparseBot(name, compiled=True)
+    bot.train()
+    intents, scores = bot.predict(texts)
+    expected_intents, expected_scores = module.predict_intents(bot.model, bot.vectorizer, texts)
+    assert intents.tolist() == expected_intents.tolist()
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-9)
+
+
+@pytest.mark.parametrize("vectorizer", [
+    CountVectorizer(ngram_range=(1, 2), binary=True),
+    CountVectorizer(stop_words="english"),
+    TfidfVectorizer(sublinear_tf=True, norm="l1"),
+    TfidfVectorizer(ngram_range=(1, 3), use_idf=False),
+    TfidfVectorizer(norm=None),
+])
+def test_vectorizer_options_match_predict_proba(vectorizer):
+    module = import_bot_module("chatbot_2")
+    phrases = [phrase for phrase, _ in module.training_data]
+    model = LogisticRegression(max_iter=1000).fit(vectorizer.fit_transform(phrases), [i for _, i in module.training_data])
+    assert_parity(model, vectorizer, sample_texts(module.training_data))
+
+
+def test_sgd_and_binary_classifiers_match_predict_proba():
+    module = import_bot_module("chatbot_2")
+    phrases, intents = [p for p, _ in module.training_data], [i for _, i in module.training_data]
+    vectorizer = TfidfVectorizer().fit(phrases)
+    features = vectorizer.transform(phrases)
+    texts = sample_texts(module.training_data)
+
+    sgd = SGDClassifier(loss="log_loss", random_state=0).fit(features, intents)
+    assert CompiledScorer.compile(sgd, vectorizer).proba == "ovr"
+    assert_parity(sgd, vectorizer, texts)
+
+    greetings = [intent == "greeting" for intent in intents]
+    binary = LogisticRegression().fit(features, greetings)
+    assert CompiledScorer.compile(binary, vectorizer).proba == "binary"
+    assert_parity(binary, vectorizer, texts)
+
+
+def test_saved_scorer_loads_with_the_same_probabilities(tmp_path):
+    module = import_bot_module("chatbot_1")
+    model, vectorizer = module.train_chatbot(module.training_data)
+    texts = sample_texts(module.training_data)
+    scorer = assert_parity(model, vectorizer, texts)
+    scorer.save(str(tmp_path / "scorer"))
+    loaded = CompiledScorer.load(str(tmp_path / "scorer"))
+    np.testing.assert_allclose(loaded.predict_proba(texts), scorer.predict_proba(texts), rtol=0, atol=0)
@@ -0,0 +1,81 @@
+# Version: 1.0
+# Description: SessionManager must evict sessions that have been idle past `idle_timeout` and drop the
+# least recently active session when `max_sessions` is reached.
+
+import pytest
+
+from sessions import SessionManager
+
+
+class Clock:
+    """
+    A settable time source for SessionManager's `clock`.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def bot(chatbot_3):
+    return chatbot_3.IntelligentChatBot(chatbot_3.training_data, chatbot_3.responses, encoder="hashed")
+
+
+def test_idle_sessions_are_evicted(bot):
+    clock = Clock()
+    manager = SessionManager(bot, idle_timeout=60.0, clock=clock)
+    manager.respond("a", "hello")
+    clock.now = 30.0
+    manager.respond("b", "hello")
+    clock.now = 70.0
+    # "a" has been idle for 70s, "b" only for 40s.
+    assert manager.evict_idle() == 1
+    assert "a" not in manager._sessions and "b" in manager._sessions
+
+    clock.now = 89.0
+    manager.respond("b", "thanks")
+    clock.now = 140.0
+    assert manager.evict_idle() == 0
+    clock.now = 149.0
+    assert manager.evict_idle() == 1
+    assert len(manager) == 0
+    assert manager.stats()["evicted"] == 2
+
+
+def test_idle_sessions_are_swept_when_sessions_are_used(bot):
+    clock = Clock()
+    manager = SessionManager(bot, idle_timeout=60.0, clock=clock)
+    for session_id in ("a", "b", "c"):
+        manager.session(session_id)
+    clock.now = 61.0
+    manager.session("d")
+    assert len(manager) == 1
+    assert manager.stats() == {"sessions": 1, "created": 4, "evicted": 3, "max_sessions": 10000}
+
+
+def test_a_returning_session_keeps_its_state(bot):
+    clock = Clock()
+    manager = SessionManager(bot, idle_timeout=60.0, clock=clock, seed=1)
+    first = manager.respond("a", "hello")
+    clock.now = 59.0
+    second = manager.respond("a", "hello")
+    assert (first["turn"], second["turn"]) == (1, 2)
+    assert [intent for _, intent in manager.session("a").history] == ["greeting", "greeting"]
+
+
+def test_the_least_recently_active_session_is_dropped_at_capacity(bot):
+    clock = Clock()
+    manager = SessionManager(bot, max_sessions=3, idle_timeout=None, clock=clock)
+    for session_id in ("a", "b", "c"):
+        manager.respond(session_id, "hello")
+    manager.respond("a", "hello again")
+    manager.respond("d", "hello")
+    assert list(manager._sessions) == ["c", "a", "d"]
+    assert manager.stats()["evicted"] == 1
+    # With no idle timeout, nothing is evicted however long sessions wait.
+    clock.now = 1e9
+    assert manager.evict_idle() == 0
+    assert len(manager) == 3